@@ -1,32 +1,36 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from app.models import User
+from app.core.user_cache import AuthUser, user_cache
 from app.core.database import get_db
 from app.core.config import settings
-
-# Cấu hình password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.password_hasher import pwd_context
 
 # Cấu hình OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 def get_password_hash(password: str) -> str:
-    """Tạo hash cho mật khẩu"""
+    """Tạo hash cho mật khẩu (chặn luồng gọi: trong route async dùng password_hasher.hash)"""
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Xác thực mật khẩu"""
+    """Xác thực mật khẩu (chặn luồng gọi: trong route async dùng password_hasher.verify_and_update)"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def user_claims(user_id: int, username: str, is_admin: bool) -> dict:
+    """Claims của access token: username (sub), user id và quyền"""
+    return {"sub": username, "uid": user_id, "role": "admin" if is_admin else "user"}
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """Tạo JWT access token"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -41,8 +45,25 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Lấy user hiện tại từ token"""
+def _load_auth_user(db: Session, user_id: Optional[int] = None, username: Optional[str] = None) -> Optional[AuthUser]:
+    user = db.get(User, user_id) if user_id is not None else get_user(db, username)
+    return AuthUser.from_model(user) if user else None
+
+def _token_is_current(payload: dict, user: AuthUser) -> bool:
+    """Token phát hành trước lần đổi mật khẩu / quyền gần nhất hoặc mang quyền cũ không còn hiệu lực"""
+    role = payload.get("role")
+    if role is not None and role != ("admin" if user.is_admin else "user"):
+        return False
+    issued_at = payload.get("iat")
+    if issued_at is not None and user.updated_at is not None and issued_at < int(user.updated_at.timestamp()):
+        return False
+    return True
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> AuthUser:
+    """Lấy user hiện tại từ token
+    
+    Token có claim uid: đọc user qua user_cache, không query database khi cache còn hạn.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Không thể xác thực thông tin đăng nhập",
@@ -56,12 +77,17 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = get_user(db, username=username)
-    if user is None:
+    user_id = payload.get("uid")
+    if isinstance(user_id, int):
+        user = user_cache.get_or_load(user_id, lambda: _load_auth_user(db, user_id=user_id))
+    else:
+        # Token phát hành trước khi có claim uid
+        user = _load_auth_user(db, username=username)
+    if user is None or user.username != username or not _token_is_current(payload, user):
         raise credentials_exception
     return user
 
-def get_current_admin_user(current_user: User = Depends(get_current_user)):
+def get_current_admin_user(current_user: AuthUser = Depends(get_current_user)):
     """Lấy admin user hiện tại"""
     if not current_user.is_admin:
         raise HTTPException(
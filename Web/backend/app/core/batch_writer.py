@@ -0,0 +1,248 @@
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest", "sync")
+
+class BatchWriter:
+    """Buffer ghi nền (write-behind) có giới hạn, flush theo lô bằng một thread riêng
+
+    Lô ghi lỗi được đưa lại đầu buffer để thử lại (database chưa sẵn sàng). Lỗi thuộc permanent_errors
+    (dữ liệu hỏng: vi phạm khóa ngoại, NOT NULL...) thì lô được chia đôi để tách bản ghi hỏng: bản ghi
+    hỏng bị bỏ và ghi log (dead-letter), phần còn lại của lô vẫn được ghi.
+    """
+
+    def __init__(self, name: str, flush_func: Callable[[List[Any]], None], max_size: int = 10000,
+                 flush_rows: int = 500, flush_interval_ms: int = 200,
+                 overflow_policy: str = "block", block_timeout_ms: int = 1000,
+                 on_tick: Optional[Callable[[bool], None]] = None,
+                 permanent_errors: Tuple[Type[BaseException], ...] = ()):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy không hợp lệ: {overflow_policy}")
+
+        self.name = name
+        self.flush_func = flush_func
+        self.max_size = max(1, max_size)
+        self.flush_rows = max(1, min(flush_rows, self.max_size))
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000.0
+        # Callback gọi mỗi chu kỳ flush (final=True khi dừng), dùng để đẩy dữ liệu tổng hợp vào buffer
+        self.on_tick = on_tick
+        self.permanent_errors = tuple(permanent_errors)
+
+        # Phần tử: (bản ghi, số lần ghi lỗi)
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._last_flush_failed = False
+
+        # Metrics
+        self._enqueued = 0
+        self._flushed = 0
+        self._dropped = 0
+        self._sync_writes = 0
+        self._flush_count = 0
+        self._failed_flushes = 0
+        self._dead_lettered = 0
+        self._last_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+        self._max_flush_latency = 0.0
+
+    @property
+    def running(self) -> bool:
+        """Flusher có đang chạy không"""
+        return self._running
+
+    @property
+    def depth(self) -> int:
+        """Số bản ghi đang chờ trong buffer"""
+        return len(self._items)
+
+    def start(self):
+        """Khởi động thread flush"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+        self._thread.start()
+        logger.info(f"BatchWriter '{self.name}' started")
+
+    def stop(self, timeout: float = 10.0):
+        """Dừng thread flush và ghi hết dữ liệu còn trong buffer"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        # Flush phần còn lại (nếu thread chưa kịp ghi)
+        self._tick(final=True)
+        while self.flush() > 0:
+            pass
+        if self._items:
+            logger.error(f"BatchWriter '{self.name}' dừng với {len(self._items)} bản ghi chưa ghi được")
+        logger.info(f"BatchWriter '{self.name}' stopped")
+
+    def put(self, item: Any) -> bool:
+        """Đưa một bản ghi vào buffer, trả về False nếu bản ghi bị bỏ (kể cả ghi trực tiếp lỗi khi policy sync)"""
+        write_inline = False
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                if self.overflow_policy == "drop_newest":
+                    self._dropped += 1
+                    return False
+                elif self.overflow_policy == "drop_oldest":
+                    self._items.popleft()
+                    self._dropped += 1
+                elif self.overflow_policy == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._items) >= self.max_size and self._running:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+                    if len(self._items) >= self.max_size:
+                        self._dropped += 1
+                        return False
+                elif self.overflow_policy == "sync":
+                    self._sync_writes += 1
+                    write_inline = True
+            if not write_inline:
+                self._items.append((item, 0))
+                self._enqueued += 1
+                if len(self._items) >= self.flush_rows:
+                    self._not_empty.notify()
+                return True
+
+        # Policy "sync": buffer đầy thì caller tự ghi trực tiếp; ghi lỗi thì bản ghi bị bỏ
+        if self._write([item]) is None:
+            return True
+        with self._lock:
+            self._dropped += 1
+        return False
+
+    def flush(self) -> int:
+        """Ghi một lô (tối đa flush_rows bản ghi), trả về số bản ghi đã ghi"""
+        with self._flush_lock:
+            with self._lock:
+                batch = [self._items.popleft() for _ in range(min(self.flush_rows, len(self._items)))]
+                if batch:
+                    self._not_full.notify_all()
+            if not batch:
+                return 0
+            written, retry = self._write_isolating(batch)
+            self._last_flush_failed = bool(retry)
+            if retry:
+                self._requeue(retry)
+            return written
+
+    def _write_isolating(self, batch: List[Tuple[Any, int]]) -> Tuple[int, List[Tuple[Any, int]]]:
+        """Ghi một lô; lỗi dữ liệu thì chia đôi tới từng bản ghi để bỏ riêng bản ghi hỏng
+
+        Trả về (số bản ghi đã ghi, các phần tử cần thử lại với số lần lỗi đã tăng).
+        """
+        error = self._write([item for item, _ in batch])
+        if error is None:
+            return len(batch), []
+        if not isinstance(error, self.permanent_errors):
+            retry = [(item, attempts + 1) for item, attempts in batch]
+            logger.warning(f"BatchWriter '{self.name}' sẽ thử lại {len(retry)} bản ghi "
+                           f"(đã lỗi tối đa {max(attempts for _, attempts in retry)} lần)")
+            return 0, retry
+        if len(batch) == 1:
+            self._dead_letter(batch[0][0], error)
+            return 0, []
+        middle = len(batch) // 2
+        left_written, left_retry = self._write_isolating(batch[:middle])
+        right_written, right_retry = self._write_isolating(batch[middle:])
+        return left_written + right_written, left_retry + right_retry
+
+    def _dead_letter(self, item: Any, error: BaseException):
+        """Bỏ bản ghi không thể ghi (lỗi dữ liệu), ghi log để có thể khôi phục bằng tay"""
+        with self._lock:
+            self._dead_lettered += 1
+        logger.error(f"BatchWriter '{self.name}' bỏ bản ghi lỗi dữ liệu: {item!r} ({error})")
+
+    def _write(self, batch: List[Any]) -> Optional[BaseException]:
+        """Gọi flush_func và ghi nhận metrics; trả về lỗi (None nếu ghi thành công)"""
+        start_time = time.perf_counter()
+        try:
+            self.flush_func(batch)
+        except Exception as e:
+            with self._lock:
+                self._failed_flushes += 1
+            logger.error(f"BatchWriter '{self.name}' flush lỗi ({len(batch)} bản ghi): {e}")
+            return e
+        latency = time.perf_counter() - start_time
+        with self._lock:
+            self._flushed += len(batch)
+            self._flush_count += 1
+            self._last_flush_latency = latency
+            self._total_flush_latency += latency
+            self._max_flush_latency = max(self._max_flush_latency, latency)
+        return None
+
+    def _requeue(self, batch: List[Tuple[Any, int]]):
+        """Đưa các phần tử ghi lỗi trở lại đầu buffer để thử lại"""
+        with self._lock:
+            for item in reversed(batch):
+                if len(self._items) >= self.max_size:
+                    self._dropped += 1
+                    continue
+                self._items.appendleft(item)
+
+    def _tick(self, final: bool):
+        """Gọi on_tick (nếu có)"""
+        if self.on_tick is None:
+            return
+        try:
+            self.on_tick(final)
+        except Exception as e:
+            logger.error(f"BatchWriter '{self.name}' on_tick lỗi: {e}")
+
+    def _run(self):
+        """Vòng lặp flush: mỗi flush_rows bản ghi hoặc mỗi flush_interval"""
+        while True:
+            with self._lock:
+                if self._running and len(self._items) < self.flush_rows:
+                    self._not_empty.wait(self.flush_interval)
+                if not self._running:
+                    return
+            self._tick(final=False)
+            self.flush()
+            if self._last_flush_failed:
+                # Tránh vòng lặp lỗi liên tục khi database không sẵn sàng
+                time.sleep(self.flush_interval)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Lấy metrics của buffer"""
+        with self._lock:
+            return {
+                'running': self._running,
+                'depth': len(self._items),
+                'max_size': self.max_size,
+                'overflow_policy': self.overflow_policy,
+                'enqueued': self._enqueued,
+                'flushed': self._flushed,
+                'dropped': self._dropped,
+                'sync_writes': self._sync_writes,
+                'flush_count': self._flush_count,
+                'failed_flushes': self._failed_flushes,
+                'dead_lettered': self._dead_lettered,
+                'last_flush_latency_ms': self._last_flush_latency * 1000,
+                'avg_flush_latency_ms': (self._total_flush_latency / self._flush_count * 1000) if self._flush_count else 0,
+                'max_flush_latency_ms': self._max_flush_latency * 1000
+            }
@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class Settings(BaseSettings):
     """Cấu hình ứng dụng"""
@@ -21,6 +21,14 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))  # Cache user cho xác thực (0: tắt)
+    
+    # Hash mật khẩu bcrypt: cost (log2 số vòng), executor riêng ngoài event loop, import user hàng loạt
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))  # Quá số này: trả 503
+    PASSWORD_IMPORT_PROCESSES: int = int(os.getenv("PASSWORD_IMPORT_PROCESSES", str(os.cpu_count() or 2)))
+    USER_IMPORT_MAX_ROWS: int = int(os.getenv("USER_IMPORT_MAX_ROWS", "5000"))
     
     # Model paths
     MODEL_STRUCTURE_PATH: str = os.getenv(
@@ -61,6 +69,72 @@ class Settings(BaseSettings):
     CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "3600"))
     
+    # Cache kết quả thống kê (bỏ khi có kết quả mới, gộp các request giống hệt đang chạy)
+    STATS_CACHE_ENABLED: bool = os.getenv("STATS_CACHE_ENABLED", "true").lower() == "true"
+    STATS_CACHE_TTL_SECONDS: int = int(os.getenv("STATS_CACHE_TTL_SECONDS", "30"))
+    STATS_CACHE_MAX_ENTRIES: int = int(os.getenv("STATS_CACHE_MAX_ENTRIES", "2000"))
+    STATS_CACHE_WAIT_TIMEOUT_SECONDS: int = int(os.getenv("STATS_CACHE_WAIT_TIMEOUT_SECONDS", "30"))  # Request chờ lần tính đang chạy tối đa
+    
+    # Sketch phân vị thời gian xử lý trong bộ nhớ (số user + phiên được theo dõi tối đa)
+    LATENCY_TRACKER_MAX_KEYS: int = int(os.getenv("LATENCY_TRACKER_MAX_KEYS", "10000"))
+    
+    # Write-behind buffer cho EmotionResult
+    EMOTION_WRITE_BEHIND_ENABLED: bool = os.getenv("EMOTION_WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    EMOTION_BUFFER_MAX_SIZE: int = int(os.getenv("EMOTION_BUFFER_MAX_SIZE", "10000"))
+    EMOTION_BUFFER_FLUSH_ROWS: int = int(os.getenv("EMOTION_BUFFER_FLUSH_ROWS", "500"))
+    EMOTION_BUFFER_FLUSH_INTERVAL_MS: int = int(os.getenv("EMOTION_BUFFER_FLUSH_INTERVAL_MS", "200"))
+    EMOTION_BUFFER_OVERFLOW_POLICY: str = os.getenv("EMOTION_BUFFER_OVERFLOW_POLICY", "block")  # block | drop_newest | drop_oldest | sync
+    EMOTION_BUFFER_BLOCK_TIMEOUT_MS: int = int(os.getenv("EMOTION_BUFFER_BLOCK_TIMEOUT_MS", "1000"))
+    
+    # System log sink (ghi log bất đồng bộ theo lô)
+    SYSTEM_LOG_ASYNC_ENABLED: bool = os.getenv("SYSTEM_LOG_ASYNC_ENABLED", "true").lower() == "true"
+    SYSTEM_LOG_QUEUE_MAX_SIZE: int = int(os.getenv("SYSTEM_LOG_QUEUE_MAX_SIZE", "5000"))
+    SYSTEM_LOG_FLUSH_ROWS: int = int(os.getenv("SYSTEM_LOG_FLUSH_ROWS", "200"))
+    SYSTEM_LOG_FLUSH_INTERVAL_MS: int = int(os.getenv("SYSTEM_LOG_FLUSH_INTERVAL_MS", "1000"))
+    SYSTEM_LOG_OVERFLOW_POLICY: str = os.getenv("SYSTEM_LOG_OVERFLOW_POLICY", "drop_newest")  # block | drop_newest | drop_oldest | sync
+    SYSTEM_LOG_SHED_THRESHOLD: float = float(os.getenv("SYSTEM_LOG_SHED_THRESHOLD", "0.8"))  # Tỷ lệ đầy để bắt đầu bỏ log INFO
+    SYSTEM_LOG_AGGREGATE_EVENTS: List[str] = ["emotion_analysis"]
+    SYSTEM_LOG_AGGREGATE_WINDOW_SECONDS: int = int(os.getenv("SYSTEM_LOG_AGGREGATE_WINDOW_SECONDS", "60"))
+    SYSTEM_LOG_SAMPLE_RATES: Dict[str, float] = {}
+    
+    # Phiên phân tích: cache phiên đang mở và dọn phiên treo
+    ACTIVE_SESSION_CACHE_TTL: int = int(os.getenv("ACTIVE_SESSION_CACHE_TTL", "300"))  # seconds
+    SESSION_IDLE_TIMEOUT_SECONDS: int = int(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "900"))
+    SESSION_DEFAULT_MAX_DURATION: int = int(os.getenv("SESSION_DEFAULT_MAX_DURATION", "3600"))
+    SESSION_REAPER_ENABLED: bool = os.getenv("SESSION_REAPER_ENABLED", "true").lower() == "true"
+    SESSION_REAPER_INTERVAL_SECONDS: int = int(os.getenv("SESSION_REAPER_INTERVAL_SECONDS", "60"))
+    
+    # Partition emotion_results theo timestamp (chỉ PostgreSQL, áp dụng khi chạy alembic upgrade)
+    EMOTION_PARTITIONING_ENABLED: bool = os.getenv("EMOTION_PARTITIONING_ENABLED", "false").lower() == "true"
+    EMOTION_PARTITION_INTERVAL: str = os.getenv("EMOTION_PARTITION_INTERVAL", "month")  # day | week | month
+    EMOTION_PARTITION_PREMAKE: int = int(os.getenv("EMOTION_PARTITION_PREMAKE", "3"))  # Số partition tạo trước
+    EMOTION_PARTITION_RETENTION: int = int(os.getenv("EMOTION_PARTITION_RETENTION", "0"))  # Số khoảng giữ lại, 0 = giữ tất cả
+    EMOTION_PARTITION_RETENTION_MODE: str = os.getenv("EMOTION_PARTITION_RETENTION_MODE", "detach")  # detach | drop
+    EMOTION_PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = int(os.getenv("EMOTION_PARTITION_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+    
+    # Lưu trữ dữ liệu cũ (emotion_results, system_logs) ra file Parquet
+    ARCHIVE_ENABLED: bool = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_RETENTION_DAYS: int = int(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))  # Giữ trong database bao nhiêu ngày
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))  # Số dòng mỗi transaction xóa
+    ARCHIVE_BATCH_PAUSE_MS: int = int(os.getenv("ARCHIVE_BATCH_PAUSE_MS", "50"))  # Nghỉ giữa các lô để nhường writer
+    ARCHIVE_COMPRESSION: str = os.getenv("ARCHIVE_COMPRESSION", "zstd")  # zstd | snappy | gzip | none
+    ARCHIVE_INTERVAL_SECONDS: int = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+    
+    # Rollup theo giờ (user, giờ, cảm xúc) cho thống kê
+    STATS_ROLLUP_ENABLED: bool = os.getenv("STATS_ROLLUP_ENABLED", "true").lower() == "true"
+    STATS_ROLLUP_INTERVAL_SECONDS: int = int(os.getenv("STATS_ROLLUP_INTERVAL_SECONDS", "300"))
+    STATS_ROLLUP_GRACE_SECONDS: int = int(os.getenv("STATS_ROLLUP_GRACE_SECONDS", "120"))  # Chờ thêm sau khi hết giờ trước khi tổng hợp
+    STATS_ROLLUP_CHUNK_HOURS: int = int(os.getenv("STATS_ROLLUP_CHUNK_HOURS", "24"))  # Số giờ mỗi transaction khi bắt kịp / backfill
+    
+    # Bulk ingest kết quả từ client offline (NDJSON / Arrow IPC)
+    INGEST_MAX_ROWS: int = int(os.getenv("INGEST_MAX_ROWS", "10000"))
+    INGEST_MAX_BODY_BYTES: int = int(os.getenv("INGEST_MAX_BODY_BYTES", "16777216"))  # 16MB
+    INGEST_MAX_CLOCK_SKEW_SECONDS: int = int(os.getenv("INGEST_MAX_CLOCK_SKEW_SECONDS", "300"))  # Cho phép timestamp lệch về tương lai
+    
+    # Xuất toàn bộ lịch sử (CSV / NDJSON / Parquet) dạng stream
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))  # Số dòng mỗi lần đọc cursor / mỗi row group Parquet
+    
     # File Upload Configuration
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/jpg"]
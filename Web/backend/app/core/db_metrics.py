@@ -0,0 +1,79 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class RoundTripCounter:
+    """Đếm số round-trip tới database (statement, commit, rollback)"""
+
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    @property
+    def total(self) -> int:
+        return self.statements + self.commits + self.rollbacks
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            'statements': self.statements,
+            'commits': self.commits,
+            'rollbacks': self.rollbacks,
+            'total': self.total
+        }
+
+_current_counter: ContextVar[Optional[RoundTripCounter]] = ContextVar("db_round_trip_counter", default=None)
+
+# Tổng hợp theo route: path -> {requests, round_trips}
+_route_stats: Dict[str, Dict[str, int]] = {}
+_route_lock = threading.Lock()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.statements += 1
+
+@event.listens_for(Engine, "commit")
+def _count_commit(conn):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.commits += 1
+
+@event.listens_for(Engine, "rollback")
+def _count_rollback(conn):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.rollbacks += 1
+
+@contextmanager
+def track_round_trips():
+    """Đếm round-trip database trong khối lệnh (kể cả code chạy trong threadpool của request)"""
+    counter = RoundTripCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+def record_route_round_trips(route: str, counter: RoundTripCounter):
+    """Ghi nhận số round-trip của một request vào thống kê theo route"""
+    with _route_lock:
+        stats = _route_stats.setdefault(route, {'requests': 0, 'round_trips': 0, 'max_round_trips': 0})
+        stats['requests'] += 1
+        stats['round_trips'] += counter.total
+        stats['max_round_trips'] = max(stats['max_round_trips'], counter.total)
+
+def get_round_trip_metrics() -> Dict[str, Any]:
+    """Số round-trip trung bình mỗi request theo route"""
+    with _route_lock:
+        return {
+            route: {
+                **stats,
+                'avg_round_trips': stats['round_trips'] / stats['requests'] if stats['requests'] else 0
+            }
+            for route, stats in _route_stats.items()
+        }
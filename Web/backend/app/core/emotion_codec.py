@@ -0,0 +1,57 @@
+import struct
+from typing import Dict, Optional, Sequence, Union
+
+# Thứ tự nhãn theo output của model CNN-LSTM (mã cảm xúc = vị trí trong danh sách)
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+EMOTION_LABELS_VN = ['Giận dữ', 'Ghê tởm', 'Sợ hãi', 'Vui vẻ', 'Buồn bã', 'Ngạc nhiên', 'Bình thường']
+EMOTION_TRANSLATIONS = dict(zip(EMOTION_LABELS, EMOTION_LABELS_VN))
+
+NO_FACE_LABEL = 'no_face_detected'
+NO_FACE_LABEL_VN = 'Không phát hiện khuôn mặt'
+NO_FACE_CODE = -1
+
+_EMOTION_CODES = {label: code for code, label in enumerate(EMOTION_LABELS)}
+_EMOTION_CODES[NO_FACE_LABEL] = NO_FACE_CODE
+
+# Vector điểm số: 7 float32 little-endian (28 bytes)
+_SCORES_STRUCT = struct.Struct(f'<{len(EMOTION_LABELS)}f')
+
+def encode_emotion(label: str) -> int:
+    """Chuyển nhãn cảm xúc thành mã số nguyên nhỏ"""
+    try:
+        return _EMOTION_CODES[label]
+    except KeyError:
+        raise ValueError(f"Nhãn cảm xúc không hợp lệ: {label}")
+
+def decode_emotion(code: Optional[int]) -> Optional[str]:
+    """Chuyển mã cảm xúc thành nhãn tiếng Anh"""
+    if code is None:
+        return None
+    if code == NO_FACE_CODE:
+        return NO_FACE_LABEL
+    return EMOTION_LABELS[code]
+
+def translate_emotion(label: Optional[str]) -> Optional[str]:
+    """Nhãn cảm xúc tiếng Việt"""
+    if label == NO_FACE_LABEL:
+        return NO_FACE_LABEL_VN
+    return EMOTION_TRANSLATIONS.get(label, label)
+
+def pack_scores(scores: Union[Dict[str, float], Sequence[float], None]) -> Optional[bytes]:
+    """Đóng gói điểm số 7 cảm xúc (dict theo nhãn hoặc vector theo thứ tự model) thành bytes"""
+    if not scores:
+        return None
+    if isinstance(scores, dict):
+        scores = [scores.get(label, 0.0) for label in EMOTION_LABELS]
+    return _SCORES_STRUCT.pack(*(float(score) for score in scores))
+
+def unpack_scores(packed: Optional[bytes]) -> Dict[str, float]:
+    """Giải nén vector điểm số thành dict theo nhãn tiếng Anh"""
+    if not packed:
+        return {}
+    # float32 có ~7 chữ số có nghĩa, làm tròn để bỏ nhiễu khi đổi sang float64
+    return {label: round(score, 6) for label, score in zip(EMOTION_LABELS, _SCORES_STRUCT.unpack(packed))}
+
+def translate_scores(scores: Dict[str, float]) -> Dict[str, float]:
+    """Đổi key của dict điểm số sang nhãn tiếng Việt"""
+    return {translate_emotion(label): score for label, score in scores.items()}
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from sqlalchemy import tuple_, literal, DateTime, String
+from sqlalchemy.types import TypeDecorator
+
+# Khóa phân trang keyset: (timestamp, id) của dòng cuối trang trước, sắp xếp giảm dần
+Keyset = Tuple[datetime, int]
+
+def _to_utc(value: datetime) -> datetime:
+    """SQLite trả về datetime không có timezone (giá trị UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def keyset_key(timestamp: datetime, row_id: int) -> Keyset:
+    """Khóa so sánh được giữa dòng database (PostgreSQL / SQLite) và dòng trong file lưu trữ"""
+    return _to_utc(timestamp), row_id
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Cursor trang tiếp theo (chuỗi mờ, an toàn cho URL) từ dòng cuối của trang hiện tại"""
+    payload = json.dumps([_to_utc(timestamp).isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Keyset]:
+    """Giải mã cursor; None nếu không có, ValueError nếu cursor không hợp lệ"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(payload)
+        if not isinstance(row_id, int) or isinstance(row_id, bool):
+            raise ValueError
+        return keyset_key(datetime.fromisoformat(timestamp), row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor không hợp lệ")
+
+class _KeysetTimestamp(TypeDecorator):
+    """Timestamp của cursor khi bind: SQLite so sánh chuỗi nên phải bind đúng dạng đã lưu
+
+    SQLite lưu datetime dạng text: server_default (CURRENT_TIMESTAMP) là 'YYYY-MM-DD HH:MM:SS' không có
+    phần lẻ giây, còn giá trị ghi từ Python có '.ffffff'. Bind '...:19.000000' thì '...:19' < cursor nên
+    mọi dòng trong cùng giây đều thỏa điều kiện và cursor không tiến. Bind UTC không timezone, bỏ phần lẻ
+    giây khi bằng 0 để khớp dạng của server_default.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name != 'sqlite':
+            return value
+        value = _to_utc(value).replace(tzinfo=None)
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f' if value.microsecond else '%Y-%m-%d %H:%M:%S')
+
+def keyset_before(timestamp_column, id_column, before: Keyset):
+    """Điều kiện (timestamp, id) < before: PostgreSQL / SQLite quét đoạn index (..., timestamp, id)"""
+    timestamp, row_id = before
+    return tuple_(timestamp_column, id_column) < tuple_(literal(timestamp, _KeysetTimestamp()), row_id)
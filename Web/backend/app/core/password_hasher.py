@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from passlib.context import CryptContext
+from app.core.config import settings
+
+# Cấu hình password hashing: hash có cost khác BCRYPT_ROUNDS được hash lại khi user đăng nhập
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# Số mật khẩu mỗi lần gửi sang process con khi import hàng loạt
+_IMPORT_CHUNK_SIZE = 16
+
+class PasswordHasherBusy(RuntimeError):
+    """Hàng đợi hash mật khẩu đã đầy (route trả 503)"""
+
+class PasswordHasher:
+    """Executor riêng, giới hạn số luồng và hàng đợi, để hash / kiểm tra mật khẩu bcrypt ngoài event loop
+
+    bcrypt nhả GIL trong lúc hash nên các luồng chạy song song thật; phần còn lại của event loop (upload
+    frame, API khác) không bị chặn trong lúc đăng nhập hàng loạt. Quá max_pending lượt đang chờ thì
+    từ chối ngay (PasswordHasherBusy) thay vì để hàng đợi và thời gian chờ tăng vô hạn.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._rehashed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy("Hệ thống đang bận xử lý đăng nhập, vui lòng thử lại")
+            self._pending += 1
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # Request bị hủy không giải phóng chỗ: lượt hash vẫn chiếm luồng cho tới khi chạy xong
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Optional[Future]):
+        """Giải phóng một chỗ trong hàng đợi khi lượt hash kết thúc (hoặc bị hủy trước khi chạy)"""
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                self._completed += 1
+
+    async def hash(self, password: str) -> str:
+        """Tạo hash cho mật khẩu (không chặn event loop)"""
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """(mật khẩu đúng, hash mới nếu hash cũ cần nâng cost / đổi thuật toán, ngược lại None)"""
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, password_hash)
+        if new_hash is not None:
+            with self._lock:
+                self._rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        """Dừng executor (chờ các lượt đang chạy)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của password hasher"""
+        with self._lock:
+            return {
+                'bcrypt_rounds': settings.BCRYPT_ROUNDS,
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'rehashed_on_login': self._rehashed
+            }
+
+def _hash_chunk(passwords: List[str], rounds: int) -> List[str]:
+    """Chạy trong process con: hash một nhóm mật khẩu"""
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    return [context.hash(password) for password in passwords]
+
+def hash_passwords(passwords: List[str], processes: Optional[int] = None) -> List[str]:
+    """Hash nhiều mật khẩu trong process pool (import user hàng loạt), giữ nguyên thứ tự"""
+    if not passwords:
+        return []
+    chunks = [passwords[i:i + _IMPORT_CHUNK_SIZE] for i in range(0, len(passwords), _IMPORT_CHUNK_SIZE)]
+    processes = max(1, min(processes or settings.PASSWORD_IMPORT_PROCESSES, len(chunks)))
+    # spawn: fork một process nhiều luồng (executor, buffer, thread nền) có thể kế thừa lock đang bị giữ
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        hashed = pool.map(_hash_chunk, chunks, [settings.BCRYPT_ROUNDS] * len(chunks))
+        return [password_hash for chunk in hashed for password_hash in chunk]
+
+# Instance global
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
@@ -0,0 +1,116 @@
+import math
+import struct
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import Integer, case, cast, func
+
+# Sai số tương đối của percentile: cố định vì bin đã lưu trong rollup phụ thuộc vào giá trị này
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Giá trị <= MIN_VALUE (0, thời gian âm do lệch đồng hồ) được đếm chung vào bin ZERO_KEY
+MIN_VALUE = 1e-9
+ZERO_KEY = -32768
+
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+_HEADER = struct.Struct('<dI')
+_BIN = struct.Struct('<hQ')
+
+def sketch_key(value: float) -> int:
+    """Bin chứa value: ceil(log_gamma(value))"""
+    if value <= MIN_VALUE:
+        return ZERO_KEY
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+def sketch_key_sql(column):
+    """Biểu thức SQL tính bin của cột (PostgreSQL, SQLite >= 3.35 có ln/ceil), khớp với sketch_key"""
+    return case(
+        (column > MIN_VALUE, cast(func.ceil(func.ln(column) / _LOG_GAMMA), Integer)),
+        else_=ZERO_KEY
+    )
+
+def sketch_key_arrow(values):
+    """Bin của từng phần tử mảng pyarrow (dữ liệu lưu trữ), khớp với sketch_key; null giữ nguyên null"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    keys = pc.cast(pc.ceil(pc.divide(pc.ln(pc.max_element_wise(values, MIN_VALUE)), _LOG_GAMMA)), pa.int64())
+    return pc.if_else(pc.greater(values, MIN_VALUE), keys, pa.scalar(ZERO_KEY, pa.int64()))
+
+def _bin_value(key: int) -> float:
+    """Giá trị đại diện của bin (sai số tương đối <= RELATIVE_ACCURACY với mọi giá trị trong bin)"""
+    if key == ZERO_KEY:
+        return 0.0
+    return 2 * _GAMMA ** key / (_GAMMA + 1)
+
+class DDSketch:
+    """Sketch phân vị DDSketch: đếm giá trị theo bin logarit, gộp được bằng cách cộng số đếm từng bin
+
+    Percentile bất kỳ có sai số tương đối <= RELATIVE_ACCURACY, không cần giữ hay sắp xếp giá trị gốc.
+    Bộ nhớ tỉ lệ với log(max/min) của dữ liệu (vài trăm bin cho thời gian xử lý), không theo số giá trị.
+    """
+
+    __slots__ = ('bins', 'count')
+
+    def __init__(self, bins: Optional[Dict[int, int]] = None):
+        self.bins: Dict[int, int] = {}
+        self.count = 0
+        if bins:
+            self.add_bins(bins.items())
+
+    def add(self, value: Optional[float], count: int = 1):
+        """Thêm một giá trị (None bị bỏ qua)"""
+        if value is None:
+            return
+        key = sketch_key(value)
+        self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+
+    def add_bins(self, bins: Iterable[Tuple[int, int]]):
+        """Cộng các cặp (bin, số đếm) đã tổng hợp sẵn (rollup, GROUP BY bin)"""
+        for key, count in bins:
+            if count:
+                key, count = int(key), int(count)
+                self.bins[key] = self.bins.get(key, 0) + count
+                self.count += count
+
+    def merge(self, other: 'DDSketch') -> 'DDSketch':
+        """Gộp sketch khác vào sketch này"""
+        self.add_bins(other.bins.items())
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Giá trị tại phân vị q (0..1); None nếu sketch rỗng"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return _bin_value(key)
+        return _bin_value(max(self.bins))
+
+    def percentiles(self) -> Dict[str, Optional[float]]:
+        """p50/p95/p99 và số giá trị"""
+        result = {name: self.quantile(q) for name, q in PERCENTILES}
+        result['count'] = self.count
+        return result
+
+    def to_bytes(self) -> bytes:
+        """Dạng nhị phân để lưu vào database"""
+        return _HEADER.pack(RELATIVE_ACCURACY, len(self.bins)) + b''.join(
+            _BIN.pack(key, count) for key, count in sorted(self.bins.items())
+        )
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> 'DDSketch':
+        """Đọc sketch đã lưu (None / rỗng: sketch rỗng)"""
+        sketch = cls()
+        if not data:
+            return sketch
+        accuracy, size = _HEADER.unpack_from(data)
+        if accuracy != RELATIVE_ACCURACY:
+            raise ValueError(f"Sketch có sai số {accuracy}, cần {RELATIVE_ACCURACY}")
+        sketch.add_bins(_BIN.unpack_from(data, _HEADER.size + i * _BIN.size) for i in range(size))
+        return sketch
@@ -0,0 +1,84 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, NamedTuple, Optional, Tuple
+from app.core.config import settings
+
+class AuthUser(NamedTuple):
+    """Bản sao chỉ đọc của User dùng cho xác thực (không gắn với session database)"""
+    id: int
+    username: str
+    is_admin: bool
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, user) -> 'AuthUser':
+        updated_at = user.updated_at
+        if updated_at is not None and updated_at.tzinfo is None:
+            # SQLite trả về datetime không có timezone (giá trị UTC)
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return cls(user.id, user.username, bool(user.is_admin), updated_at)
+
+class UserCache:
+    """Cache user_id -> AuthUser cho get_current_user (có TTL, an toàn đa luồng)
+
+    UserService gọi invalidate khi đổi mật khẩu, đổi quyền admin hoặc xóa user. Invalidation chỉ trong
+    process: khi chạy nhiều worker uvicorn TTL là giới hạn độ cũ giữa các process.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[AuthUser, float]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get_or_load(self, user_id: int, load: Callable[[], Optional[AuthUser]]) -> Optional[AuthUser]:
+        """Lấy user trong cache, hoặc đọc từ database bằng load() rồi ghi vào cache (None: không tồn tại)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+            self._misses += 1
+            generation = self._generations.get(user_id, 0)
+
+        user = load()
+        if user is not None and self.ttl_seconds > 0:
+            with self._lock:
+                # Bỏ kết quả nếu user bị invalidate trong lúc đọc (có thể là dữ liệu trước khi đổi)
+                if self._generations.get(user_id, 0) == generation:
+                    self._entries[user_id] = (user, time.monotonic() + self.ttl_seconds)
+        return user
+
+    def invalidate(self, user_id: int):
+        """Xóa cache của user (dữ liệu xác thực vừa thay đổi)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._invalidations += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của cache"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'invalidations': self._invalidations
+            }
+
+# Instance global
+user_cache = UserCache(settings.USER_CACHE_TTL_SECONDS)
@@ -1,6 +1,7 @@
 import json
 from typing import Dict, Any, Optional
-from fastapi import Request, Query
+from fastapi import Request, Query, HTTPException, status
+from app.core.pagination import Keyset, decode_cursor
 
 def parse_json_param(param_value: str) -> Optional[Dict[str, Any]]:
     """
@@ -73,6 +74,12 @@ def extract_common_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
         if isinstance(limit, int) and 1 <= limit <= 1000:
             common_filters['limit'] = limit
     
+    # Cursor phân trang (next_cursor của trang trước)
+    if 'cursor' in filters:
+        cursor = filters['cursor']
+        if isinstance(cursor, str) and cursor:
+            common_filters['cursor'] = cursor
+    
     # User ID filter
     if 'userId' in filters:
         user_id = filters['userId']
@@ -91,4 +98,13 @@ def extract_common_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
         if isinstance(include_details, bool):
             common_filters['include_details'] = include_details
     
-    return common_filters 
\ No newline at end of file
+    return common_filters 
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Keyset]:
+    """
+    Giải mã cursor phân trang, trả về lỗi 400 nếu cursor không hợp lệ
+    """
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
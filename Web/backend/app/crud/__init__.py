@@ -1,20 +1,51 @@
 # Database CRUD operations package
 
 from .emotion_crud import (
+    get_period_start,
     create_emotion_result,
+    insert_emotion_result,
+    bulk_create_emotion_results,
+    ingest_emotion_results,
     update_emotion_result,
+    count_emotions,
+    get_emotion_timeline,
     get_emotion_stats,
     get_all_emotion_stats,
     get_emotion_history,
+    get_performance_totals,
+    get_latency_bins,
+    get_session_performance,
+    summarize_performance,
     get_real_performance_stats
 )
 
+from .rollup_crud import (
+    get_rollup_watermark,
+    init_rollup_watermark,
+    set_rollup_watermark,
+    reset_rollups,
+    compact_rollups,
+    compact_latency_sketches,
+    upsert_rollups,
+    upsert_latency_sketches,
+    add_late_results,
+    get_rollup_emotion_counts,
+    get_rollup_performance_totals,
+    get_rollup_latency_bins,
+    get_first_result_time
+)
+
 from .session_crud import (
     create_session,
+    insert_session,
     update_session,
+    increment_session_stats,
     get_user_sessions,
     get_session_by_id,
-    end_session
+    get_active_session_id,
+    end_session,
+    merge_session_sketch,
+    reap_stale_sessions
 )
 
 from .user_crud import (
@@ -22,29 +53,65 @@ from .user_crud import (
     get_user_by_id,
     get_user_by_username,
     get_all_users,
+    rehash_user_password,
+    get_existing_usernames,
+    bulk_create_users,
     delete_user
 )
 
 __all__ = [
     # Emotion CRUD
+    "get_period_start",
     "create_emotion_result",
+    "insert_emotion_result",
+    "bulk_create_emotion_results",
+    "ingest_emotion_results",
     "update_emotion_result", 
+    "count_emotions",
+    "get_emotion_timeline",
     "get_emotion_stats",
     "get_all_emotion_stats",
     "get_emotion_history",
+    "get_performance_totals",
+    "get_latency_bins",
+    "get_session_performance",
+    "summarize_performance",
     "get_real_performance_stats",
     
+    # Rollup CRUD
+    "get_rollup_watermark",
+    "init_rollup_watermark",
+    "set_rollup_watermark",
+    "reset_rollups",
+    "compact_rollups",
+    "compact_latency_sketches",
+    "upsert_rollups",
+    "upsert_latency_sketches",
+    "add_late_results",
+    "get_rollup_emotion_counts",
+    "get_rollup_performance_totals",
+    "get_rollup_latency_bins",
+    "get_first_result_time",
+    
     # Session CRUD
     "create_session",
+    "insert_session",
     "update_session",
+    "increment_session_stats",
     "get_user_sessions", 
     "get_session_by_id",
+    "get_active_session_id",
     "end_session",
+    "merge_session_sketch",
+    "reap_stale_sessions",
     
     # User CRUD
     "create_user",
     "get_user_by_id",
     "get_user_by_username",
     "get_all_users",
+    "rehash_user_password",
+    "get_existing_usernames",
+    "bulk_create_users",
     "delete_user"
 ] 
\ No newline at end of file
@@ -1,7 +1,34 @@
+import io
+import csv
+import json
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text, cast, BigInteger
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from app.models.models import EmotionResult, AnalysisSession
+from app.core.emotion_codec import NO_FACE_CODE, encode_emotion, decode_emotion, pack_scores
+from app.core.pagination import Keyset, keyset_before
+from app.core.sketch import sketch_key_sql
+from app.crud.rollup_crud import add_late_results
+
+def get_period_start(period: str) -> Optional[datetime]:
+    """Mốc bắt đầu của khoảng thống kê (UTC, có timezone)
+    
+    Dùng datetime có timezone để so sánh trực tiếp với cột timestamptz: giá trị là
+    hằng số lúc lập kế hoạch nên PostgreSQL loại bỏ được partition không liên quan.
+    """
+    now = datetime.now(timezone.utc)
+    if period == 'day':
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif period == 'week':
+        start = now - timedelta(days=now.weekday())
+        return start.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif period == 'month':
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif period == 'year':
+        return now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    return None
 
 def create_emotion_result(db: Session, user_id: int, emotion: str, score: float = None, 
                          faces_detected: int = 0, dominant_emotion: str = None, 
@@ -11,18 +38,18 @@ def create_emotion_result(db: Session, user_id: int, emotion: str, score: float
                          face_position: dict = None, analysis_duration: float = None,
                          confidence_level: float = None,
                          processing_time: float = None, avg_fps: float = None, image_size: str = None, cache_hits: int = None):
-    """Tạo kết quả phân tích cảm xúc với thông tin chi tiết"""
+    """Tạo kết quả phân tích cảm xúc với thông tin chi tiết
+    
+    dominant_emotion_vn và emotions_scores_vn được suy ra khi đọc, không lưu.
+    """
     db_result = EmotionResult(
         user_id=user_id,
-        emotion=emotion,
+        emotion_code=encode_emotion(emotion or dominant_emotion),
         score=score,
         faces_detected=faces_detected,
-        dominant_emotion=dominant_emotion,
-        dominant_emotion_vn=dominant_emotion_vn,
         dominant_emotion_score=dominant_emotion_score,
         engagement=engagement,
-        emotions_scores=emotions_scores,
-        emotions_scores_vn=emotions_scores_vn,
+        scores_packed=pack_scores(emotions_scores),
         image_quality=image_quality,
         face_position=face_position,
         analysis_duration=analysis_duration,
@@ -37,6 +64,99 @@ def create_emotion_result(db: Session, user_id: int, emotion: str, score: float
     db.refresh(db_result)
     return db_result
 
+def insert_emotion_result(db: Session, record: Dict[str, Any], commit: bool = True) -> int:
+    """Thêm một kết quả phân tích, lấy id qua RETURNING (không cần refresh)"""
+    result_id = db.execute(
+        insert(EmotionResult).values(**record).returning(EmotionResult.id)
+    ).scalar_one()
+    if commit:
+        db.commit()
+    return result_id
+
+# Đủ cột để cộng dồn phiên và cộng kết quả muộn vào rollup theo giờ
+_INGEST_RETURNING = ('client_result_id', 'user_id', 'timestamp', 'emotion_code', 'faces_detected',
+                     'score', 'image_quality', 'processing_time', 'avg_fps')
+
+def _group_null_columns(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """insertmanyvalues tách lô mỗi khi một cột đổi giữa NULL và có giá trị: gom các dòng cùng kiểu lại"""
+    return sorted(records, key=lambda record: tuple(value is None for value in record.values()))
+
+def bulk_create_emotion_results(db: Session, records: List[Dict[str, Any]]):
+    """Ghi nhiều kết quả phân tích bằng một lệnh INSERT nhiều dòng và một commit
+    
+    Buffer write-behind có thể flush sau khi compactor đã tổng hợp qua giờ của dòng: dòng có timestamp
+    trước mốc rollup được cộng vào rollup theo giờ trong cùng transaction (như ingest_emotion_results).
+    """
+    if not records:
+        return 0
+    stmt = insert(EmotionResult).returning(*(EmotionResult.__table__.c[column] for column in _INGEST_RETURNING))
+    inserted = db.execute(stmt, _group_null_columns(records)).all()
+    add_late_results(db, inserted)
+    db.commit()
+    return len(inserted)
+
+def _csv_value(value):
+    """Giá trị cho COPY ... (FORMAT csv): ô trống là NULL, bytea dạng hex"""
+    if isinstance(value, bytes):
+        return '\\x' + value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+def _copy_ingest(db: Session, records: List[Dict[str, Any]]):
+    """PostgreSQL: COPY vào bảng tạm rồi INSERT ... SELECT ... ON CONFLICT DO NOTHING"""
+    columns = list(records[0])
+    column_list = ', '.join(columns)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        writer.writerow([_csv_value(record[column]) for column in columns])
+    buffer.seek(0)
+    
+    # Bảng tạm sống theo connection (pool) và được TRUNCATE sau mỗi lô: không tạo/xóa catalog mỗi request.
+    # Không dùng LIKE để không kế thừa default nextval của id (tránh tiêu tốn sequence)
+    db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS emotion_results_ingest AS "
+        f"SELECT {column_list} FROM emotion_results WITH NO DATA"
+    ))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY emotion_results_ingest ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+    inserted = db.execute(text(
+        f"INSERT INTO emotion_results ({column_list}) SELECT {column_list} FROM emotion_results_ingest "
+        f"ON CONFLICT (user_id, client_result_id, timestamp) WHERE client_result_id IS NOT NULL DO NOTHING "
+        f"RETURNING {', '.join(_INGEST_RETURNING)}"
+    )).all()
+    db.execute(text("TRUNCATE emotion_results_ingest"))
+    return inserted
+
+def ingest_emotion_results(db: Session, records: List[Dict[str, Any]], commit: bool = True):
+    """Ghi nhiều kết quả từ client offline, bỏ qua bản ghi đã có (user_id, client_result_id, timestamp)
+    
+    PostgreSQL dùng COPY qua bảng tạm, SQLite dùng INSERT nhiều dòng; cả hai ON CONFLICT DO NOTHING
+    nên gửi lại cùng lô sau khi mất mạng không tạo dòng trùng. Mọi record phải có cùng tập key.
+    Dòng có timestamp trước mốc rollup được cộng thẳng vào rollup theo giờ trong cùng transaction.
+    Trả về các dòng thực sự được ghi để cộng dồn thống kê phiên.
+    """
+    if not records:
+        return []
+    if db.get_bind().dialect.name == 'postgresql':
+        inserted = _copy_ingest(db, records)
+    else:
+        stmt = sqlite_insert(EmotionResult).on_conflict_do_nothing(
+            index_elements=['user_id', 'client_result_id', 'timestamp'],
+            index_where=EmotionResult.client_result_id.isnot(None)
+        ).returning(*(EmotionResult.__table__.c[column] for column in _INGEST_RETURNING))
+        inserted = db.execute(stmt, _group_null_columns(records)).all()
+    add_late_results(db, inserted)
+    if commit:
+        db.commit()
+    return inserted
+
 def update_emotion_result(db: Session, result_id: int, **kwargs):
     """Cập nhật emotion result"""
     db_result = db.query(EmotionResult).filter(EmotionResult.id == result_id).first()
@@ -48,126 +168,78 @@ def update_emotion_result(db: Session, result_id: int, **kwargs):
         db.refresh(db_result)
     return db_result
 
-def get_emotion_stats(db: Session, user_id: int, period: str = 'day'):
-    """Lấy thống kê cảm xúc theo thời gian"""
-    now = datetime.utcnow()
-    if period == 'day':
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'week':
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'month':
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'year':
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start = None
+def get_performance_totals(db: Session, start: Optional[datetime], user_id: Optional[int] = None) -> Dict[str, float]:
+    """Tổng thành phần của thống kê hiệu suất bằng một query tổng hợp (một dòng kết quả)
     
-    q = db.query(EmotionResult.emotion, func.count(EmotionResult.id)).filter(
-        EmotionResult.user_id == user_id,
-        EmotionResult.faces_detected > 0,
-        EmotionResult.emotion != 'no_face_detected'  # Loại trừ những lần không phát hiện khuôn mặt
-    )
+    Dùng COUNT/SUM ... FILTER thay vì tải từng EmotionResult về Python.
+    """
+    detected = EmotionResult.faces_detected > 0
+    row = db.query(
+        func.count(),
+        func.count().filter(detected),
+        func.sum(EmotionResult.image_quality).filter(detected),
+        func.count(EmotionResult.image_quality).filter(detected),
+        func.sum(EmotionResult.score).filter(detected, EmotionResult.score > 0),
+        func.count(EmotionResult.score).filter(detected, EmotionResult.score > 0),
+        func.sum(EmotionResult.processing_time),
+        func.count(EmotionResult.processing_time)
+    ).select_from(EmotionResult)
+    if user_id is not None:
+        row = row.filter(EmotionResult.user_id == user_id)
     if start:
-        q = q.filter(EmotionResult.timestamp >= start)
-    q = q.group_by(EmotionResult.emotion)
-    return dict(q.all())
-
-def get_all_emotion_stats(db: Session, period: str = 'day'):
-    """Lấy thống kê tổng hợp cho admin"""
-    now = datetime.utcnow()
-    if period == 'day':
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'week':
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'month':
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'year':
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start = None
+        row = row.filter(EmotionResult.timestamp >= start)
+    values = row.one()
     
-    q = db.query(EmotionResult.emotion, func.count(EmotionResult.id)).filter(
-        EmotionResult.faces_detected > 0,
-        EmotionResult.emotion != 'no_face_detected'  # Loại trừ những lần không phát hiện khuôn mặt
-    )
-    if start:
-        q = q.filter(EmotionResult.timestamp >= start)
-    q = q.group_by(EmotionResult.emotion)
-    return dict(q.all())
+    keys = ('total_analyses', 'successful_detections', 'image_quality_sum', 'image_quality_count',
+            'score_sum', 'score_count', 'processing_time_sum', 'processing_time_count')
+    # SUM trên tập rỗng trả về NULL
+    return {key: value or 0 for key, value in zip(keys, values)}
 
-def get_emotion_history(db: Session, user_id: int, limit: int = 100):
-    """Lấy lịch sử phân tích cảm xúc"""
-    results = db.query(EmotionResult).filter(
-        EmotionResult.user_id == user_id,
-        EmotionResult.faces_detected > 0,
-        EmotionResult.emotion != 'no_face_detected'  # Loại trừ những lần không phát hiện khuôn mặt
-    ).order_by(EmotionResult.timestamp.desc()).limit(limit).all()
-    
-    return [
-        {
-            "id": result.id,
-            "emotion": result.emotion,
-            "score": result.score,
-            "timestamp": result.timestamp,
-            "image_quality": result.image_quality,
-            "processing_time": result.processing_time
-        }
-        for result in results
-    ]
-
-def get_real_performance_stats(db: Session, user_id: int, period: str = 'day'):
-    """Lấy thống kê hiệu suất thực từ database"""
-    now = datetime.utcnow()
-    if period == 'day':
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'week':
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'month':
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'year':
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start = None
-    
-    # Lấy thống kê từ EmotionResult
-    emotion_query = db.query(EmotionResult).filter(EmotionResult.user_id == user_id)
+def get_latency_bins(db: Session, start: Optional[datetime], user_id: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Các cặp (bin, số đếm) DDSketch của thời gian xử lý từ mốc start bằng GROUP BY (không sắp xếp dòng gốc)"""
+    key = sketch_key_sql(EmotionResult.processing_time)
+    query = db.query(key, func.count()).filter(EmotionResult.processing_time != None)
+    if user_id is not None:
+        query = query.filter(EmotionResult.user_id == user_id)
     if start:
-        emotion_query = emotion_query.filter(EmotionResult.timestamp >= start)
-    
-    emotion_results = emotion_query.all()
-    
-    # Lấy thống kê từ AnalysisSession
-    session_query = db.query(AnalysisSession).filter(AnalysisSession.user_id == user_id)
+        query = query.filter(EmotionResult.timestamp >= start)
+    return query.group_by(key).all()
+
+def get_session_performance(db: Session, start: Optional[datetime], user_id: Optional[int] = None):
+    """Số phiên và FPS trung bình của các phiên bằng một query tổng hợp"""
+    query = db.query(func.count(), func.avg(AnalysisSession.avg_fps)).select_from(AnalysisSession)
+    if user_id is not None:
+        query = query.filter(AnalysisSession.user_id == user_id)
     if start:
-        session_query = session_query.filter(AnalysisSession.session_start >= start)
+        query = query.filter(AnalysisSession.session_start >= start)
+    total_sessions, average_fps = query.one()
+    return total_sessions, average_fps or 0
+
+def summarize_performance(totals: Dict[str, float], total_sessions: int, average_fps: float,
+                          archived: Optional[Dict[str, float]] = None):
+    """Tính thống kê hiệu suất từ tổng thành phần
     
-    sessions = session_query.all()
+    archived: tổng thành phần (tổng/số lượng) của phần dữ liệu không nằm trong bảng gốc (file lưu trữ,
+    rollup theo giờ), được cộng trước khi chia để trung bình đúng trên toàn bộ khoảng thời gian.
+    """
+    totals = dict(totals)
+    for key, value in (archived or {}).items():
+        totals[key] += value
     
     # Tính toán thống kê thực
-    total_analyses = len(emotion_results)
-    successful_detections = len([r for r in emotion_results if r.faces_detected > 0])
+    total_analyses = totals['total_analyses']
+    successful_detections = totals['successful_detections']
     failed_detections = total_analyses - successful_detections
     detection_rate = (successful_detections / total_analyses * 100) if total_analyses > 0 else 0
     
     # Tính chất lượng ảnh trung bình (chỉ từ những lần thành công)
-    successful_results = [r for r in emotion_results if r.faces_detected > 0]
-    image_qualities = [r.image_quality for r in successful_results if r.image_quality is not None]
-    average_image_quality = (sum(image_qualities) / len(image_qualities) * 100) if image_qualities else 0
+    average_image_quality = (totals['image_quality_sum'] / totals['image_quality_count'] * 100) if totals['image_quality_count'] else 0
     
     # Tính độ tương tác trung bình (chỉ từ những lần thành công)
-    scores = [r.score for r in successful_results if r.score is not None and r.score > 0]
-    average_emotion_score = (sum(scores) / len(scores) * 100) if scores else 0
-    
-    # Tính FPS trung bình từ sessions
-    fps_values = [s.avg_fps for s in sessions if s.avg_fps is not None]
-    average_fps = sum(fps_values) / len(fps_values) if fps_values else 0
+    average_emotion_score = (totals['score_sum'] / totals['score_count'] * 100) if totals['score_count'] else 0
     
     # Tính thời gian xử lý trung bình (từ tất cả các lần phân tích)
-    processing_times = [r.processing_time for r in emotion_results if r.processing_time is not None]
-    average_processing_time = sum(processing_times) / len(processing_times) if processing_times else 0
+    average_processing_time = totals['processing_time_sum'] / totals['processing_time_count'] if totals['processing_time_count'] else 0
     
     return {
         'total_analyses': total_analyses,
@@ -178,79 +250,104 @@ def get_real_performance_stats(db: Session, user_id: int, period: str = 'day'):
         'average_emotion_score': average_emotion_score,
         'average_fps': average_fps,
         'average_processing_time': average_processing_time,
-        'total_sessions': len(sessions)
+        'total_sessions': total_sessions
     }
 
-def get_all_users_performance_stats(db: Session, period: str = 'day'):
-    """Lấy thống kê hiệu suất tổng hợp của tất cả users"""
-    now = datetime.utcnow()
-    if period == 'day':
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'week':
-        start = now - timedelta(days=now.weekday())
-        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'month':
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    elif period == 'year':
-        start = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start = None
-    
-    # Lấy thống kê từ EmotionResult cho tất cả users
-    emotion_query = db.query(EmotionResult)
-    if start:
-        emotion_query = emotion_query.filter(EmotionResult.timestamp >= start)
-    
-    emotion_results = emotion_query.all()
-    
-    # Lấy thống kê từ AnalysisSession cho tất cả users
-    session_query = db.query(AnalysisSession)
+def count_emotions(db: Session, start: Optional[datetime], user_id: Optional[int] = None) -> Dict[str, int]:
+    """Số lần mỗi cảm xúc từ mốc start (None: toàn bộ), của một user hoặc tất cả users"""
+    q = db.query(EmotionResult.emotion_code, func.count(EmotionResult.id)).filter(
+        EmotionResult.faces_detected > 0,
+        EmotionResult.emotion_code != NO_FACE_CODE  # Loại trừ những lần không phát hiện khuôn mặt
+    )
+    if user_id is not None:
+        q = q.filter(EmotionResult.user_id == user_id)
     if start:
-        session_query = session_query.filter(AnalysisSession.session_start >= start)
-    
-    sessions = session_query.all()
-    
-    # Tính toán thống kê tổng hợp
-    total_analyses = len(emotion_results)
-    successful_detections = len([r for r in emotion_results if r.faces_detected > 0])
-    failed_detections = total_analyses - successful_detections
-    detection_rate = (successful_detections / total_analyses * 100) if total_analyses > 0 else 0
-    
-    # Tính chất lượng ảnh trung bình (chỉ từ những lần thành công)
-    successful_results = [r for r in emotion_results if r.faces_detected > 0]
-    image_qualities = [r.image_quality for r in successful_results if r.image_quality is not None]
-    average_image_quality = (sum(image_qualities) / len(image_qualities) * 100) if image_qualities else 0
-    
-    # Tính độ tương tác trung bình (chỉ từ những lần thành công)
-    scores = [r.score for r in successful_results if r.score is not None and r.score > 0]
-    average_emotion_score = (sum(scores) / len(scores) * 100) if scores else 0
-    
-    # Tính FPS trung bình từ sessions
-    fps_values = [s.avg_fps for s in sessions if s.avg_fps is not None]
-    average_fps = sum(fps_values) / len(fps_values) if fps_values else 0
-    
-    # Tính thời gian xử lý trung bình (từ tất cả các lần phân tích)
-    processing_times = [r.processing_time for r in emotion_results if r.processing_time is not None]
-    average_processing_time = sum(processing_times) / len(processing_times) if processing_times else 0
+        q = q.filter(EmotionResult.timestamp >= start)
+    q = q.group_by(EmotionResult.emotion_code)
+    return {decode_emotion(code): count for code, count in q.all()}
+
+def _epoch_bucket(db: Session, column, step_seconds: int):
+    """Biểu thức SQL: đầu khoảng step_seconds chứa timestamp, dạng epoch giây (UTC)"""
+    if db.get_bind().dialect.name == 'postgresql':
+        return cast(func.floor(func.extract('epoch', column) / step_seconds), BigInteger) * step_seconds
+    # SQLite lưu datetime dạng chuỗi UTC; strftime('%s') bỏ phần lẻ của giây, chia số nguyên làm tròn xuống
+    return cast(func.strftime('%s', column), BigInteger).op('/')(step_seconds) * step_seconds
+
+def get_emotion_timeline(db: Session, start: datetime, end: datetime, step_seconds: int,
+                         user_id: Optional[int] = None) -> List[Tuple[int, int, Optional[str], int, int]]:
+    """Số kết quả trong [start, end) theo (đầu khoảng, mã cảm xúc, mức tương tác), gom khoảng bằng SQL
+
+    Trả về các bộ (đầu khoảng epoch giây, emotion_code, engagement, số kết quả, số lần phát hiện khuôn mặt).
+    """
+    bucket = _epoch_bucket(db, EmotionResult.timestamp, step_seconds).label('bucket')
+    q = db.query(
+        bucket,
+        EmotionResult.emotion_code,
+        EmotionResult.engagement,
+        func.count(),
+        func.count().filter(EmotionResult.faces_detected > 0)
+    ).filter(
+        EmotionResult.timestamp >= start,
+        EmotionResult.timestamp < end
+    )
+    if user_id is not None:
+        q = q.filter(EmotionResult.user_id == user_id)
+    q = q.group_by(bucket, EmotionResult.emotion_code, EmotionResult.engagement)
+    return [(int(bucket), code, engagement, total, detected) for bucket, code, engagement, total, detected in q.all()]
+
+def get_emotion_stats(db: Session, user_id: int, period: str = 'day'):
+    """Lấy thống kê cảm xúc theo thời gian"""
+    return count_emotions(db, get_period_start(period), user_id)
+
+def get_all_emotion_stats(db: Session, period: str = 'day'):
+    """Lấy thống kê tổng hợp cho admin"""
+    return count_emotions(db, get_period_start(period))
+
+def _history_query(db: Session, before: Optional[Keyset] = None):
+    """Các lần phát hiện được khuôn mặt, mới nhất trước theo (timestamp, id); before: khóa keyset của trang trước"""
+    query = db.query(EmotionResult).filter(
+        EmotionResult.faces_detected > 0,
+        EmotionResult.emotion_code != NO_FACE_CODE  # Loại trừ những lần không phát hiện khuôn mặt
+    )
+    if before is not None:
+        query = query.filter(keyset_before(EmotionResult.timestamp, EmotionResult.id, before))
+    return query.order_by(EmotionResult.timestamp.desc(), EmotionResult.id.desc())
+
+def get_emotion_history(db: Session, user_id: int, limit: int = 100, before: Optional[Keyset] = None):
+    """Lấy lịch sử phân tích cảm xúc (before: chỉ lấy các dòng sau khóa keyset của trang trước)"""
+    results = _history_query(db, before).filter(EmotionResult.user_id == user_id).limit(limit).all()
     
-    return {
-        'total_analyses': total_analyses,
-        'successful_detections': successful_detections,
-        'failed_detections': failed_detections,
-        'detection_rate': detection_rate,
-        'average_image_quality': average_image_quality,
-        'average_emotion_score': average_emotion_score,
-        'average_fps': average_fps,
-        'average_processing_time': average_processing_time,
-        'total_sessions': len(sessions)
-    }
+    return [
+        {
+            "id": result.id,
+            "emotion": result.emotion,
+            "score": result.score,
+            "timestamp": result.timestamp,
+            "image_quality": result.image_quality,
+            "processing_time": result.processing_time
+        }
+        for result in results
+    ]
+
+def get_real_performance_stats(db: Session, user_id: int, period: str = 'day',
+                               archived: Optional[Dict[str, float]] = None):
+    """Lấy thống kê hiệu suất thực từ database (tổng hợp bằng SQL)"""
+    start = get_period_start(period)
+    totals = get_performance_totals(db, start, user_id)
+    total_sessions, average_fps = get_session_performance(db, start, user_id)
+    return summarize_performance(totals, total_sessions, average_fps, archived)
 
-def get_all_users_emotion_history(db: Session, limit: int = 100):
+def get_all_users_performance_stats(db: Session, period: str = 'day',
+                                    archived: Optional[Dict[str, float]] = None):
+    """Lấy thống kê hiệu suất tổng hợp của tất cả users (tổng hợp bằng SQL)"""
+    start = get_period_start(period)
+    totals = get_performance_totals(db, start)
+    total_sessions, average_fps = get_session_performance(db, start)
+    return summarize_performance(totals, total_sessions, average_fps, archived)
+
+def get_all_users_emotion_history(db: Session, limit: int = 100, before: Optional[Keyset] = None):
     """Lấy lịch sử phân tích cảm xúc tổng hợp của tất cả users"""
-    results = db.query(EmotionResult).filter(
-        EmotionResult.faces_detected > 0,
-        EmotionResult.emotion != 'no_face_detected'  # Loại trừ những lần không phát hiện khuôn mặt
-    ).order_by(EmotionResult.timestamp.desc()).limit(limit).all()
+    results = _history_query(db, before).limit(limit).all()
     
     return [
         {
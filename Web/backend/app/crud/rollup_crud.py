@@ -0,0 +1,237 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, delete, update, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime, timedelta, timezone
+from app.models.models import EmotionResult, EmotionHourlyRollup, LatencyHourlySketch, StatsRollupState
+from app.core.emotion_codec import NO_FACE_CODE, decode_emotion
+from app.core.sketch import sketch_key, sketch_key_sql
+
+_STATE_ID = 1
+
+# Cột cộng dồn của rollup (cùng ý nghĩa với tổng thành phần trong get_performance_totals)
+ROLLUP_SUM_COLUMNS = (
+    'result_count', 'detected_count', 'image_quality_sum', 'image_quality_count',
+    'score_sum', 'score_count', 'processing_time_sum', 'processing_time_count'
+)
+_ROLLUP_KEY_COLUMNS = ('user_id', 'hour', 'emotion_code')
+_SKETCH_KEY_COLUMNS = ('user_id', 'hour', 'bin')
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite trả về datetime không có timezone (giá trị UTC)"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+def hour_floor(moment: datetime) -> datetime:
+    """Đầu giờ (UTC) chứa moment"""
+    return _to_utc(moment).astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+def hour_ceil(moment: datetime) -> datetime:
+    """Đầu giờ (UTC) đầu tiên không nhỏ hơn moment"""
+    floor = hour_floor(moment)
+    return floor if floor == _to_utc(moment) else floor + timedelta(hours=1)
+
+def _insert(db: Session):
+    return pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+def _hour_bucket(db: Session, column):
+    """Biểu thức SQL làm tròn timestamp xuống đầu giờ UTC (không phụ thuộc TimeZone của session)"""
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.to_timestamp(func.floor(func.extract('epoch', column) / 3600) * 3600)
+    # SQLite lưu datetime dạng chuỗi UTC 'YYYY-MM-DD HH:MM:SS.ffffff'
+    return func.strftime('%Y-%m-%d %H:00:00.000000', column)
+
+def get_rollup_watermark(db: Session, lock: Optional[str] = None) -> Optional[datetime]:
+    """Mốc rollup (None nếu chưa khởi tạo)
+
+    lock='share': giữ mốc cho tới hết transaction (ghi kết quả muộn); lock='update': để dời mốc.
+    SQLite bỏ qua FOR SHARE/UPDATE (chỉ có một writer tại một thời điểm).
+    """
+    query = select(StatsRollupState.rolled_up_until).where(StatsRollupState.id == _STATE_ID)
+    if lock:
+        query = query.with_for_update(read=(lock == 'share'))
+    return _to_utc(db.execute(query).scalar())
+
+def init_rollup_watermark(db: Session, watermark: datetime):
+    """Tạo dòng mốc rollup; lỗi IntegrityError nếu process khác đã khởi tạo"""
+    db.add(StatsRollupState(id=_STATE_ID, rolled_up_until=watermark))
+    db.flush()
+
+def set_rollup_watermark(db: Session, watermark: datetime):
+    """Dời mốc rollup (gọi trong cùng transaction với compact_rollups)"""
+    db.execute(
+        update(StatsRollupState).where(StatsRollupState.id == _STATE_ID).values(rolled_up_until=watermark)
+    )
+
+def reset_rollups(db: Session, commit: bool = True) -> int:
+    """Xóa toàn bộ rollup và mốc (thống kê quay về đọc bảng gốc cho tới khi dựng lại)"""
+    get_rollup_watermark(db, lock='update')
+    db.execute(delete(StatsRollupState))
+    deleted = db.execute(delete(EmotionHourlyRollup)).rowcount
+    db.execute(delete(LatencyHourlySketch))
+    if commit:
+        db.commit()
+    return deleted
+
+def _upsert_statement(db: Session, stmt):
+    """ON CONFLICT (user_id, hour, emotion_code) DO UPDATE: cộng dồn vào dòng đã có"""
+    table = EmotionHourlyRollup.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=list(_ROLLUP_KEY_COLUMNS),
+        set_={column: table.c[column] + stmt.excluded[column] for column in ROLLUP_SUM_COLUMNS}
+    )
+
+def _upsert_sketch_statement(stmt):
+    """ON CONFLICT (user_id, hour, bin) DO UPDATE: cộng số đếm của bin (gộp DDSketch)"""
+    return stmt.on_conflict_do_update(
+        index_elements=list(_SKETCH_KEY_COLUMNS),
+        set_={'count': LatencyHourlySketch.__table__.c.count + stmt.excluded.count}
+    )
+
+def compact_latency_sketches(db: Session, start: Optional[datetime], end: datetime) -> int:
+    """Tổng hợp thời gian xử lý trong [start, end) thành bin DDSketch theo (user, giờ) bằng INSERT ... SELECT"""
+    hour = _hour_bucket(db, EmotionResult.timestamp)
+    key = sketch_key_sql(EmotionResult.processing_time)
+    query = select(EmotionResult.user_id, hour, key, func.count()).where(
+        EmotionResult.timestamp < end,
+        EmotionResult.processing_time != None
+    )
+    if start is not None:
+        query = query.where(EmotionResult.timestamp >= start)
+    query = query.group_by(EmotionResult.user_id, hour, key)
+
+    stmt = _insert(db)(LatencyHourlySketch).from_select(list(_SKETCH_KEY_COLUMNS) + ['count'], query)
+    return db.execute(_upsert_sketch_statement(stmt)).rowcount
+
+def upsert_latency_sketches(db: Session, bins: List[Dict[str, Any]]) -> int:
+    """Cộng dồn các bin đã tổng hợp sẵn (user_id, hour, bin, count), không commit"""
+    if not bins:
+        return 0
+    db.execute(_upsert_sketch_statement(_insert(db)(LatencyHourlySketch)), bins)
+    return len(bins)
+
+def compact_rollups(db: Session, start: Optional[datetime], end: datetime) -> int:
+    """Tổng hợp kết quả có timestamp trong [start, end) vào rollup bằng một INSERT ... SELECT ... GROUP BY
+
+    Kèm bin DDSketch của thời gian xử lý (compact_latency_sketches). Không commit: gọi trong cùng transaction
+    với set_rollup_watermark. Trả về số dòng rollup và sketch được ghi.
+    """
+    hour = _hour_bucket(db, EmotionResult.timestamp)
+    detected = EmotionResult.faces_detected > 0
+    scored = and_(detected, EmotionResult.score > 0)
+    query = select(
+        EmotionResult.user_id,
+        hour,
+        EmotionResult.emotion_code,
+        func.count(),
+        func.count().filter(detected),
+        func.coalesce(func.sum(EmotionResult.image_quality).filter(detected), 0.0),
+        func.count(EmotionResult.image_quality).filter(detected),
+        func.coalesce(func.sum(EmotionResult.score).filter(scored), 0.0),
+        func.count(EmotionResult.score).filter(scored),
+        func.coalesce(func.sum(EmotionResult.processing_time), 0.0),
+        func.count(EmotionResult.processing_time)
+    ).where(EmotionResult.timestamp < end)
+    if start is not None:
+        query = query.where(EmotionResult.timestamp >= start)
+    query = query.group_by(EmotionResult.user_id, hour, EmotionResult.emotion_code)
+
+    stmt = _insert(db)(EmotionHourlyRollup).from_select(list(_ROLLUP_KEY_COLUMNS + ROLLUP_SUM_COLUMNS), query)
+    rows = db.execute(_upsert_statement(db, stmt)).rowcount
+    return rows + compact_latency_sketches(db, start, end)
+
+def upsert_rollups(db: Session, rollups: List[Dict[str, Any]]) -> int:
+    """Cộng dồn các dòng rollup đã tổng hợp sẵn (user_id, hour, emotion_code + cột tổng), không commit"""
+    if not rollups:
+        return 0
+    db.execute(_upsert_statement(db, _insert(db)(EmotionHourlyRollup)), rollups)
+    return len(rollups)
+
+def add_late_results(db: Session, results: Iterable[Any]) -> int:
+    """Cộng các kết quả vừa ghi có timestamp trước mốc rollup (client offline gửi muộn) vào rollup
+
+    Gọi sau INSERT, trong cùng transaction: FOR SHARE chờ lượt compact đang chạy commit xong rồi đọc
+    mốc mới, nên mỗi dòng được tính đúng một lần (bởi compactor hoặc ở đây). Trả về số dòng đã cộng.
+    results: các dòng có user_id, timestamp, emotion_code, faces_detected, score, image_quality, processing_time.
+    """
+    watermark = get_rollup_watermark(db, lock='share')
+    if watermark is None:
+        return 0
+
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    sketch_bins: Dict[tuple, int] = {}
+    late = 0
+    for result in results:
+        timestamp = _to_utc(result.timestamp)
+        if timestamp >= watermark:
+            continue
+        late += 1
+        key = (result.user_id, hour_floor(timestamp), result.emotion_code)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict(zip(_ROLLUP_KEY_COLUMNS, key), **dict.fromkeys(ROLLUP_SUM_COLUMNS, 0))
+        group['result_count'] += 1
+        if (result.faces_detected or 0) > 0:
+            group['detected_count'] += 1
+            if result.image_quality is not None:
+                group['image_quality_sum'] += result.image_quality
+                group['image_quality_count'] += 1
+            if result.score is not None and result.score > 0:
+                group['score_sum'] += result.score
+                group['score_count'] += 1
+        if result.processing_time is not None:
+            group['processing_time_sum'] += result.processing_time
+            group['processing_time_count'] += 1
+            sketch = (result.user_id, key[1], sketch_key(result.processing_time))
+            sketch_bins[sketch] = sketch_bins.get(sketch, 0) + 1
+    upsert_rollups(db, list(groups.values()))
+    upsert_latency_sketches(db, [dict(zip(_SKETCH_KEY_COLUMNS, key), count=count) for key, count in sketch_bins.items()])
+    return late
+
+def get_rollup_emotion_counts(db: Session, start: Optional[datetime], end: datetime,
+                              user_id: Optional[int] = None) -> Dict[str, int]:
+    """Số lần mỗi cảm xúc (phát hiện được khuôn mặt) trong các giờ [start, end) từ rollup"""
+    q = db.query(EmotionHourlyRollup.emotion_code, func.sum(EmotionHourlyRollup.detected_count)).filter(
+        EmotionHourlyRollup.emotion_code != NO_FACE_CODE,
+        EmotionHourlyRollup.hour < end
+    )
+    if user_id is not None:
+        q = q.filter(EmotionHourlyRollup.user_id == user_id)
+    if start:
+        q = q.filter(EmotionHourlyRollup.hour >= start)
+    q = q.group_by(EmotionHourlyRollup.emotion_code)
+    return {decode_emotion(code): int(count) for code, count in q.all() if count}
+
+def get_rollup_performance_totals(db: Session, start: Optional[datetime], end: datetime,
+                                  user_id: Optional[int] = None) -> Dict[str, float]:
+    """Tổng thành phần của thống kê hiệu suất trong các giờ [start, end) từ rollup"""
+    q = db.query(*(func.sum(getattr(EmotionHourlyRollup, column)) for column in ROLLUP_SUM_COLUMNS)).filter(
+        EmotionHourlyRollup.hour < end
+    )
+    if user_id is not None:
+        q = q.filter(EmotionHourlyRollup.user_id == user_id)
+    if start:
+        q = q.filter(EmotionHourlyRollup.hour >= start)
+    values = q.one()
+
+    keys = ('total_analyses', 'successful_detections') + ROLLUP_SUM_COLUMNS[2:]
+    # SUM trên tập rỗng trả về NULL
+    return {key: value or 0 for key, value in zip(keys, values)}
+
+def get_rollup_latency_bins(db: Session, start: Optional[datetime], end: datetime,
+                            user_id: Optional[int] = None) -> List[tuple]:
+    """Các cặp (bin, số đếm) DDSketch của thời gian xử lý trong các giờ [start, end) từ rollup"""
+    q = db.query(LatencyHourlySketch.bin, func.sum(LatencyHourlySketch.count)).filter(
+        LatencyHourlySketch.hour < end
+    )
+    if user_id is not None:
+        q = q.filter(LatencyHourlySketch.user_id == user_id)
+    if start:
+        q = q.filter(LatencyHourlySketch.hour >= start)
+    return q.group_by(LatencyHourlySketch.bin).all()
+
+def get_first_result_time(db: Session) -> Optional[datetime]:
+    """Timestamp của kết quả cũ nhất còn trong bảng gốc"""
+    return _to_utc(db.query(func.min(EmotionResult.timestamp)).scalar())
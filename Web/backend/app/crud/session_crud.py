@@ -1,21 +1,60 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from sqlalchemy import func, update, select, or_, and_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional, List, Tuple
+from datetime import datetime, timedelta, timezone
+from app.core.enums import SessionStatus
 from app.models.models import AnalysisSession, EmotionResult
+from app.core.sketch import DDSketch
+
+# Điều kiện phiên đang mở, trùng với điều kiện của partial unique index ix_analysis_sessions_user_open
+_OPEN_SESSION = text("status = 'active'")
+
+def _session_expiry(max_session_duration: Optional[int]) -> Optional[datetime]:
+    """Thời điểm hết hạn của phiên theo thời lượng tối đa (giây)"""
+    if not max_session_duration:
+        return None
+    return datetime.now(timezone.utc) + timedelta(seconds=max_session_duration)
 
 def create_session(db: Session, user_id: int, camera_resolution: str = None, 
-                   analysis_interval: float = None):
+                   analysis_interval: float = None, max_session_duration: int = None):
     """Tạo phiên phân tích mới"""
     db_session = AnalysisSession(
         user_id=user_id,
         camera_resolution=camera_resolution,
-        analysis_interval=analysis_interval
+        analysis_interval=analysis_interval,
+        expires_at=_session_expiry(max_session_duration)
     )
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
     return db_session
 
+def insert_session(db: Session, user_id: int, camera_resolution: str = None,
+                   analysis_interval: float = None, max_session_duration: int = None,
+                   commit: bool = True) -> Optional[int]:
+    """Tạo phiên phân tích mới, lấy id qua RETURNING (không cần refresh)
+    
+    ON CONFLICT DO NOTHING trên index phiên đang mở: trả về None nếu user đã có phiên đang mở
+    (request song song vừa tạo), caller đọc lại phiên đó.
+    """
+    dialect_insert = pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+    session_id = db.execute(
+        dialect_insert(AnalysisSession).values(
+            user_id=user_id,
+            status=SessionStatus.ACTIVE.value,
+            camera_resolution=camera_resolution,
+            analysis_interval=analysis_interval,
+            expires_at=_session_expiry(max_session_duration)
+        ).on_conflict_do_nothing(
+            index_elements=['user_id'], index_where=_OPEN_SESSION
+        ).returning(AnalysisSession.id)
+    ).scalar()
+    if commit:
+        db.commit()
+    return session_id
+
 def update_session(db: Session, session_id: int, total_analyses: int = None,
                    successful_detections: int = None, failed_detections: int = None,
                    detection_rate: float = None, emotions_summary: dict = None,
@@ -39,6 +78,7 @@ def update_session(db: Session, session_id: int, total_analyses: int = None,
             db_session.average_engagement = average_engagement
         if session_end is not None:
             db_session.session_end = session_end
+            db_session.status = SessionStatus.ENDED.value
         if avg_processing_time is not None:
             db_session.avg_processing_time = avg_processing_time
         if avg_fps is not None:
@@ -52,6 +92,41 @@ def update_session(db: Session, session_id: int, total_analyses: int = None,
         db.refresh(db_session)
     return db_session
 
+def increment_session_stats(db: Session, session_id: int, analyses: int = 1, successful: int = 0,
+                            processing_time_sum: float = 0.0, fps_sum: float = 0.0, only_active: bool = False,
+                            commit: bool = True) -> bool:
+    """Cộng dồn thống kê phiên bằng một lệnh UPDATE nguyên tử (không đọc trước)
+    
+    Mọi biểu thức bên phải dùng giá trị cũ của dòng, nên trung bình được tính
+    từ tổng chạy (total_processing_time, total_fps) ngay trong database.
+    only_active=True: không cập nhật phiên đã kết thúc (trả về False).
+    """
+    total = func.coalesce(AnalysisSession.total_analyses, 0) + analyses
+    successful_total = func.coalesce(AnalysisSession.successful_detections, 0) + successful
+    processing_total = func.coalesce(AnalysisSession.total_processing_time, 0.0) + processing_time_sum
+    fps_total = func.coalesce(AnalysisSession.total_fps, 0.0) + fps_sum
+    
+    conditions = [AnalysisSession.id == session_id]
+    if only_active:
+        conditions.append(AnalysisSession.status == SessionStatus.ACTIVE.value)
+    
+    stmt = update(AnalysisSession).where(*conditions).values(
+        total_analyses=total,
+        successful_detections=successful_total,
+        failed_detections=func.coalesce(AnalysisSession.failed_detections, 0) + (analyses - successful),
+        detection_rate=successful_total * 100.0 / total,
+        total_processing_time=processing_total,
+        avg_processing_time=processing_total / total,
+        total_fps=fps_total,
+        avg_fps=fps_total / total,
+        last_activity_at=func.now()
+    ).execution_options(synchronize_session=False)
+    
+    result = db.execute(stmt)
+    if commit:
+        db.commit()
+    return result.rowcount > 0
+
 def get_user_sessions(db: Session, user_id: int, limit: int = 10):
     """Lấy danh sách phiên phân tích của user"""
     return db.query(AnalysisSession).filter(
@@ -66,14 +141,67 @@ def get_active_session_by_user_id(db: Session, user_id: int):
     """Lấy phiên phân tích đang hoạt động của user"""
     return db.query(AnalysisSession).filter(
         AnalysisSession.user_id == user_id,
-        AnalysisSession.session_end == None
+        AnalysisSession.status == SessionStatus.ACTIVE.value
     ).first()
 
+def get_active_session_id(db: Session, user_id: int) -> Optional[int]:
+    """Lấy id phiên phân tích đang hoạt động của user (chỉ đọc cột id)"""
+    return db.execute(
+        select(AnalysisSession.id).where(
+            AnalysisSession.user_id == user_id,
+            AnalysisSession.status == SessionStatus.ACTIVE.value
+        ).limit(1)
+    ).scalar()
+
 def end_session(db: Session, session_id: int):
     """Kết thúc phiên phân tích"""
     session = db.query(AnalysisSession).filter(AnalysisSession.id == session_id).first()
     if session:
         session.session_end = datetime.utcnow()
+        session.status = SessionStatus.ENDED.value
         db.commit()
         return True
-    return False 
\ No newline at end of file
+    return False
+
+def merge_session_sketch(db: Session, session_id: int, sketch: DDSketch, commit: bool = True) -> bool:
+    """Gộp sketch thời gian xử lý vào phiên (FOR UPDATE: các worker ghi phần của mình lần lượt)"""
+    if sketch.count == 0:
+        return False
+    stored = db.execute(
+        select(AnalysisSession.processing_time_sketch).where(AnalysisSession.id == session_id).with_for_update()
+    ).first()
+    if stored is None:
+        return False
+    merged = DDSketch.from_bytes(stored.processing_time_sketch).merge(sketch)
+    db.execute(
+        update(AnalysisSession).where(AnalysisSession.id == session_id)
+        .values(processing_time_sketch=merged.to_bytes())
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        db.commit()
+    return True
+
+def reap_stale_sessions(db: Session, idle_timeout: int, default_max_duration: int) -> List[Tuple[int, int]]:
+    """Đóng các phiên quá thời lượng tối đa hoặc không hoạt động quá idle_timeout giây
+    
+    Trả về danh sách (session_id, user_id) đã đóng.
+    """
+    now = datetime.now(timezone.utc)
+    idle_cutoff = now - timedelta(seconds=idle_timeout)
+    stmt = update(AnalysisSession).where(
+        AnalysisSession.status == SessionStatus.ACTIVE.value,
+        or_(
+            AnalysisSession.expires_at <= now,
+            and_(AnalysisSession.expires_at == None,
+                 AnalysisSession.session_start <= now - timedelta(seconds=default_max_duration)),
+            func.coalesce(AnalysisSession.last_activity_at, AnalysisSession.session_start) <= idle_cutoff
+        )
+    ).values(
+        session_end=now,
+        status=SessionStatus.ENDED.value
+    ).returning(AnalysisSession.id, AnalysisSession.user_id).execution_options(synchronize_session=False)
+    
+    reaped = [(row.id, row.user_id) for row in db.execute(stmt)]
+    db.commit()
+    return reaped 
\ No newline at end of file
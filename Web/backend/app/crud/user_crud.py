@@ -1,10 +1,16 @@
+from sqlalchemy import select, insert, update
 from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Set
 from app.models.models import User
 from app.core.auth import get_password_hash
 
-def create_user(db: Session, username: str, password: str, is_admin: bool = False):
-    """Tạo user mới"""
-    hashed_password = get_password_hash(password)
+# Số username mỗi câu IN khi kiểm tra trùng lúc import
+_USERNAME_CHUNK_SIZE = 500
+
+def create_user(db: Session, username: str, password: str, is_admin: bool = False, password_hash: Optional[str] = None):
+    """Tạo user mới (password_hash: hash đã tính sẵn ngoài event loop)"""
+    hashed_password = password_hash or get_password_hash(password)
     db_user = User(username=username, password_hash=hashed_password, is_admin=is_admin)
     db.add(db_user)
     db.commit()
@@ -23,20 +29,54 @@ def get_all_users(db: Session):
     """Lấy tất cả users"""
     return db.query(User).all()
 
-def update_user_password(db: Session, user_id: int, new_password: str):
-    """Cập nhật mật khẩu user"""
+def update_user_password(db: Session, user_id: int, new_password: str, password_hash: Optional[str] = None):
+    """Cập nhật mật khẩu user (password_hash: hash đã tính sẵn ngoài event loop)"""
     user = get_user_by_id(db, user_id)
     if user:
-        user.password_hash = get_password_hash(new_password)
+        user.password_hash = password_hash or get_password_hash(new_password)
+        # Đồng hồ của ứng dụng (cùng nguồn với iat của token): token phát hành trước mốc này bị thu hồi
+        user.updated_at = datetime.now(timezone.utc)
         db.commit()
         db.refresh(user)
     return user
 
+def rehash_user_password(db: Session, user_id: int, old_hash: str, new_hash: str) -> bool:
+    """Thay hash mật khẩu bằng hash mới (cost mới) của cùng mật khẩu khi đăng nhập
+
+    Giữ nguyên updated_at để không thu hồi token đang dùng; chỉ ghi nếu hash chưa bị đổi bởi
+    lần đổi mật khẩu chạy song song.
+    """
+    result = db.execute(
+        update(User)
+        .where(User.id == user_id, User.password_hash == old_hash)
+        .values(password_hash=new_hash, updated_at=User.updated_at)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+def get_existing_usernames(db: Session, usernames: Iterable[str]) -> Set[str]:
+    """Các username trong danh sách đã tồn tại"""
+    usernames = list(usernames)
+    existing = set()
+    for i in range(0, len(usernames), _USERNAME_CHUNK_SIZE):
+        chunk = usernames[i:i + _USERNAME_CHUNK_SIZE]
+        existing.update(db.execute(select(User.username).where(User.username.in_(chunk))).scalars())
+    return existing
+
+def bulk_create_users(db: Session, users: List[Dict[str, Any]]) -> int:
+    """Thêm nhiều user (username, password_hash, is_admin) trong một transaction"""
+    if not users:
+        return 0
+    db.execute(insert(User), users)
+    db.commit()
+    return len(users)
+
 def update_user_admin_status(db: Session, user_id: int, is_admin: bool):
     """Cập nhật trạng thái admin của user"""
     user = get_user_by_id(db, user_id)
     if user:
         user.is_admin = is_admin
+        user.updated_at = datetime.now(timezone.utc)
         db.commit()
         db.refresh(user)
     return user
@@ -1,4 +1,4 @@
 # Database models package
-from .models import User, EmotionResult, AnalysisSession, SystemLog
+from .models import User, EmotionResult, EmotionHourlyRollup, StatsRollupState, AnalysisSession, SystemLog
 
-__all__ = ["User", "EmotionResult", "AnalysisSession", "SystemLog"] 
\ No newline at end of file
+__all__ = ["User", "EmotionResult", "EmotionHourlyRollup", "StatsRollupState", "AnalysisSession", "SystemLog"] 
\ No newline at end of file
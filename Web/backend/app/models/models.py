@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, Boolean, Text, JSON, LargeBinary, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 from app.core.enums import SessionStatus
+from app.core.emotion_codec import encode_emotion, decode_emotion, translate_emotion, pack_scores, unpack_scores, translate_scores
 from datetime import datetime
 
 class User(Base):
@@ -20,6 +21,8 @@ class User(Base):
     emotion_results = relationship("EmotionResult", back_populates="user", cascade="all, delete-orphan")
     analysis_sessions = relationship("AnalysisSession", back_populates="user", cascade="all, delete-orphan")
     system_logs = relationship("SystemLog", back_populates="user", cascade="all, delete-orphan")
+    emotion_hourly_rollups = relationship("EmotionHourlyRollup", back_populates="user", cascade="all, delete-orphan")
+    latency_hourly_sketches = relationship("LatencyHourlySketch", back_populates="user", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', is_admin={self.is_admin})>"
@@ -30,15 +33,12 @@ class EmotionResult(Base):
     
     id = Column(Integer, primary_key=True, index=True, comment="ID kết quả")
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="ID người dùng")
-    emotion = Column(String(20), nullable=False, comment="Cảm xúc chính")
+    emotion_code = Column(SmallInteger, nullable=False, comment="Mã cảm xúc chính (-1: không phát hiện khuôn mặt)")
     score = Column(Float, comment="Điểm số cảm xúc")
     faces_detected = Column(Integer, default=0, comment="Số khuôn mặt phát hiện được")
-    dominant_emotion = Column(String(20), comment="Cảm xúc chiếm ưu thế")
-    dominant_emotion_vn = Column(String(50), comment="Cảm xúc chiếm ưu thế (tiếng Việt)")
     dominant_emotion_score = Column(Float, comment="Điểm số cảm xúc chiếm ưu thế")
     engagement = Column(String(20), comment="Mức độ tương tác")
-    emotions_scores = Column(JSON, comment="Điểm số tất cả cảm xúc")
-    emotions_scores_vn = Column(JSON, comment="Điểm số tất cả cảm xúc (tiếng Việt)")
+    scores_packed = Column(LargeBinary, nullable=True, comment="Điểm số 7 cảm xúc (float32 theo thứ tự model)")
     image_quality = Column(Float, comment="Chất lượng ảnh")
     face_position = Column(JSON, comment="Vị trí khuôn mặt")
     analysis_duration = Column(Float, comment="Thời gian phân tích")
@@ -47,14 +47,127 @@ class EmotionResult(Base):
     avg_fps = Column(Float, comment="FPS trung bình")
     image_size = Column(String(20), comment="Kích thước ảnh")
     cache_hits = Column(Integer, default=0, comment="Số lần cache hit")
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), comment="Thời gian tạo")
+    client_result_id = Column(String(64), nullable=True, comment="Id do client offline gửi lên (chống ghi trùng khi gửi lại)")
+    # Khóa partition trên PostgreSQL (khóa chính thực tế là (id, timestamp) khi bật partition)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="Thời gian tạo")
     
     # Relationships
     user = relationship("User", back_populates="emotion_results")
     
+    __table_args__ = (
+        # Thống kê hiệu suất / lịch sử theo user trong khoảng thời gian
+        Index("ix_emotion_results_user_timestamp", "user_id", "timestamp"),
+        # Thống kê toàn hệ thống theo khoảng thời gian
+        Index("ix_emotion_results_timestamp", "timestamp"),
+        # Chỉ các lần phát hiện được khuôn mặt: đếm theo cảm xúc (index-only scan) / lịch sử phân trang keyset (timestamp, id)
+        Index(
+            "ix_emotion_results_user_detected", "user_id", "timestamp", "id", "emotion_code",
+            postgresql_where=text("faces_detected > 0 AND emotion_code <> -1"),
+            sqlite_where=text("faces_detected > 0 AND emotion_code <> -1")
+        ),
+        Index(
+            "ix_emotion_results_detected", "timestamp", "id", "emotion_code",
+            postgresql_where=text("faces_detected > 0 AND emotion_code <> -1"),
+            sqlite_where=text("faces_detected > 0 AND emotion_code <> -1")
+        ),
+        # Idempotency cho bulk ingest; gồm timestamp vì unique index trên bảng partition phải chứa khóa partition
+        Index(
+            "uq_emotion_results_user_client_id", "user_id", "client_result_id", "timestamp", unique=True,
+            postgresql_where=text("client_result_id IS NOT NULL"),
+            sqlite_where=text("client_result_id IS NOT NULL")
+        ),
+    )
+    
+    # Nhãn và bản dịch được tính khi đọc từ emotion_code / scores_packed
+    @property
+    def emotion(self) -> str:
+        return decode_emotion(self.emotion_code)
+    
+    @emotion.setter
+    def emotion(self, label: str):
+        self.emotion_code = encode_emotion(label)
+    
+    @property
+    def dominant_emotion(self) -> str:
+        return self.emotion
+    
+    @property
+    def dominant_emotion_vn(self) -> str:
+        return translate_emotion(self.emotion)
+    
+    @property
+    def emotions_scores(self) -> dict:
+        return unpack_scores(self.scores_packed)
+    
+    @emotions_scores.setter
+    def emotions_scores(self, scores: dict):
+        self.scores_packed = pack_scores(scores)
+    
+    @property
+    def emotions_scores_vn(self) -> dict:
+        return translate_scores(self.emotions_scores)
+    
     def __repr__(self):
         return f"<EmotionResult(id={self.id}, user_id={self.user_id}, emotion='{self.emotion}', score={self.score})>"
 
+class EmotionHourlyRollup(Base):
+    """Model tổng hợp kết quả phân tích theo (user, giờ, cảm xúc) để thống kê không phải quét bảng gốc"""
+    __tablename__ = "emotion_hourly_rollups"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, comment="ID người dùng")
+    hour = Column(DateTime(timezone=True), primary_key=True, comment="Đầu giờ (UTC)")
+    emotion_code = Column(SmallInteger, primary_key=True, comment="Mã cảm xúc chính (-1: không phát hiện khuôn mặt)")
+    result_count = Column(Integer, nullable=False, default=0, comment="Số lần phân tích")
+    detected_count = Column(Integer, nullable=False, default=0, comment="Số lần phát hiện được khuôn mặt")
+    image_quality_sum = Column(Float, nullable=False, default=0.0, comment="Tổng chất lượng ảnh (lần phát hiện được)")
+    image_quality_count = Column(Integer, nullable=False, default=0, comment="Số giá trị chất lượng ảnh")
+    score_sum = Column(Float, nullable=False, default=0.0, comment="Tổng điểm cảm xúc > 0 (lần phát hiện được)")
+    score_count = Column(Integer, nullable=False, default=0, comment="Số giá trị điểm cảm xúc")
+    processing_time_sum = Column(Float, nullable=False, default=0.0, comment="Tổng thời gian xử lý")
+    processing_time_count = Column(Integer, nullable=False, default=0, comment="Số giá trị thời gian xử lý")
+    
+    # Relationships
+    user = relationship("User", back_populates="emotion_hourly_rollups")
+    
+    __table_args__ = (
+        # Thống kê toàn hệ thống theo khoảng thời gian (theo user dùng khóa chính)
+        Index("ix_emotion_hourly_rollups_hour", "hour"),
+    )
+    
+    def __repr__(self):
+        return f"<EmotionHourlyRollup(user_id={self.user_id}, hour={self.hour}, emotion_code={self.emotion_code}, result_count={self.result_count})>"
+
+class LatencyHourlySketch(Base):
+    """Model sketch phân vị thời gian xử lý theo (user, giờ): mỗi dòng là số đếm của một bin DDSketch
+
+    Gộp nhiều giờ / nhiều user bằng SUM(count) GROUP BY bin rồi tính percentile (app/core/sketch.py).
+    """
+    __tablename__ = "latency_hourly_sketches"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, comment="ID người dùng")
+    hour = Column(DateTime(timezone=True), primary_key=True, comment="Đầu giờ (UTC)")
+    bin = Column(SmallInteger, primary_key=True, autoincrement=False, comment="Bin DDSketch của thời gian xử lý")
+    count = Column(Integer, nullable=False, default=0, comment="Số lần phân tích trong bin")
+    
+    # Relationships
+    user = relationship("User", back_populates="latency_hourly_sketches")
+    
+    __table_args__ = (
+        # Percentile toàn hệ thống theo khoảng thời gian (theo user dùng khóa chính)
+        Index("ix_latency_hourly_sketches_hour", "hour"),
+    )
+    
+    def __repr__(self):
+        return f"<LatencyHourlySketch(user_id={self.user_id}, hour={self.hour}, bin={self.bin}, count={self.count})>"
+
+class StatsRollupState(Base):
+    """Mốc rollup: mọi kết quả trước mốc này đã nằm trong emotion_hourly_rollups (một dòng duy nhất)"""
+    __tablename__ = "stats_rollup_state"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False, comment="Luôn là 1")
+    rolled_up_until = Column(DateTime(timezone=True), nullable=False, comment="Đã tổng hợp đến trước giờ này (UTC)")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="Thời gian cập nhật")
+
 class AnalysisSession(Base):
     """Model phiên phân tích"""
     __tablename__ = "analysis_sessions"
@@ -63,6 +176,8 @@ class AnalysisSession(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="ID người dùng")
     session_start = Column(DateTime(timezone=True), server_default=func.now(), comment="Thời gian bắt đầu")
     session_end = Column(DateTime(timezone=True), nullable=True, comment="Thời gian kết thúc")
+    expires_at = Column(DateTime(timezone=True), nullable=True, comment="Hết hạn theo thời lượng tối đa")
+    last_activity_at = Column(DateTime(timezone=True), nullable=True, comment="Lần phân tích gần nhất")
     status = Column(String(20), default=SessionStatus.ACTIVE.value, comment="Trạng thái phiên")
     camera_resolution = Column(String(20), comment="Độ phân giải camera")
     analysis_interval = Column(Float, comment="Khoảng thời gian phân tích")
@@ -74,12 +189,24 @@ class AnalysisSession(Base):
     average_engagement = Column(Float, default=0.0, comment="Mức độ tương tác trung bình")
     avg_processing_time = Column(Float, default=0.0, comment="Thời gian xử lý trung bình")
     avg_fps = Column(Float, default=0.0, comment="FPS trung bình")
+    total_processing_time = Column(Float, default=0.0, server_default="0", comment="Tổng thời gian xử lý (để tính trung bình)")
+    total_fps = Column(Float, default=0.0, server_default="0", comment="Tổng FPS (để tính trung bình)")
     total_cache_hits = Column(Integer, default=0, comment="Tổng số cache hits")
     cache_hit_rate = Column(Float, default=0.0, comment="Tỷ lệ cache hit")
+    processing_time_sketch = Column(LargeBinary, nullable=True, comment="Sketch phân vị thời gian xử lý (DDSketch), ghi khi kết thúc phiên")
     
     # Relationships
     user = relationship("User", back_populates="analysis_sessions")
     
+    __table_args__ = (
+        # Partial unique index: mỗi user tối đa một phiên đang mở (đích ON CONFLICT khi tự tạo phiên)
+        Index(
+            "ix_analysis_sessions_user_open", "user_id", unique=True,
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'")
+        ),
+    )
+    
     def __repr__(self):
         return f"<AnalysisSession(id={self.id}, user_id={self.user_id}, status='{self.status}')>"
 
@@ -93,10 +220,23 @@ class SystemLog(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="ID người dùng (nếu có)")
     ip_address = Column(String(45), comment="Địa chỉ IP")
     user_agent = Column(Text, comment="User agent")
+    event_type = Column(String(50), nullable=True, comment="Loại sự kiện (emotion_analysis, session_start, ...)")
+    event_count = Column(Integer, default=1, server_default="1", nullable=False, comment="Số sự kiện gộp trong dòng log")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="Thời gian tạo")
     
     # Relationships
     user = relationship("User", back_populates="system_logs")
     
+    __table_args__ = (
+        # Danh sách log (phân trang keyset theo (created_at, id)) / thống kê theo khoảng thời gian, lọc thêm level hoặc user
+        Index("ix_system_logs_created_at", "created_at", "id"),
+        Index("ix_system_logs_level_created_at", "level", "created_at", "id"),
+        Index(
+            "ix_system_logs_user_created_at", "user_id", "created_at", "id",
+            postgresql_where=text("user_id IS NOT NULL"),
+            sqlite_where=text("user_id IS NOT NULL")
+        ),
+    )
+    
     def __repr__(self):
         return f"<SystemLog(id={self.id}, level='{self.level}', message='{self.message[:50]}...')>" 
\ No newline at end of file
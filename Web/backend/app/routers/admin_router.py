@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Request, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User
 from app.services.admin_service import AdminService
 from app.services.user_service import UserService
+from app.core.password_hasher import PasswordHasherBusy
 from app.core.utils import get_json_filters, extract_common_filters
 from typing import Dict, Any
 from pydantic import BaseModel, Field
@@ -26,7 +28,7 @@ def verify_admin(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.get("/overview")
-async def get_system_overview(
+def get_system_overview(
     current_user: User = Depends(verify_admin),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
@@ -118,7 +120,7 @@ async def delete_user_account(
         )
 
 @router.get("/statistics")
-async def get_system_statistics(
+def get_system_statistics(
     request: Request,
     current_user: User = Depends(verify_admin),
     db: Session = Depends(get_db)
@@ -196,7 +198,7 @@ async def create_user_by_admin(
 ) -> Dict[str, Any]:
     """Tạo user mới (chỉ admin)"""
     try:
-        result = UserService.create_user(db, user_data.username, user_data.password, user_data.is_admin)
+        result = await UserService.register_user(db, user_data.username, user_data.password, user_data.is_admin)
         
         if not result['success']:
             raise HTTPException(
@@ -208,8 +210,49 @@ async def create_user_by_admin(
         
     except HTTPException:
         raise
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Lỗi tạo user: {str(e)}"
+        )
+
+@router.post("/users/import")
+async def import_users_by_admin(
+    file: UploadFile = File(..., description="CSV có cột username, password và is_admin (không bắt buộc)"),
+    current_user: User = Depends(verify_admin),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Import user hàng loạt từ file CSV (chỉ admin), mật khẩu được hash trong process pool"""
+    try:
+        content = await file.read()
+        try:
+            text = content.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File CSV phải được mã hóa UTF-8"
+            )
+        
+        result = await run_in_threadpool(UserService.import_users_csv, db, text)
+        
+        if not result['success']:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=result['error']
+            )
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi import user: {str(e)}"
         ) 
\ No newline at end of file
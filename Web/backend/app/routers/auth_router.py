@@ -3,7 +3,8 @@ from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.auth import create_access_token, get_current_user
+from app.core.auth import create_access_token, get_current_user, user_claims
+from app.core.password_hasher import password_hasher, PasswordHasherBusy
 from app.services.user_service import UserService
 from app.models.models import User
 from typing import Dict, Any
@@ -33,7 +34,7 @@ async def login(
     """Đăng nhập user"""
     try:
         # Xác thực user
-        user_data = UserService.authenticate_user(db, login_data.username, login_data.password)
+        user_data = await UserService.authenticate_user(db, login_data.username, login_data.password)
         
         if not user_data:
             raise HTTPException(
@@ -43,7 +44,9 @@ async def login(
             )
         
         # Tạo access token
-        access_token = create_access_token(data={"sub": user_data["username"]})
+        access_token = create_access_token(
+            data=user_claims(user_data["id"], user_data["username"], user_data["is_admin"])
+        )
         
         return {
             "success": True,
@@ -54,6 +57,12 @@ async def login(
         
     except HTTPException:
         raise
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -67,7 +76,7 @@ async def register(
 ) -> Dict[str, Any]:
     """Đăng ký user mới"""
     try:
-        result = UserService.create_user(db, register_data.username, register_data.password, is_admin=False)
+        result = await UserService.register_user(db, register_data.username, register_data.password, is_admin=False)
         
         if not result['success']:
             raise HTTPException(
@@ -79,6 +88,12 @@ async def register(
         
     except HTTPException:
         raise
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -122,7 +137,7 @@ async def change_password(
     """Đổi mật khẩu"""
     try:
         # Xác thực mật khẩu hiện tại
-        user_data = UserService.authenticate_user(db, current_user.username, password_data.current_password)
+        user_data = await UserService.authenticate_user(db, current_user.username, password_data.current_password)
         
         if not user_data:
             raise HTTPException(
@@ -131,7 +146,10 @@ async def change_password(
             )
         
         # Cập nhật mật khẩu mới
-        result = UserService.update_user_password(db, current_user.id, password_data.new_password)
+        password_hash = await password_hasher.hash(password_data.new_password)
+        result = UserService.update_user_password(
+            db, current_user.id, password_data.new_password, password_hash=password_hash
+        )
         
         if not result['success']:
             raise HTTPException(
@@ -139,10 +157,21 @@ async def change_password(
                 detail=result['error']
             )
         
+        # Token cũ hết hiệu lực sau khi đổi mật khẩu: trả token mới
+        result['access_token'] = create_access_token(
+            data=user_claims(current_user.id, current_user.username, current_user.is_admin)
+        )
+        result['token_type'] = "bearer"
         return result
         
     except HTTPException:
         raise
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
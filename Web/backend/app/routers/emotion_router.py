@@ -1,17 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import cv2
 import numpy as np
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.models import User, AnalysisSession
-from app.services.emotion_service import emotion_service
+from app.models.models import User
+from app.services.emotion_service import emotion_service, SessionNotFound
 from app.services.stats_service import StatsService
-from app.crud.session_crud import create_session, update_session, get_session_by_id, end_session
-from typing import Dict, Any
+from app.crud.session_crud import get_session_by_id, get_active_session_id, end_session
+from app.services.session_cache import active_session_cache
+from app.services.result_ingest import parse_results, validate_results
+from app.core.config import settings
+from typing import Dict, Any, Optional
 import io
 from datetime import datetime
-from app.core.utils import get_json_filters, extract_common_filters
+from app.core.utils import get_json_filters, extract_common_filters, parse_cursor
 import base64
 
 router = APIRouter(prefix="/emotion", tags=["Emotion Analysis"])
@@ -56,46 +60,11 @@ async def analyze_emotion(
         # Phân tích cảm xúc
         analysis_result = emotion_service.analyze_emotion(image)
         
-        # Lưu kết quả vào database (cả thành công và thất bại)
-        saved_result = emotion_service.save_emotion_result(db, current_user.id, analysis_result)
-        
-        # Session management đơn giản
-        session_id = None
-        try:
-            # Chỉ tạo session mới nếu chưa có
-            active_session = db.query(AnalysisSession).filter(AnalysisSession.user_id == current_user.id, AnalysisSession.session_end == None).first()
-            if not active_session:
-                active_session = create_session(
-                    db=db,
-                    user_id=current_user.id,
-                    camera_resolution="640x480",
-                    analysis_interval=500  # Cập nhật interval
-                )
-            
-            # Cập nhật thống kê session
-            if active_session:
-                # Tính toán thống kê mới
-                new_total = (active_session.total_analyses or 0) + 1
-                new_successful = (active_session.successful_detections or 0) + (1 if analysis_result['faces_detected'] > 0 else 0)
-                new_failed = (active_session.failed_detections or 0) + (1 if analysis_result['faces_detected'] == 0 else 0)
-                new_detection_rate = (new_successful / new_total) * 100 if new_total > 0 else 0
-                
-                # Cập nhật session
-                update_session(
-                    db=db,
-                    session_id=active_session.id,
-                    total_analyses=new_total,
-                    successful_detections=new_successful,
-                    failed_detections=new_failed,
-                    detection_rate=new_detection_rate,
-                    avg_processing_time=analysis_result['processing_time'],
-                    avg_fps=1000 / analysis_result['processing_time'] if analysis_result['processing_time'] > 0 else 0
-                )
-                
-            session_id = active_session.id if active_session else None
-        except Exception as e:
-            print(f"Session creation error: {e}")
-            session_id = None
+        # Lưu kết quả + cập nhật session trong một transaction (cả thành công và thất bại).
+        # Chạy trong threadpool: commit và buffer write-behind đầy (policy block) không chặn event loop
+        saved_result, session_id = await run_in_threadpool(
+            emotion_service.record_analysis, db, current_user.id, analysis_result
+        )
         
         # Trả về kết quả dựa trên success
         if analysis_result.get('success', False):
@@ -134,6 +103,70 @@ async def analyze_emotion(
             detail=f"Lỗi phân tích cảm xúc: {str(e)}"
         )
 
+@router.post("/ingest")
+async def ingest_results(
+    request: Request,
+    session_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Nhận hàng loạt kết quả đã phân tích offline (NDJSON hoặc Arrow IPC stream)
+    
+    Idempotent theo client_result_id: gửi lại cả lô sau khi mất mạng không tạo bản ghi trùng.
+    """
+    if int(request.headers.get("content-length") or 0) > settings.INGEST_MAX_BODY_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Body vượt quá {settings.INGEST_MAX_BODY_BYTES} bytes"
+        )
+    body = await request.body()
+    if len(body) > settings.INGEST_MAX_BODY_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Body vượt quá {settings.INGEST_MAX_BODY_BYTES} bytes"
+        )
+    
+    # Parse, kiểm tra và ghi (COPY / INSERT nhiều dòng + commit) chạy trong threadpool, không chặn event loop
+    try:
+        table = await run_in_threadpool(parse_results, body, request.headers.get("content-type"))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if table.num_rows > settings.INGEST_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Tối đa {settings.INGEST_MAX_ROWS} kết quả mỗi request"
+        )
+    
+    valid, emotion_codes, report = await run_in_threadpool(
+        validate_results, table, max_clock_skew_seconds=settings.INGEST_MAX_CLOCK_SKEW_SECONDS
+    )
+    
+    def ingest():
+        return emotion_service.ingest_results(
+            db, current_user.id, valid.to_pylist(), emotion_codes.tolist(), session_id
+        )
+    
+    try:
+        inserted, session_id = await run_in_threadpool(ingest)
+    except SessionNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi ghi kết quả offline: {str(e)}"
+        )
+    
+    return {
+        "success": True,
+        "received": report['received'],
+        "inserted": inserted,
+        # Trùng trong lô + đã ghi ở lần gửi trước
+        "duplicates": report['duplicates'] + valid.num_rows - inserted,
+        "rejected": report['rejected'],
+        "errors": report['errors'][:100],
+        "session_id": session_id
+    }
+
 @router.post("/end-session")
 async def end_analysis_session(
     current_user: User = Depends(get_current_user),
@@ -141,13 +174,14 @@ async def end_analysis_session(
 ) -> Dict[str, Any]:
     """Kết thúc phiên phân tích hiện tại"""
     try:
-        active_session = db.query(AnalysisSession).filter(AnalysisSession.user_id == current_user.id, AnalysisSession.session_end == None).first()
-        if active_session:
-            end_session(db, active_session.id)
+        active_session_id = get_active_session_id(db, current_user.id)
+        if active_session_id:
+            end_session(db, active_session_id)
+            active_session_cache.invalidate(current_user.id)
             return {
                 "success": True,
                 "message": "Đã kết thúc phiên phân tích",
-                "session_id": active_session.id
+                "session_id": active_session_id
             }
         else:
             return {
@@ -161,7 +195,7 @@ async def end_analysis_session(
         )
 
 @router.get("/stats")
-async def get_emotion_stats(
+def get_emotion_stats(
     period: str = "day",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -178,14 +212,16 @@ async def get_emotion_stats(
         )
 
 @router.get("/history")
-async def get_emotion_history(
+def get_emotion_history(
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Lấy lịch sử phân tích cảm xúc"""
+    """Lấy lịch sử phân tích cảm xúc (cursor: next_cursor của trang trước)"""
+    before = parse_cursor(cursor)
     try:
-        result = StatsService.get_emotion_history_data(db, current_user.id, limit)
+        result = StatsService.get_emotion_history_data(db, current_user.id, limit, before)
         return result
         
     except Exception as e:
@@ -195,7 +231,7 @@ async def get_emotion_history(
         )
 
 @router.get("/performance")
-async def get_performance_stats(
+def get_performance_stats(
     request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -233,7 +269,7 @@ async def get_performance_stats(
         )
 
 @router.get("/face-detection-stats")
-async def get_face_detection_stats(
+def get_face_detection_stats(
     request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -289,36 +325,9 @@ async def analyze_emotion_realtime(
                 detail="Không thể đọc dữ liệu ảnh từ file upload"
             )
         analysis_result = emotion_service.analyze_emotion(image)
-        saved_result = emotion_service.save_emotion_result(db, current_user.id, analysis_result)
-        session_id = None
-        try:
-            active_session = db.query(AnalysisSession).filter(AnalysisSession.user_id == current_user.id, AnalysisSession.session_end == None).first()
-            if not active_session:
-                active_session = create_session(
-                    db=db,
-                    user_id=current_user.id,
-                    camera_resolution="640x480",
-                    analysis_interval=500
-                )
-            if active_session:
-                new_total = (active_session.total_analyses or 0) + 1
-                new_successful = (active_session.successful_detections or 0) + (1 if analysis_result['faces_detected'] > 0 else 0)
-                new_failed = (active_session.failed_detections or 0) + (1 if analysis_result['faces_detected'] == 0 else 0)
-                new_detection_rate = (new_successful / new_total) * 100 if new_total > 0 else 0
-                update_session(
-                    db=db,
-                    session_id=active_session.id,
-                    total_analyses=new_total,
-                    successful_detections=new_successful,
-                    failed_detections=new_failed,
-                    detection_rate=new_detection_rate,
-                    avg_processing_time=analysis_result['processing_time'],
-                    avg_fps=1000 / analysis_result['processing_time'] if analysis_result['processing_time'] > 0 else 0
-                )
-            session_id = active_session.id if active_session else None
-        except Exception as e:
-            print(f"Session creation error: {e}")
-            session_id = None
+        saved_result, session_id = await run_in_threadpool(
+            emotion_service.record_analysis, db, current_user.id, analysis_result
+        )
         if analysis_result.get('success', False):
             return {
                 "success": True,
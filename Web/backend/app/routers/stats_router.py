@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User
-from app.services.stats_service import StatsService
-from app.core.utils import get_json_filters, extract_common_filters
-from typing import Dict, Any, List
+from app.services.stats_service import StatsService, TIMELINE_DEFAULT_POINTS, TIMELINE_MAX_POINTS, timeline_range
+from app.crud.emotion_crud import get_period_start
+from app.services.export_service import EXPORT_FORMATS, export_range, export_filename, stream_emotion_results
+from app.core.utils import get_json_filters, extract_common_filters, parse_cursor
+from typing import Dict, Any, List, Optional, Union
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/stats", tags=["Statistics"])
 
 @router.get("/emotion")
-async def get_emotion_statistics(
+def get_emotion_statistics(
     request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -54,7 +58,7 @@ async def get_emotion_statistics(
         )
 
 @router.get("/performance")
-async def get_performance_statistics(
+def get_performance_statistics(
     request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -92,7 +96,7 @@ async def get_performance_statistics(
         )
 
 @router.get("/history")
-async def get_analysis_history(
+def get_analysis_history(
     request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -108,12 +112,14 @@ async def get_analysis_history(
         user_id = common_filters.get('user_id', current_user.id)
         start_date = common_filters.get('start_date')
         end_date = common_filters.get('end_date')
+        cursor = common_filters.get('cursor')
+        before = parse_cursor(cursor)
         
         # Nếu user_id là 'all', lấy lịch sử tổng hợp của tất cả users
         if user_id == 'all':
-            result = StatsService.get_all_users_emotion_history_data(db, limit)
+            result = StatsService.get_all_users_emotion_history_data(db, limit, before)
         else:
-            result = StatsService.get_emotion_history_data(db, user_id, limit)
+            result = StatsService.get_emotion_history_data(db, user_id, limit, before)
         
         # Filter theo date range nếu có
         if start_date or end_date:
@@ -125,11 +131,14 @@ async def get_analysis_history(
             'limit': limit,
             'user_id': user_id,
             'start_date': start_date,
-            'end_date': end_date
+            'end_date': end_date,
+            'cursor': cursor
         }
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -137,7 +146,7 @@ async def get_analysis_history(
         )
 
 @router.get("/summary")
-async def get_statistics_summary(
+def get_statistics_summary(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
@@ -167,14 +176,114 @@ async def get_statistics_summary(
             detail=f"Lỗi lấy tổng hợp thống kê: {str(e)}"
         )
 
+def _authorized_user_id(user_id: Union[int, str, None], current_user: User) -> Optional[int]:
+    """User được truy vấn (None: tất cả users); chỉ admin được xem user khác hoặc 'all'"""
+    if user_id is None or str(user_id) == str(current_user.id):
+        return current_user.id
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ admin mới được xem dữ liệu của user khác"
+        )
+    if user_id == 'all':
+        return None
+    try:
+        return int(user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="user_id phải là số hoặc 'all'"
+        )
+
+def _parse_datetime(value: Any, name: str) -> datetime:
+    """Thời điểm ISO 8601 trong JSON filters (không có timezone: coi là UTC)"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{name} phải là thời điểm ISO 8601"
+        )
+
+@router.get("/timeline")
+def get_emotion_timeline(
+    request: Request,
+    max_points: int = Query(TIMELINE_DEFAULT_POINTS, ge=10, le=TIMELINE_MAX_POINTS, description="Số điểm tối đa"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Dict[str, Any]:
+    """Phân bố cảm xúc và mức tương tác theo khoảng thời gian với JSON filters
+    
+    Khoảng lấy từ dateRange {start, end} hoặc period (mặc định day, đến hiện tại); độ rộng mỗi
+    khoảng tự chọn để số điểm không vượt quá max_points.
+    """
+    filters = get_json_filters(request)
+    common_filters = extract_common_filters(filters)
+    
+    period = common_filters.get('period', 'day')
+    user_id = _authorized_user_id(common_filters.get('user_id'), current_user)
+    start_date = common_filters.get('start_date')
+    end_date = common_filters.get('end_date')
+    start = _parse_datetime(start_date, 'dateRange.start') if start_date else get_period_start(period)
+    end = _parse_datetime(end_date, 'dateRange.end') if end_date else datetime.now(timezone.utc)
+    try:
+        start, end = export_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    start, end, step_seconds = timeline_range(start, end, max_points)
+    result = StatsService.get_emotion_timeline(db, start, end, step_seconds, user_id)
+    if not result.get('success'):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=result.get('error', 'Lỗi lấy timeline cảm xúc')
+        )
+    
+    result['applied_filters'] = {
+        'period': None if start_date else period,
+        'start_date': start_date,
+        'end_date': end_date,
+        'user_id': user_id if user_id is not None else 'all',
+        'max_points': max_points
+    }
+    return result
+
 @router.get("/export")
-async def export_statistics(
+def export_statistics(
     period: str = "month",
-    format: str = "json",
+    format: str = Query("json", description="json (tóm tắt) | csv | ndjson | parquet (toàn bộ lịch sử, stream)"),
+    limit: int = Query(1000, ge=1, le=1000, description="Số dòng lịch sử mỗi lần xuất (json)"),
+    cursor: Optional[str] = Query(None, description="next_cursor của lần xuất trước (json)"),
+    start_date: Optional[datetime] = Query(None, description="Xuất từ thời điểm này (csv/ndjson/parquet)"),
+    end_date: Optional[datetime] = Query(None, description="Xuất tới trước thời điểm này (csv/ndjson/parquet)"),
+    user_id: Optional[str] = Query(None, description="ID user hoặc 'all' (chỉ admin), mặc định user hiện tại"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Xuất thống kê"""
+    """Xuất thống kê
+    
+    json: tóm tắt + một trang lịch sử (cursor là next_cursor trong analysis_history của lần trước).
+    csv / ndjson / parquet: stream toàn bộ kết quả phân tích trong khoảng thời gian, bộ nhớ cố định.
+    """
+    if format in EXPORT_FORMATS:
+        export_user_id = _authorized_user_id(user_id, current_user)
+        try:
+            start_date, end_date = export_range(start_date, end_date)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        filename = export_filename(format, export_user_id, start_date, end_date)
+        return StreamingResponse(
+            stream_emotion_results(format, export_user_id, start_date, end_date),
+            media_type=EXPORT_FORMATS[format][0],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    if format != "json":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Định dạng không hỗ trợ: {format} (json, {', '.join(EXPORT_FORMATS)})"
+        )
+    
+    before = parse_cursor(cursor)
     try:
         # Lấy thống kê cảm xúc
         emotion_stats = StatsService.get_user_emotion_stats(db, current_user.id, period)
@@ -183,7 +292,7 @@ async def export_statistics(
         performance_stats = StatsService.get_user_performance_stats(db, current_user.id, period)
         
         # Lấy lịch sử
-        history_data = StatsService.get_emotion_history_data(db, current_user.id, 1000)
+        history_data = StatsService.get_emotion_history_data(db, current_user.id, limit, before)
         
         export_data = {
             "user_id": current_user.id,
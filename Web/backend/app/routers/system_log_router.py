@@ -4,7 +4,9 @@ from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models.models import User, SystemLog
 from app.services.system_log_service import SystemLogService
-from typing import Dict, Any, List
+from app.core.pagination import encode_cursor, keyset_before
+from app.core.utils import parse_cursor
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/system-logs", tags=["System Logs"])
@@ -13,12 +15,14 @@ router = APIRouter(prefix="/system-logs", tags=["System Logs"])
 async def get_system_logs(
     level: str = Query(None, description="Lọc theo level (INFO, WARNING, ERROR)"),
     user_id: int = Query(None, description="Lọc theo user ID"),
-    limit: int = Query(100, description="Số lượng log tối đa"),
+    limit: int = Query(100, ge=1, description="Số lượng log tối đa"),
     days: int = Query(7, description="Số ngày gần đây"),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Lấy danh sách system logs"""
+    """Lấy danh sách system logs (mới nhất trước, phân trang keyset theo (created_at, id))"""
+    before = parse_cursor(cursor)
     try:
         # Chỉ admin mới được xem system logs
         if not current_user.is_admin:
@@ -37,8 +41,13 @@ async def get_system_logs(
             query = query.filter(SystemLog.level == level)
         if user_id:
             query = query.filter(SystemLog.user_id == user_id)
+        if before is not None:
+            query = query.filter(keyset_before(SystemLog.created_at, SystemLog.id, before))
         
-        logs = query.order_by(SystemLog.created_at.desc()).limit(limit).all()
+        # Lấy thêm một dòng để biết còn trang sau không
+        logs = query.order_by(SystemLog.created_at.desc(), SystemLog.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(logs[limit - 1].created_at, logs[limit - 1].id) if len(logs) > limit else None
+        logs = logs[:limit]
         
         return {
             "success": True,
@@ -49,11 +58,14 @@ async def get_system_logs(
                     "message": log.message,
                     "user_id": log.user_id,
                     "ip_address": log.ip_address,
+                    "event_type": log.event_type,
+                    "event_count": log.event_count or 1,
                     "created_at": log.created_at.isoformat()
                 }
                 for log in logs
             ],
-            "total": len(logs)
+            "total": len(logs),
+            "next_cursor": next_cursor
         }
         
     except HTTPException:
@@ -81,11 +93,12 @@ async def get_log_stats(
         
         start_date = datetime.now() - timedelta(days=days)
         
-        # Thống kê theo level
+        # Thống kê theo level (mỗi dòng log gộp đại diện cho event_count sự kiện)
         from sqlalchemy import func
+        event_count = func.sum(func.coalesce(SystemLog.event_count, 1))
         level_stats = db.query(
             SystemLog.level,
-            func.count(SystemLog.id).label('count')
+            event_count.label('count')
         ).filter(
             SystemLog.created_at >= start_date
         ).group_by(SystemLog.level).all()
@@ -93,11 +106,11 @@ async def get_log_stats(
         # Thống kê theo user
         user_stats = db.query(
             SystemLog.user_id,
-            func.count(SystemLog.id).label('count')
+            event_count.label('count')
         ).filter(
             SystemLog.created_at >= start_date,
             SystemLog.user_id.isnot(None)
-        ).group_by(SystemLog.user_id).order_by(func.count(SystemLog.id).desc()).limit(10).all()
+        ).group_by(SystemLog.user_id).order_by(event_count.desc()).limit(10).all()
         
         return {
             "success": True,
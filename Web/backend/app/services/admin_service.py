@@ -3,12 +3,14 @@ from app.crud.user_crud import get_all_users, update_user_admin_status, delete_u
 from app.crud.emotion_crud import get_all_emotion_stats
 from app.services.user_service import UserService
 from app.services.stats_service import StatsService
+from app.services.stats_cache import stats_cache
 from typing import Dict, Any, List
 
 class AdminService:
     """Service quản lý admin"""
     
     @staticmethod
+    @stats_cache.cached('admin_overview')
     def get_system_overview(db: Session) -> Dict[str, Any]:
         """Lấy tổng quan hệ thống"""
         try:
@@ -84,6 +86,7 @@ class AdminService:
             }
     
     @staticmethod
+    @stats_cache.cached('admin_statistics')
     def get_system_statistics(db: Session, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê hệ thống"""
         try:
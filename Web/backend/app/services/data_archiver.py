@@ -0,0 +1,576 @@
+import os
+import json
+import glob
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from sqlalchemy import Table, select, delete, func, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.types import SmallInteger, Integer, Float, Boolean, DateTime, LargeBinary, JSON
+from app.core.config import settings
+from app.core.database import engine
+from app.core.emotion_codec import NO_FACE_CODE, decode_emotion
+from app.core.pagination import Keyset
+from app.core.sketch import sketch_key_arrow
+from app.crud.rollup_crud import get_rollup_watermark
+from app.models.models import EmotionResult, SystemLog
+
+logger = logging.getLogger(__name__)
+
+# Bảng được lưu trữ: (bảng, cột thời gian, cột keyset khi quét)
+# emotion_results quét theo (user_id, id) để mỗi lô rơi vào ít thư mục user -> file lớn, ít file
+ARCHIVED_TABLES: Dict[str, Tuple[Table, str, Tuple[str, ...]]] = {
+    "emotion_results": (EmotionResult.__table__, "timestamp", ("user_id", "id")),
+    "system_logs": (SystemLog.__table__, "created_at", ("id",)),
+}
+
+_WATERMARK_FILE = "_watermark.json"
+_PENDING_SUFFIX = ".tmp"
+
+def _arrow_type(column_type):
+    """Kiểu Arrow tương ứng với kiểu cột SQLAlchemy (JSON lưu dạng chuỗi)"""
+    import pyarrow as pa
+    if isinstance(column_type, SmallInteger):
+        return pa.int16()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column_type, LargeBinary):
+        return pa.binary()
+    return pa.string()
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite trả về datetime không có timezone (giá trị UTC)"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+def _month_key(moment: datetime) -> str:
+    return _to_utc(moment).astimezone(timezone.utc).strftime("%Y-%m")
+
+class DataArchiver:
+    """Chuyển dòng cũ hơn retention ra file Parquet (theo tháng và user) rồi xóa khỏi database theo lô nhỏ"""
+
+    def __init__(self, bind: Engine, root: str, retention_days: int, batch_size: int,
+                 batch_pause_ms: int, compression: str, interval_seconds: int):
+        self.bind = bind
+        self.root = root
+        self.retention_days = max(1, retention_days)
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = max(0, batch_pause_ms) / 1000
+        self.compression = None if compression == "none" else compression
+        self.interval_seconds = max(60, interval_seconds)
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self._watermarks: Dict[str, Tuple[float, Optional[datetime]]] = {}
+        self._runs = 0
+        self._failed_runs = 0
+        self._archived_rows: Dict[str, int] = {name: 0 for name in ARCHIVED_TABLES}
+        self._files_written = 0
+        self._archive_reads = 0
+        self._last_run_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Worker lưu trữ có đang chạy không"""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def run_lock(self) -> threading.Lock:
+        """Giữ lock này để không có lượt lưu trữ nào chạy song song (ví dụ khi dựng rollup từ file lưu trữ)"""
+        return self._run_lock
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Mốc thời gian: dòng cũ hơn mốc này được chuyển ra file"""
+        return (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+
+    def _table_cutoff(self, table_name: str, cutoff: datetime) -> datetime:
+        """Mốc lưu trữ của từng bảng: emotion_results không vượt quá mốc rollup
+
+        Stats đọc rollup trước mốc rollup và bảng gốc sau mốc, không đọc file lưu trữ -> dòng chưa được
+        tổng hợp (rollup chậm hoặc bị tắt) phải ở lại database.
+        """
+        if table_name != "emotion_results":
+            return cutoff
+        with Session(self.bind) as db:
+            rollup_watermark = get_rollup_watermark(db)
+        if rollup_watermark is None or rollup_watermark >= cutoff:
+            return cutoff
+        logger.info(f"Mốc lưu trữ emotion_results giữ ở mốc rollup {rollup_watermark:%Y-%m-%d %H:%M}")
+        return rollup_watermark
+
+    def _table_dir(self, table_name: str) -> str:
+        return os.path.join(self.root, table_name)
+
+    # ----- Ghi -----
+
+    def _schema(self, table: Table):
+        import pyarrow as pa
+        return pa.schema([pa.field(column.name, _arrow_type(column.type)) for column in table.columns])
+
+    def _write_files(self, table_name: str, table: Table, ts_column: str, rows: List[Dict[str, Any]]) -> List[str]:
+        """Ghi một lô ra các file tạm (.tmp), mỗi (tháng, user) một file"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        json_columns = [column.name for column in table.columns if isinstance(column.type, JSON)]
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            row = dict(row)
+            row[ts_column] = _to_utc(row[ts_column])
+            for name in json_columns:
+                if row[name] is not None:
+                    row[name] = json.dumps(row[name], ensure_ascii=False)
+            user = "none" if row["user_id"] is None else str(row["user_id"])
+            groups.setdefault((_month_key(row[ts_column]), user), []).append(row)
+
+        schema = self._schema(table)
+        pending = []
+        for (month, user), group in groups.items():
+            directory = os.path.join(self._table_dir(table_name), f"month={month}", f"user={user}")
+            os.makedirs(directory, exist_ok=True)
+            ids = [row["id"] for row in group]
+            path = os.path.join(directory, f"part-{min(ids):012d}-{max(ids):012d}.parquet{_PENDING_SUFFIX}")
+            pq.write_table(pa.Table.from_pylist(group, schema=schema), path, compression=self.compression)
+            pending.append(path)
+        return pending
+
+    @staticmethod
+    def _publish(pending: List[str]):
+        """Đổi tên file tạm thành file chính thức (sau khi đã xóa dòng khỏi database)"""
+        for path in pending:
+            os.replace(path, path[:-len(_PENDING_SUFFIX)])
+
+    def recover_pending(self) -> Dict[str, int]:
+        """Xử lý file tạm còn sót do bị dừng giữa chừng
+
+        Dòng đã bị xóa khỏi database -> transaction xóa đã commit, công bố file;
+        dòng vẫn còn -> transaction đã rollback, bỏ file (lượt sau sẽ lưu trữ lại).
+        """
+        import pyarrow.parquet as pq
+
+        published = discarded = 0
+        for table_name, (table, _, _) in ARCHIVED_TABLES.items():
+            pattern = os.path.join(self._table_dir(table_name), "month=*", "user=*", f"*{_PENDING_SUFFIX}")
+            for path in glob.glob(pattern):
+                ids = pq.read_table(path, columns=["id"]).column("id").to_pylist()
+                with self.bind.connect() as conn:
+                    remaining = conn.execute(
+                        select(func.count()).select_from(table).where(table.c.id.in_(ids))
+                    ).scalar()
+                if remaining:
+                    os.remove(path)
+                    discarded += 1
+                else:
+                    self._publish([path])
+                    published += 1
+        if published or discarded:
+            logger.warning(f"Khôi phục file lưu trữ dở dang: công bố {published}, bỏ {discarded}")
+        return {'published': published, 'discarded': discarded}
+
+    def archive_table(self, table_name: str, cutoff: datetime) -> int:
+        """Lưu trữ các dòng cũ hơn cutoff của một bảng, trả về số dòng đã chuyển"""
+        table, ts_column, keyset = ARCHIVED_TABLES[table_name]
+        ts = table.c[ts_column]
+        key_columns = [table.c[name] for name in keyset]
+
+        archived = 0
+        last_key = None
+        while not self._stop_event.is_set():
+            # Đọc một lô trong transaction ngắn (chỉ đọc, không khóa dòng)
+            query = select(table).where(ts < cutoff).order_by(*key_columns).limit(self.batch_size)
+            if last_key is not None:
+                query = query.where(tuple_(*key_columns) > tuple_(*last_key))
+            with self.bind.connect() as conn:
+                rows = conn.execute(query).mappings().all()
+            if not rows:
+                break
+
+            pending = self._write_files(table_name, table, ts_column, rows)
+
+            # Xóa đúng các dòng đã ghi: transaction ngắn, chỉ khóa dòng cũ mà writer không đụng tới
+            ids = [row["id"] for row in rows]
+            with self.bind.begin() as conn:
+                conn.execute(delete(table).where(table.c.id.in_(ids), ts < cutoff))
+            self._publish(pending)
+
+            archived += len(rows)
+            self._archived_rows[table_name] += len(rows)
+            self._files_written += len(pending)
+            last_key = tuple(rows[-1][name] for name in keyset)
+            if self.batch_pause:
+                time.sleep(self.batch_pause)
+        return archived
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Một lượt lưu trữ cho tất cả các bảng"""
+        cutoff = self.cutoff(now)
+        with self._run_lock:
+            try:
+                self.recover_pending()
+                archived, cutoffs = {}, {}
+                for name in ARCHIVED_TABLES:
+                    # Đọc mốc rollup trong lock: rollup khởi tạo cũng giữ lock này khi cộng dữ liệu từ file
+                    cutoffs[name] = self._table_cutoff(name, cutoff)
+                    # Ghi mốc trước khi chuyển dữ liệu để truy vấn đọc cả file ngay từ lô đầu tiên
+                    self._write_watermark(name, cutoffs[name])
+                    archived[name] = self.archive_table(name, cutoffs[name])
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"Lỗi lưu trữ dữ liệu: {e}")
+                return {'success': False, 'error': str(e)}
+
+        self._runs += 1
+        self._last_run_at = time.time()
+        if any(archived.values()):
+            logger.info(f"Đã lưu trữ dữ liệu cũ hơn {cutoff:%Y-%m-%d %H:%M}: {archived}")
+        return {
+            'success': True,
+            'cutoff': cutoff.isoformat(),
+            'cutoffs': {name: value.isoformat() for name, value in cutoffs.items()},
+            'archived': archived
+        }
+
+    def _write_watermark(self, table_name: str, cutoff: datetime):
+        """Ghi mốc: mọi dòng cũ hơn mốc này nằm trong file lưu trữ"""
+        current = self.watermark(table_name)
+        if current is not None and current >= cutoff:
+            return
+        os.makedirs(self._table_dir(table_name), exist_ok=True)
+        path = os.path.join(self._table_dir(table_name), _WATERMARK_FILE)
+        with open(path + _PENDING_SUFFIX, "w") as f:
+            json.dump({'archived_before': cutoff.isoformat()}, f)
+        os.replace(path + _PENDING_SUFFIX, path)
+
+    # ----- Đọc -----
+
+    def watermark(self, table_name: str) -> Optional[datetime]:
+        """Mốc lưu trữ của bảng (None nếu chưa từng lưu trữ); cache theo mtime vì CLI có thể cập nhật"""
+        path = os.path.join(self._table_dir(table_name), _WATERMARK_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._watermarks.get(table_name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path) as f:
+            value = datetime.fromisoformat(json.load(f)['archived_before'])
+        self._watermarks[table_name] = (mtime, value)
+        return value
+
+    def covers(self, table_name: str, start: Optional[datetime]) -> bool:
+        """Khoảng [start, hiện tại) có chạm tới dữ liệu đã lưu trữ không"""
+        watermark = self.watermark(table_name)
+        return watermark is not None and (start is None or _to_utc(start) < watermark)
+
+    def read(self, table_name: str, columns: List[str], start: Optional[datetime] = None,
+             end: Optional[datetime] = None, user_id: Optional[int] = None, filter_expression=None):
+        """Đọc dữ liệu lưu trữ thành pyarrow.Table, bỏ qua thư mục tháng/user nằm ngoài điều kiện"""
+        dataset, conditions = self._dataset(table_name, start, end, user_id, filter_expression)
+        return dataset.to_table(columns=columns, filter=conditions)
+
+    def read_batches(self, table_name: str, columns: List[str], batch_size: int, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None, user_id: Optional[int] = None, filter_expression=None):
+        """Đọc dữ liệu lưu trữ theo từng RecordBatch (bộ nhớ không phụ thuộc số dòng)
+
+        Danh sách file được chốt ngay khi gọi: file lưu trữ sau đó không được đọc.
+        """
+        dataset, conditions = self._dataset(table_name, start, end, user_id, filter_expression)
+        return dataset.to_batches(columns=columns, filter=conditions, batch_size=batch_size,
+                                  batch_readahead=1, fragment_readahead=1)
+
+    def _dataset(self, table_name: str, start: Optional[datetime], end: Optional[datetime],
+                 user_id: Optional[int], filter_expression):
+        """pyarrow Dataset gồm các file tháng/user khớp điều kiện, kèm biểu thức lọc"""
+        import pyarrow.dataset as ds
+
+        table, ts_column, _ = ARCHIVED_TABLES[table_name]
+        start, end = _to_utc(start), _to_utc(end)
+        user_dir = "user=*" if user_id is None else f"user={user_id}"
+        files = []
+        for path in sorted(glob.glob(os.path.join(self._table_dir(table_name), "month=*", user_dir, "*.parquet"))):
+            month = os.path.basename(os.path.dirname(os.path.dirname(path)))[len("month="):]
+            if start is not None and month < _month_key(start):
+                continue
+            if end is not None and month > _month_key(end):
+                continue
+            files.append(path)
+
+        self._archive_reads += 1
+        dataset = ds.dataset(files, schema=self._schema(table), format="parquet")
+        conditions = filter_expression
+        if start is not None:
+            condition = ds.field(ts_column) >= start
+            conditions = condition if conditions is None else conditions & condition
+        if end is not None:
+            condition = ds.field(ts_column) < end
+            conditions = condition if conditions is None else conditions & condition
+        return dataset, conditions
+
+    def emotion_counts(self, start: Optional[datetime], user_id: Optional[int] = None) -> Dict[str, int]:
+        """Số lần mỗi cảm xúc trong dữ liệu lưu trữ (cùng điều kiện với get_emotion_stats)"""
+        import pyarrow.dataset as ds
+
+        if not self.covers("emotion_results", start):
+            return {}
+        detected = (ds.field("faces_detected") > 0) & (ds.field("emotion_code") != NO_FACE_CODE)
+        data = self.read("emotion_results", ["emotion_code"], start=start, user_id=user_id, filter_expression=detected)
+        if data.num_rows == 0:
+            return {}
+        counts = data.group_by("emotion_code").aggregate([("emotion_code", "count")])
+        return {
+            decode_emotion(code): count
+            for code, count in zip(counts.column("emotion_code").to_pylist(), counts.column("emotion_code_count").to_pylist())
+        }
+
+    def emotion_timeline(self, start: datetime, end: datetime, step_seconds: int,
+                         user_id: Optional[int] = None) -> List[Tuple[int, int, Optional[str], int, int]]:
+        """Số kết quả theo (đầu khoảng, mã cảm xúc, mức tương tác) trong dữ liệu lưu trữ, cùng định dạng với get_emotion_timeline"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if not self.covers("emotion_results", start):
+            return []
+        data = self.read("emotion_results", ["timestamp", "emotion_code", "engagement", "faces_detected"],
+                         start=start, end=end, user_id=user_id)
+        if data.num_rows == 0:
+            return []
+        step_us = step_seconds * 1_000_000
+        epoch_us = pc.cast(data.column("timestamp"), pa.int64())
+        data = data.append_column("bucket", pc.multiply(pc.divide(epoch_us, step_us), step_seconds))
+        data = data.append_column("detected", pc.cast(pc.greater(data.column("faces_detected"), 0), pa.int64()))
+        grouped = data.group_by(["bucket", "emotion_code", "engagement"]).aggregate(
+            [("emotion_code", "count"), ("detected", "sum")]
+        )
+        return list(zip(
+            grouped.column("bucket").to_pylist(), grouped.column("emotion_code").to_pylist(),
+            grouped.column("engagement").to_pylist(), grouped.column("emotion_code_count").to_pylist(),
+            grouped.column("detected_sum").to_pylist()
+        ))
+
+    def performance_totals(self, start: Optional[datetime], user_id: Optional[int] = None) -> Optional[Dict[str, float]]:
+        """Tổng thành phần của thống kê hiệu suất trong dữ liệu lưu trữ (None nếu khoảng không chạm tới)"""
+        import pyarrow.compute as pc
+
+        if not self.covers("emotion_results", start):
+            return None
+        data = self.read("emotion_results", ["faces_detected", "score", "image_quality", "processing_time"],
+                         start=start, user_id=user_id)
+        detected = pc.fill_null(pc.greater(data.column("faces_detected"), 0), False)
+        quality = pc.filter(data.column("image_quality"), detected)
+        scores = pc.filter(data.column("score"), detected)
+        scores = pc.filter(scores, pc.fill_null(pc.greater(scores, 0), False))
+        processing = data.column("processing_time")
+        return {
+            'total_analyses': data.num_rows,
+            'successful_detections': pc.sum(detected.cast("int64")).as_py() or 0,
+            'image_quality_sum': pc.sum(quality).as_py() or 0.0,
+            'image_quality_count': pc.count(quality).as_py(),
+            'score_sum': pc.sum(scores).as_py() or 0.0,
+            'score_count': pc.count(scores).as_py(),
+            'processing_time_sum': pc.sum(processing).as_py() or 0.0,
+            'processing_time_count': pc.count(processing).as_py()
+        }
+
+    def latency_bins(self, start: Optional[datetime], user_id: Optional[int] = None) -> Optional[List[Tuple[int, int]]]:
+        """Các cặp (bin, số đếm) DDSketch của thời gian xử lý trong dữ liệu lưu trữ (None nếu khoảng không chạm tới)"""
+        if not self.covers("emotion_results", start):
+            return None
+        data = self.read("emotion_results", ["processing_time"], start=start, user_id=user_id)
+        data = data.filter(data.column("processing_time").is_valid())
+        grouped = data.append_column("bin", sketch_key_arrow(data.column("processing_time"))).group_by("bin").aggregate(
+            [("bin", "count")]
+        )
+        return list(zip(grouped.column("bin").to_pylist(), grouped.column("bin_count").to_pylist()))
+
+    def _months(self, table_name: str) -> List[str]:
+        """Các thư mục tháng (YYYY-MM) của bảng lưu trữ, cũ -> mới"""
+        return sorted(
+            os.path.basename(path)[len("month="):]
+            for path in glob.glob(os.path.join(self._table_dir(table_name), "month=*"))
+        )
+
+    @staticmethod
+    def _month_range(month: str) -> Tuple[datetime, datetime]:
+        """[đầu tháng, đầu tháng sau) theo UTC"""
+        start = datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+        return start, (start + timedelta(days=32)).replace(day=1)
+
+    def _monthly(self, columns: List[str]) -> Iterator[Any]:
+        """Đọc toàn bộ emotion_results đã lưu trữ, từng tháng một (bỏ qua tháng rỗng)"""
+        for month in self._months("emotion_results"):
+            start, end = self._month_range(month)
+            data = self.read("emotion_results", columns, start=start, end=end)
+            if data.num_rows:
+                yield data
+
+    def hourly_latency_sketches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Bin DDSketch của thời gian xử lý theo (user, giờ) trong dữ liệu lưu trữ, để dựng latency_hourly_sketches"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        for data in self._monthly(["user_id", "timestamp", "processing_time"]):
+            data = data.filter(data.column("processing_time").is_valid())
+            grouped = pa.table({
+                "user_id": data.column("user_id"),
+                "hour": pc.floor_temporal(data.column("timestamp"), unit="hour"),
+                "bin": sketch_key_arrow(data.column("processing_time")),
+            }).group_by(["user_id", "hour", "bin"]).aggregate([("bin", "count")])
+            yield [
+                {"user_id": row["user_id"], "hour": row["hour"], "bin": row["bin"], "count": row["bin_count"]}
+                for row in grouped.to_pylist()
+            ]
+
+    def hourly_rollups(self) -> Iterator[List[Dict[str, Any]]]:
+        """Tổng hợp dữ liệu lưu trữ theo (user, giờ, cảm xúc), từng tháng một, để dựng emotion_hourly_rollups"""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        columns = ["user_id", "timestamp", "emotion_code", "faces_detected", "score", "image_quality", "processing_time"]
+        for data in self._monthly(columns):
+            detected = pc.fill_null(pc.greater(data.column("faces_detected"), 0), False)
+            scored = pc.and_(detected, pc.fill_null(pc.greater(data.column("score"), 0), False))
+            null_float = pa.scalar(None, pa.float64())
+            grouped = pa.table({
+                "user_id": data.column("user_id"),
+                "hour": pc.floor_temporal(data.column("timestamp"), unit="hour"),
+                "emotion_code": data.column("emotion_code"),
+                "detected": detected.cast(pa.int64()),
+                "image_quality": pc.if_else(detected, data.column("image_quality"), null_float),
+                "score": pc.if_else(scored, data.column("score"), null_float),
+                "processing_time": data.column("processing_time"),
+            }).group_by(["user_id", "hour", "emotion_code"]).aggregate([
+                ("detected", "count"), ("detected", "sum"),
+                ("image_quality", "sum"), ("image_quality", "count"),
+                ("score", "sum"), ("score", "count"),
+                ("processing_time", "sum"), ("processing_time", "count"),
+            ])
+            yield [
+                {
+                    "user_id": row["user_id"],
+                    "hour": row["hour"],
+                    "emotion_code": row["emotion_code"],
+                    "result_count": row["detected_count"],
+                    "detected_count": row["detected_sum"] or 0,
+                    "image_quality_sum": row["image_quality_sum"] or 0.0,
+                    "image_quality_count": row["image_quality_count"],
+                    "score_sum": row["score_sum"] or 0.0,
+                    "score_count": row["score_count"],
+                    "processing_time_sum": row["processing_time_sum"] or 0.0,
+                    "processing_time_count": row["processing_time_count"]
+                }
+                for row in grouped.to_pylist()
+            ]
+
+    def emotion_history(self, limit: int, before: Optional[Keyset] = None,
+                        user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Lịch sử phân tích (mới nhất trước theo (timestamp, id)) từ dữ liệu lưu trữ, cùng định dạng với get_emotion_history
+
+        before: khóa keyset (timestamp, id) của dòng cuối trang trước. Đọc các thư mục tháng từ mới đến cũ,
+        bắt đầu từ tháng của cursor, lọc keyset ngay khi quét file và dừng khi đủ limit dòng: chỉ sắp xếp
+        dữ liệu của các tháng thực sự được đọc.
+        """
+        import pyarrow.dataset as ds
+
+        if limit <= 0 or self.watermark("emotion_results") is None:
+            return []
+        conditions = (ds.field("faces_detected") > 0) & (ds.field("emotion_code") != NO_FACE_CODE)
+        end = None
+        if before is not None:
+            timestamp, row_id = before
+            conditions = conditions & (
+                (ds.field("timestamp") < timestamp) | ((ds.field("timestamp") == timestamp) & (ds.field("id") < row_id))
+            )
+            # Bỏ qua các thư mục tháng mới hơn cursor
+            end = timestamp + timedelta(microseconds=1)
+        columns = ["id", "user_id", "emotion_code", "score", "timestamp", "image_quality", "processing_time"]
+        rows = []
+        for month in reversed(self._months("emotion_results")):
+            month_start, month_end = self._month_range(month)
+            if end is not None:
+                if month_start >= end:
+                    continue
+                month_end = min(month_end, end)
+            data = self.read("emotion_results", columns, start=month_start, end=month_end, user_id=user_id,
+                             filter_expression=conditions)
+            if not data.num_rows:
+                continue
+            data = data.sort_by([("timestamp", "descending"), ("id", "descending")]).slice(0, limit - len(rows))
+            rows.extend(data.to_pylist())
+            if len(rows) >= limit:
+                break
+        history = []
+        for row in rows:
+            item = {
+                "id": row["id"],
+                "emotion": decode_emotion(row["emotion_code"]),
+                "score": row["score"],
+                "timestamp": row["timestamp"],
+                "image_quality": row["image_quality"],
+                "processing_time": row["processing_time"]
+            }
+            if user_id is None:
+                item["user_id"] = row["user_id"]
+            history.append(item)
+        return history
+
+    # ----- Worker -----
+
+    def start(self):
+        """Khởi động worker lưu trữ định kỳ"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="data-archiver", daemon=True)
+        self._thread.start()
+        logger.info(f"Data archiver đã khởi động (retention {self.retention_days} ngày, mỗi {self.interval_seconds}s)")
+
+    def stop(self):
+        """Dừng worker (lô đang xử lý được hoàn tất trước khi dừng)"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=60)
+        self._thread = None
+
+    def _run(self):
+        self.run_once()
+        while not self._stop_event.wait(self.interval_seconds):
+            self.run_once()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của data archiver"""
+        watermark = self.watermark("emotion_results")
+        return {
+            'running': self.running,
+            'retention_days': self.retention_days,
+            'runs': self._runs,
+            'failed_runs': self._failed_runs,
+            'archived_rows': dict(self._archived_rows),
+            'files_written': self._files_written,
+            'archive_reads': self._archive_reads,
+            'emotion_results_archived_before': watermark.isoformat() if watermark else None,
+            'last_run_at': self._last_run_at
+        }
+
+# Instance global
+data_archiver = DataArchiver(
+    bind=engine,
+    root=settings.ARCHIVE_DIR,
+    retention_days=settings.ARCHIVE_RETENTION_DAYS,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    batch_pause_ms=settings.ARCHIVE_BATCH_PAUSE_MS,
+    compression=settings.ARCHIVE_COMPRESSION,
+    interval_seconds=settings.ARCHIVE_INTERVAL_SECONDS
+)
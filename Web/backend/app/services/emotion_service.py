@@ -1,28 +1,41 @@
 from sqlalchemy.orm import Session
 from app.models.models import EmotionResult
-from app.crud.emotion_crud import create_emotion_result, update_emotion_result
+from app.crud.emotion_crud import insert_emotion_result, ingest_emotion_results, update_emotion_result
+from app.crud.session_crud import get_active_session_id, get_session_by_id, insert_session, increment_session_stats
 from PIL import Image
 import base64
 from io import BytesIO
 import json
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import time
 from app.core.config import settings
+from app.core.emotion_codec import (
+    EMOTION_LABELS, EMOTION_LABELS_VN, EMOTION_TRANSLATIONS, NO_FACE_CODE,
+    encode_emotion, decode_emotion, translate_emotion, pack_scores
+)
 from app.core.enums import EmotionType, ImageQualityLevel, EngagementLevel, get_image_quality_level, get_engagement_level
 import logging
 from app.services.system_log_service import SystemLogService
+from app.services.result_buffer import emotion_result_buffer
+from app.services.session_cache import active_session_cache
+from app.services.stats_cache import stats_cache
+from app.services.latency_tracker import latency_tracker, TOTAL_STAGE
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+class SessionNotFound(LookupError):
+    """Phiên client gửi kèm không tồn tại hoặc không thuộc user (route trả 404)"""
+
 class EmotionService:
     """Service xử lý phân tích cảm xúc"""
     
     def __init__(self):
         self.model = None
         self.face_cascade = None
-        self.emotion_labels = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
-        self.emotion_labels_vn = ['Giận dữ', 'Ghê tởm', 'Sợ hãi', 'Vui vẻ', 'Buồn bã', 'Ngạc nhiên', 'Bình thường']
-        self.emotion_translations = dict(zip(self.emotion_labels, self.emotion_labels_vn))
+        self.emotion_labels = list(EMOTION_LABELS)
+        self.emotion_labels_vn = list(EMOTION_LABELS_VN)
+        self.emotion_translations = dict(EMOTION_TRANSLATIONS)
         self._models_loaded = False
         
     def _load_models(self):
@@ -116,11 +129,14 @@ class EmotionService:
                     'success': False,
                     'error': 'Không phát hiện được khuôn mặt',
                     'faces_detected': 0,
-                    'processing_time': preprocess_time
+                    'processing_time': preprocess_time,
+                    'stage_times': {'preprocess': preprocess_time}
                 }
             
             # Dự đoán cảm xúc
+            inference_start = time.time()
             predictions = self.model.predict(processed_face, verbose=0)
+            inference_time = time.time() - inference_start
             emotion_scores = predictions[0]
             
             # Tìm cảm xúc có điểm cao nhất
@@ -152,6 +168,7 @@ class EmotionService:
                 'faces_detected': 1,
                 'image_quality': image_quality,
                 'processing_time': total_time,
+                'stage_times': {'preprocess': preprocess_time, 'inference': inference_time},
                 'confidence_level': dominant_emotion_score
             }
             
@@ -198,97 +215,216 @@ class EmotionService:
         except Exception:
             return 0.5
     
-    def save_emotion_result(self, db: Session, user_id: int, analysis_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Lưu kết quả phân tích vào database"""
+    def _build_result_record(self, user_id: int, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Tạo bản ghi EmotionResult từ kết quả phân tích (cả thành công và thất bại)"""
+        processing_time = analysis_result['processing_time']
+        record = {
+            'user_id': user_id,
+            'image_quality': analysis_result.get('image_quality', 0.5),
+            'analysis_duration': processing_time,
+            'processing_time': processing_time,
+            'avg_fps': 1000 / processing_time if processing_time > 0 else 0,
+            'image_size': f"{analysis_result.get('image_width', 0)}x{analysis_result.get('image_height', 0)}",
+            'cache_hits': 0
+        }
+        
+        if analysis_result.get('success', False):
+            # Trường hợp thành công - có phát hiện khuôn mặt
+            # Nhãn tiếng Việt và điểm số theo nhãn được suy ra khi đọc
+            record.update({
+                'emotion_code': encode_emotion(analysis_result['dominant_emotion']),
+                'score': analysis_result['dominant_emotion_score'],
+                'faces_detected': analysis_result['faces_detected'],
+                'dominant_emotion_score': analysis_result['dominant_emotion_score'],
+                'engagement': analysis_result['engagement'],
+                'scores_packed': pack_scores(analysis_result['emotions_scores']),
+                'confidence_level': analysis_result.get('confidence_level', 0.0)
+            })
+        else:
+            # Trường hợp thất bại - không phát hiện khuôn mặt
+            record.update({
+                'emotion_code': NO_FACE_CODE,  # Đánh dấu không phát hiện khuôn mặt
+                'score': 0.0,
+                'faces_detected': 0,
+                'dominant_emotion_score': 0.0,
+                'engagement': 'none',
+                'scores_packed': None,
+                'confidence_level': 0.0
+            })
+        return record
+    
+    def _result_summary(self, result_id: Optional[int], record: Dict[str, Any]) -> Dict[str, Any]:
+        """Thông tin kết quả đã lưu trả về cho client"""
+        emotion = decode_emotion(record['emotion_code'])
+        return {
+            'id': result_id,
+            'emotion': emotion,
+            'score': record['score'],
+            'faces_detected': record['faces_detected'],
+            'dominant_emotion': emotion,
+            'dominant_emotion_vn': translate_emotion(emotion),
+            'dominant_emotion_score': record['dominant_emotion_score'],
+            'engagement': record['engagement'],
+            'processing_time': record['processing_time'],
+            'image_quality': record['image_quality'],
+            'confidence_level': record['confidence_level']
+        }
+    
+    def _record_latency(self, user_id: int, session_id: Optional[int], analysis_result: Dict[str, Any],
+                        record: Dict[str, Any]):
+        """Ghi thời gian xử lý (tổng và từng giai đoạn) vào sketch phân vị trong bộ nhớ"""
+        stage_times = dict(analysis_result.get('stage_times') or {})
+        stage_times[TOTAL_STAGE] = record['processing_time']
+        latency_tracker.record(user_id, session_id, stage_times)
+    
+    def _store_result_record(self, db: Session, record: Dict[str, Any]) -> Tuple[Optional[int], bool]:
+        """Ghi bản ghi, không commit; trả về (id, có ghi qua buffer không)
+        
+        Write-behind (buffer đang chạy): chưa ghi, id chưa có; caller đẩy vào buffer sau khi commit.
+        """
+        if emotion_result_buffer.running:
+            record['timestamp'] = datetime.now(timezone.utc)
+            return None, True
+        return insert_emotion_result(db, record, commit=False), False
+    
+    def _resolve_active_session(self, db: Session, user_id: int) -> int:
+        """Lấy id phiên đang mở (cache, sau đó partial index), tạo phiên mới nếu chưa có
+        
+        Partial unique index bảo đảm hai request đồng thời không tạo hai phiên đang mở cho cùng user.
+        """
+        session_id = active_session_cache.get(user_id)
+        if session_id is None:
+            session_id = get_active_session_id(db, user_id)
+        if session_id is None:
+            session_id = insert_session(db, user_id, camera_resolution="640x480", analysis_interval=500,
+                                        max_session_duration=settings.SESSION_DEFAULT_MAX_DURATION, commit=False)
+        if session_id is None:
+            # Request song song vừa mở phiên (ON CONFLICT DO NOTHING): dùng phiên đó
+            session_id = get_active_session_id(db, user_id)
+        return session_id
+    
+    def record_analysis(self, db: Session, user_id: int, analysis_result: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """Lưu kết quả, log và cập nhật phiên phân tích trong một transaction (một commit)
+        
+        Trả về (saved_result, session_id).
+        """
         try:
-            # Lưu cả kết quả thành công và thất bại
-            if analysis_result.get('success', False):
-                # Trường hợp thành công - có phát hiện khuôn mặt
-                emotion_result = create_emotion_result(
-                    db=db,
-                    user_id=user_id,
-                    emotion=analysis_result['dominant_emotion'],
-                    score=analysis_result['dominant_emotion_score'],
-                    faces_detected=analysis_result['faces_detected'],
-                    dominant_emotion=analysis_result['dominant_emotion'],
-                    dominant_emotion_vn=analysis_result['dominant_emotion_vn'],
-                    dominant_emotion_score=analysis_result['dominant_emotion_score'],
-                    engagement=analysis_result['engagement'],
-                    emotions_scores=analysis_result['emotions_scores'],
-                    emotions_scores_vn=analysis_result['emotions_scores_vn'],
-                    image_quality=analysis_result.get('image_quality', 0.5),
-                    analysis_duration=analysis_result['processing_time'],
-                    confidence_level=analysis_result.get('confidence_level', 0.0),
-                    processing_time=analysis_result['processing_time'],
-                    avg_fps=1000 / analysis_result['processing_time'] if analysis_result['processing_time'] > 0 else 0,
-                    image_size=f"{analysis_result.get('image_width', 0)}x{analysis_result.get('image_height', 0)}",
-                    cache_hits=0
-                )
-                
-                # Log kết quả phân tích thành công
-                SystemLogService.log_emotion_analysis(
-                    db, user_id, analysis_result['faces_detected'], 
-                    analysis_result['dominant_emotion_vn'], analysis_result['processing_time']
-                )
-                
-                return {
-                    'id': emotion_result.id,
-                    'emotion': emotion_result.emotion,
-                    'score': emotion_result.score,
-                    'faces_detected': emotion_result.faces_detected,
-                    'dominant_emotion': emotion_result.dominant_emotion,
-                    'dominant_emotion_vn': emotion_result.dominant_emotion_vn,
-                    'dominant_emotion_score': emotion_result.dominant_emotion_score,
-                    'engagement': emotion_result.engagement,
-                    'processing_time': emotion_result.processing_time,
-                    'image_quality': emotion_result.image_quality,
-                    'confidence_level': emotion_result.confidence_level
-                }
-            else:
-                # Trường hợp thất bại - không phát hiện khuôn mặt
-                emotion_result = create_emotion_result(
-                    db=db,
-                    user_id=user_id,
-                    emotion='no_face_detected',  # Đánh dấu không phát hiện khuôn mặt
-                    score=0.0,
-                    faces_detected=0,
-                    dominant_emotion='no_face_detected',
-                    dominant_emotion_vn='Không phát hiện khuôn mặt',
-                    dominant_emotion_score=0.0,
-                    engagement='none',
-                    emotions_scores={},
-                    emotions_scores_vn={},
-                    image_quality=analysis_result.get('image_quality', 0.5),
-                    analysis_duration=analysis_result['processing_time'],
-                    confidence_level=0.0,
-                    processing_time=analysis_result['processing_time'],
-                    avg_fps=1000 / analysis_result['processing_time'] if analysis_result['processing_time'] > 0 else 0,
-                    image_size=f"{analysis_result.get('image_width', 0)}x{analysis_result.get('image_height', 0)}",
-                    cache_hits=0
-                )
-                
-                # Log thất bại phát hiện khuôn mặt
-                SystemLogService.log_emotion_analysis(
-                    db, user_id, 0, 'Không phát hiện khuôn mặt', analysis_result['processing_time']
-                )
-                
-                return {
-                    'id': emotion_result.id,
-                    'emotion': 'no_face_detected',
-                    'score': 0.0,
-                    'faces_detected': 0,
-                    'dominant_emotion': 'no_face_detected',
-                    'dominant_emotion_vn': 'Không phát hiện khuôn mặt',
-                    'dominant_emotion_score': 0.0,
-                    'engagement': 'none',
-                    'processing_time': emotion_result.processing_time,
-                    'image_quality': emotion_result.image_quality,
-                    'confidence_level': 0.0
-                }
+            record = self._build_result_record(user_id, analysis_result)
+            
+            result_id, buffered = self._store_result_record(db, record)
+            
+            processing_time = record['processing_time']
+            stats = {
+                'successful': 1 if record['faces_detected'] > 0 else 0,
+                'processing_time_sum': processing_time,
+                'fps_sum': record['avg_fps']
+            }
+            session_id = self._resolve_active_session(db, user_id)
+            if not increment_session_stats(db, session_id, only_active=True, commit=False, **stats):
+                # Phiên trong cache đã bị kết thúc (end-session ở worker khác hoặc reaper)
+                active_session_cache.invalidate(user_id, session_id)
+                session_id = self._resolve_active_session(db, user_id)
+                increment_session_stats(db, session_id, commit=False, **stats)
+            
+            SystemLogService.log_emotion_analysis(
+                db, user_id, record['faces_detected'],
+                translate_emotion(decode_emotion(record['emotion_code'])), processing_time, commit=False
+            )
+            
+            db.commit()
+            if buffered:
+                # Chỉ đẩy vào buffer sau khi commit: transaction lỗi thì bản ghi bị bỏ cùng transaction
+                emotion_result_buffer.put(record)
+            # Chỉ cache sau khi commit để không trỏ tới phiên chưa tồn tại
+            active_session_cache.set(user_id, session_id)
+            stats_cache.invalidate(user_id)
+            self._record_latency(user_id, session_id, analysis_result, record)
+            return self._result_summary(result_id, record), session_id
             
         except Exception as e:
+            db.rollback()
             logger.error(f"Lỗi lưu kết quả phân tích: {e}")
-            return None
+            return None, None
+
+    def _build_ingested_record(self, user_id: int, row: Dict[str, Any], emotion_code: int) -> Dict[str, Any]:
+        """Tạo bản ghi EmotionResult từ một kết quả client offline đã được kiểm tra"""
+        scores = row['scores'] if emotion_code != NO_FACE_CODE else None
+        score = row['score']
+        if score is None:
+            score = scores[emotion_code] if scores else 0.0
+        processing_time = row['processing_time'] or 0.0
+        return {
+            'user_id': user_id,
+            'client_result_id': row['client_result_id'],
+            'emotion_code': emotion_code,
+            'score': score,
+            'faces_detected': row['faces_detected'] if row['faces_detected'] is not None else int(emotion_code != NO_FACE_CODE),
+            'dominant_emotion_score': score,
+            'engagement': row['engagement'] or ('none' if emotion_code == NO_FACE_CODE else self._determine_engagement(score)),
+            'scores_packed': pack_scores(scores),
+            'image_quality': row['image_quality'],
+            'face_position': None,
+            'analysis_duration': processing_time,
+            'confidence_level': row['confidence_level'] if row['confidence_level'] is not None else 0.0,
+            'processing_time': processing_time,
+            'avg_fps': 1000 / processing_time if processing_time > 0 else 0,
+            'image_size': None,
+            'cache_hits': 0,
+            'timestamp': row['timestamp']
+        }
+    
+    def ingest_results(self, db: Session, user_id: int, rows: List[Dict[str, Any]], emotion_codes: List[int],
+                       session_id: Optional[int] = None) -> Tuple[int, Optional[int]]:
+        """Ghi một lô kết quả offline, cộng dồn phiên một lần cho cả lô, trong một transaction
+        
+        session_id: phiên của client (phải thuộc user); mặc định là phiên đang mở.
+        Bản ghi trùng (đã gửi trước đó) bị bỏ qua và không được cộng vào phiên.
+        Trả về (số dòng đã ghi, session_id).
+        """
+        if session_id is not None:
+            session = get_session_by_id(db, session_id)
+            if session is None or session.user_id != user_id:
+                raise SessionNotFound(f"Không tìm thấy phiên {session_id} của user")
+        
+        records = [self._build_ingested_record(user_id, row, int(code)) for row, code in zip(rows, emotion_codes)]
+        try:
+            inserted = ingest_emotion_results(db, records, commit=False)
+            if not inserted:
+                db.commit()
+                return 0, session_id
+            
+            stats = {
+                'analyses': len(inserted),
+                'successful': sum(1 for row in inserted if row.faces_detected > 0),
+                'processing_time_sum': sum(row.processing_time or 0.0 for row in inserted),
+                'fps_sum': sum(row.avg_fps or 0.0 for row in inserted)
+            }
+            resolved = session_id is None
+            if not resolved:
+                # Phiên offline có thể đã kết thúc: vẫn cộng dồn
+                increment_session_stats(db, session_id, commit=False, **stats)
+            else:
+                session_id = self._resolve_active_session(db, user_id)
+                if not increment_session_stats(db, session_id, only_active=True, commit=False, **stats):
+                    active_session_cache.invalidate(user_id, session_id)
+                    session_id = self._resolve_active_session(db, user_id)
+                    increment_session_stats(db, session_id, commit=False, **stats)
+            
+            SystemLogService.log_info(
+                db, f"User {user_id} - Ingest offline: ghi {len(inserted)}/{len(records)} kết quả vào phiên {session_id}",
+                user_id, event_type="bulk_ingest", value=len(inserted), commit=False
+            )
+            db.commit()
+            if resolved:
+                active_session_cache.set(user_id, session_id)
+            stats_cache.invalidate(user_id)
+            for row in inserted:
+                latency_tracker.record(user_id, session_id, {TOTAL_STAGE: row.processing_time})
+            return len(inserted), session_id
+            
+        except Exception:
+            db.rollback()
+            raise
 
 # Tạo instance global
 emotion_service = EmotionService() 
\ No newline at end of file
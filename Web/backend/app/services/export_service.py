@@ -0,0 +1,205 @@
+import io
+import csv
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.emotion_codec import EMOTION_LABELS, decode_emotion, unpack_scores
+from app.models.models import EmotionResult
+from app.services.data_archiver import data_archiver
+
+logger = logging.getLogger(__name__)
+
+# Định dạng xuất: (content type, phần mở rộng file)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_PARQUET_COMPRESSION = "zstd"
+
+# Cột đọc từ emotion_results (database và file lưu trữ có cùng tên cột)
+_SOURCE_COLUMNS = [
+    "id", "user_id", "timestamp", "emotion_code", "score", "faces_detected", "dominant_emotion_score",
+    "engagement", "scores_packed", "image_quality", "analysis_duration", "confidence_level",
+    "processing_time", "avg_fps", "image_size"
+]
+
+# Cột của file xuất: nhãn cảm xúc thay cho mã, 7 điểm số tách thành cột score_<nhãn>
+EXPORT_COLUMNS = [
+    "id", "user_id", "timestamp", "emotion", "score", "faces_detected", "dominant_emotion_score",
+    "engagement", "image_quality", "analysis_duration", "confidence_level", "processing_time",
+    "avg_fps", "image_size"
+] + [f"score_{label}" for label in EMOTION_LABELS]
+
+def _parquet_schema():
+    import pyarrow as pa
+    types = {
+        "id": pa.int64(), "user_id": pa.int64(), "timestamp": pa.timestamp("us", tz="UTC"),
+        "emotion": pa.string(), "faces_detected": pa.int32(), "engagement": pa.string(), "image_size": pa.string()
+    }
+    return pa.schema([(column, types.get(column, pa.float64())) for column in EXPORT_COLUMNS])
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """SQLite trả về datetime không có timezone (giá trị UTC)"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _export_row(row) -> List[Any]:
+    """Một dòng emotion_results (mapping) thành danh sách giá trị theo EXPORT_COLUMNS"""
+    scores = unpack_scores(row["scores_packed"])
+    return [
+        row["id"], row["user_id"], _to_utc(row["timestamp"]), decode_emotion(row["emotion_code"]), row["score"],
+        row["faces_detected"], row["dominant_emotion_score"], row["engagement"], row["image_quality"],
+        row["analysis_duration"], row["confidence_level"], row["processing_time"], row["avg_fps"], row["image_size"]
+    ] + [scores.get(label) for label in EMOTION_LABELS]
+
+class _ResponseSink(io.RawIOBase):
+    """File chỉ ghi cho ParquetWriter: gom bytes để generator gửi dần ra response"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class _CsvEncoder:
+    def header(self) -> bytes:
+        return self._encode([EXPORT_COLUMNS])
+
+    def encode(self, rows: Sequence[List[Any]]) -> bytes:
+        return self._encode([
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        ])
+
+    def close(self) -> bytes:
+        return b""
+
+    @staticmethod
+    def _encode(rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+class _NdjsonEncoder:
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[List[Any]]) -> bytes:
+        lines = []
+        for row in rows:
+            item = dict(zip(EXPORT_COLUMNS, row))
+            item["timestamp"] = item["timestamp"].isoformat() if item["timestamp"] else None
+            lines.append(json.dumps(item, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def close(self) -> bytes:
+        return b""
+
+class _ParquetEncoder:
+    """Mỗi lô ghi thành một row group, bytes được lấy ra ngay sau khi ghi"""
+
+    def __init__(self):
+        import pyarrow.parquet as pq
+        self._schema = _parquet_schema()
+        self._sink = _ResponseSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression=_PARQUET_COMPRESSION)
+
+    def header(self) -> bytes:
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence[List[Any]]) -> bytes:
+        import pyarrow as pa
+        if rows:
+            columns = list(zip(*rows))
+            self._writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, self._schema)], schema=self._schema
+            ))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+_ENCODERS = {"csv": _CsvEncoder, "ndjson": _NdjsonEncoder, "parquet": _ParquetEncoder}
+
+def export_range(start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Chuẩn hóa khoảng xuất về UTC (không có timezone: coi là UTC); ValueError nếu start không trước end"""
+    start, end = _to_utc(start), _to_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise ValueError("start_date phải trước end_date")
+    return start, end
+
+def export_filename(fmt: str, user_id: Optional[int], start: Optional[datetime], end: Optional[datetime]) -> str:
+    """Tên file xuất, ví dụ emotion_results_user12_2026-02-01_2026-06-30.csv"""
+    scope = "all_users" if user_id is None else f"user{user_id}"
+    period = "_".join(moment.strftime("%Y-%m-%d") for moment in (start, end) if moment is not None)
+    return f"emotion_results_{scope}{'_' + period if period else ''}.{EXPORT_FORMATS[fmt][1]}"
+
+def stream_emotion_results(fmt: str, user_id: Optional[int] = None, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, batch_size: Optional[int] = None) -> Iterator[bytes]:
+    """Xuất kết quả phân tích trong [start, end) của một user (None: tất cả) theo từng lô
+
+    Dữ liệu đã lưu trữ ra Parquet được xuất trước, sau đó là database theo (timestamp, id) qua
+    server-side cursor (yield_per): bộ nhớ chỉ phụ thuộc batch_size. Generator tự mở session
+    riêng vì response còn stream sau khi request handler kết thúc.
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    start, end = _to_utc(start), _to_utc(end)
+    encoder = _ENCODERS[fmt]()
+    query = select(*(EmotionResult.__table__.c[column] for column in _SOURCE_COLUMNS))
+    if user_id is not None:
+        query = query.where(EmotionResult.user_id == user_id)
+    if start is not None:
+        query = query.where(EmotionResult.timestamp >= start)
+    if end is not None:
+        query = query.where(EmotionResult.timestamp < end)
+    query = query.order_by(EmotionResult.timestamp, EmotionResult.id).execution_options(yield_per=batch_size)
+
+    db = SessionLocal()
+    exported = 0
+    try:
+        # Chốt danh sách file lưu trữ và mở cursor cùng lúc: lượt lưu trữ chạy song song (cùng process)
+        # chỉ xóa dòng mà cursor vẫn thấy và ghi file mới không nằm trong danh sách -> không thiếu, không trùng
+        with data_archiver.run_lock:
+            archived = data_archiver.read_batches(
+                "emotion_results", _SOURCE_COLUMNS, batch_size, start=start, end=end, user_id=user_id
+            ) if data_archiver.watermark("emotion_results") is not None else []
+            result = db.execute(query)
+
+        yield encoder.header()
+        for batch in archived:
+            rows = [_export_row(row) for row in batch.to_pylist()]
+            exported += len(rows)
+            yield encoder.encode(rows)
+        for partition in result.mappings().partitions():
+            rows = [_export_row(row) for row in partition]
+            exported += len(rows)
+            yield encoder.encode(rows)
+        yield encoder.close()
+        logger.info(f"Đã xuất {exported} kết quả phân tích ({fmt}, user={user_id if user_id is not None else 'all'})")
+    finally:
+        db.close()
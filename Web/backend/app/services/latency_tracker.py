@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional
+from app.core.config import settings
+from app.core.sketch import DDSketch
+
+# Giai đoạn tổng (thời gian xử lý lưu trong emotion_results)
+TOTAL_STAGE = "total"
+
+Stages = Dict[str, DDSketch]
+
+class LatencyTracker:
+    """Sketch phân vị thời gian xử lý trong bộ nhớ theo giai đoạn: toàn hệ thống, từng user và từng phiên
+
+    Tính từ lúc process khởi động; user / phiên lâu không có kết quả bị bỏ theo LRU khi vượt max_keys.
+    Percentile theo khoảng thời gian bất kỳ (bền qua restart) đọc từ latency_hourly_sketches; sketch của
+    phiên được ghi vào analysis_sessions khi phiên kết thúc. Chạy nhiều worker: mỗi process giữ phần của mình.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(1, max_keys)
+        self._global: Stages = {}
+        self._scopes: "OrderedDict[Hashable, Stages]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._evictions = 0
+
+    def _scope(self, key: Hashable) -> Stages:
+        stages = self._scopes.get(key)
+        if stages is None:
+            stages = self._scopes[key] = {}
+            while len(self._scopes) > self.max_keys:
+                self._scopes.popitem(last=False)
+                self._evictions += 1
+        else:
+            self._scopes.move_to_end(key)
+        return stages
+
+    def record(self, user_id: Optional[int], session_id: Optional[int], stage_times: Dict[str, Optional[float]]):
+        """Ghi thời gian từng giai đoạn của một lần phân tích (giá trị None bị bỏ qua)"""
+        with self._lock:
+            targets = [self._global]
+            if user_id is not None:
+                targets.append(self._scope(("user", user_id)))
+            if session_id is not None:
+                targets.append(self._scope(("session", session_id)))
+            for stage, value in stage_times.items():
+                if value is None:
+                    continue
+                for stages in targets:
+                    sketch = stages.get(stage)
+                    if sketch is None:
+                        sketch = stages[stage] = DDSketch()
+                    sketch.add(value)
+            self._recorded += 1
+
+    def snapshot(self, user_id: Optional[int] = None, session_id: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """p50/p95/p99 theo giai đoạn của phiên, của user, hoặc toàn hệ thống (không truyền gì)"""
+        with self._lock:
+            if session_id is not None:
+                stages = self._scopes.get(("session", session_id), {})
+            elif user_id is not None:
+                stages = self._scopes.get(("user", user_id), {})
+            else:
+                stages = self._global
+            return {stage: sketch.percentiles() for stage, sketch in stages.items()}
+
+    def session_sketch(self, session_id: int) -> DDSketch:
+        """Bản sao sketch thời gian xử lý tổng của phiên (rỗng nếu process này chưa ghi)"""
+        with self._lock:
+            sketch = self._scopes.get(("session", session_id), {}).get(TOTAL_STAGE)
+            return DDSketch().merge(sketch) if sketch is not None else DDSketch()
+
+    def pop_session(self, session_id: int) -> DDSketch:
+        """Lấy và bỏ sketch của phiên đã kết thúc (để ghi vào database)"""
+        with self._lock:
+            stages = self._scopes.pop(("session", session_id), {})
+            return stages.get(TOTAL_STAGE) or DDSketch()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của latency tracker (kèm percentile toàn hệ thống)"""
+        with self._lock:
+            return {
+                'recorded': self._recorded,
+                'tracked_scopes': len(self._scopes),
+                'evictions': self._evictions,
+                'stages': {stage: sketch.percentiles() for stage, sketch in self._global.items()}
+            }
+
+# Instance global
+latency_tracker = LatencyTracker(max_keys=settings.LATENCY_TRACKER_MAX_KEYS)
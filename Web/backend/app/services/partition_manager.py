@@ -0,0 +1,231 @@
+import re
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from app.core.config import settings
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INTERVALS = ("day", "week", "month")
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def interval_start(moment: datetime, interval: str) -> datetime:
+    """Mốc đầu khoảng phân vùng chứa moment (UTC)"""
+    moment = moment.astimezone(timezone.utc)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Khoảng phân vùng không hợp lệ: {interval}")
+
+def next_interval(start: datetime, interval: str) -> datetime:
+    """Mốc đầu khoảng phân vùng kế tiếp"""
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(weeks=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+def partition_name(table: str, start: datetime, interval: str) -> str:
+    """Tên partition theo mốc bắt đầu, ví dụ emotion_results_p2026_10"""
+    if interval == "day":
+        return f"{table}_p{start:%Y_%m_%d}"
+    if interval == "week":
+        year, week, _ = start.isocalendar()
+        return f"{table}_p{year}w{week:02d}"
+    return f"{table}_p{start:%Y_%m}"
+
+def partition_ranges(first: datetime, last: datetime, interval: str) -> List[Tuple[datetime, datetime]]:
+    """Các khoảng [start, end) phủ từ first tới last"""
+    ranges = []
+    start = interval_start(first, interval)
+    while start <= last:
+        end = next_interval(start, interval)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def create_partition_sql(table: str, start: datetime, end: datetime, interval: str,
+                         parent: Optional[str] = None) -> str:
+    """Câu lệnh tạo partition cho khoảng [start, end) (parent mặc định là table)"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start, interval)} "
+        f"PARTITION OF {parent or table} FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+class PartitionManager:
+    """Quản lý partition theo thời gian của bảng (PostgreSQL): tạo trước partition tương lai, tách partition cũ"""
+
+    def __init__(self, bind: Engine, table: str, interval: str, premake: int,
+                 retention: int, retention_mode: str, maintenance_interval_seconds: int):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Khoảng phân vùng không hợp lệ: {interval}")
+        if retention_mode not in ("detach", "drop"):
+            raise ValueError(f"Chế độ retention không hợp lệ: {retention_mode}")
+        self.bind = bind
+        self.table = table
+        self.interval = interval
+        self.premake = premake
+        self.retention = retention
+        self.retention_mode = retention_mode
+        self.maintenance_interval_seconds = max(60, maintenance_interval_seconds)
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = 0
+        self._failed_runs = 0
+        self._created = 0
+        self._retired = 0
+        self._last_run_at: Optional[float] = None
+
+    @property
+    def supported(self) -> bool:
+        """Chỉ PostgreSQL hỗ trợ partition; SQLite dùng một bảng duy nhất"""
+        return self.bind.dialect.name == "postgresql"
+
+    @property
+    def running(self) -> bool:
+        """Worker bảo trì có đang chạy không"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_partitioned(self, conn: Connection) -> bool:
+        """Bảng đã được chuyển sang partition chưa"""
+        return bool(conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+        ), {'table': self.table}).scalar())
+
+    def list_partitions(self, conn: Connection) -> List[Dict[str, Any]]:
+        """Danh sách partition đang gắn với bảng, sắp theo mốc bắt đầu (partition DEFAULT ở cuối)"""
+        rows = conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+        ), {'table': self.table}).all()
+
+        partitions = []
+        for name, bound in rows:
+            match = _BOUND_PATTERN.search(bound or "")
+            partitions.append({
+                'name': name,
+                'start': datetime.fromisoformat(match.group(1)) if match else None,
+                'end': datetime.fromisoformat(match.group(2)) if match else None,
+                'default': not match
+            })
+        return sorted(partitions, key=lambda p: (p['default'], p['start'] or datetime.max.replace(tzinfo=timezone.utc)))
+
+    def ensure_future_partitions(self, conn: Connection, now: Optional[datetime] = None) -> List[str]:
+        """Tạo partition cho khoảng hiện tại và premake khoảng kế tiếp (nếu chưa có)"""
+        now = now or datetime.now(timezone.utc)
+        covered = {(p['start'], p['end']) for p in self.list_partitions(conn) if not p['default']}
+
+        last = interval_start(now, self.interval)
+        for _ in range(self.premake):
+            last = next_interval(last, self.interval)
+
+        created = []
+        for start, end in partition_ranges(now, last, self.interval):
+            if (start, end) in covered:
+                continue
+            conn.execute(text(create_partition_sql(self.table, start, end, self.interval)))
+            created.append(partition_name(self.table, start, self.interval))
+        return created
+
+    def retire_old_partitions(self, conn: Connection, now: Optional[datetime] = None) -> List[str]:
+        """Tách (hoặc xóa) partition nằm hoàn toàn ngoài retention; retention = 0 giữ tất cả"""
+        if self.retention <= 0:
+            return []
+        cutoff = interval_start(now or datetime.now(timezone.utc), self.interval)
+        for _ in range(self.retention):
+            cutoff = interval_start(cutoff - timedelta(days=1), self.interval)
+
+        retired = []
+        for partition in self.list_partitions(conn):
+            if partition['default'] or partition['end'] > cutoff:
+                continue
+            # DETACH chỉ sửa catalog, không quét hay ghi lại dữ liệu
+            conn.execute(text(f"ALTER TABLE {self.table} DETACH PARTITION {partition['name']}"))
+            if self.retention_mode == "drop":
+                conn.execute(text(f"DROP TABLE {partition['name']}"))
+            retired.append(partition['name'])
+        return retired
+
+    def run_maintenance(self) -> Dict[str, Any]:
+        """Một lượt bảo trì: tạo partition tương lai và tách partition cũ"""
+        if not self.supported:
+            return {'success': False, 'error': 'Database không hỗ trợ partition'}
+        try:
+            with self.bind.begin() as conn:
+                if not self.is_partitioned(conn):
+                    return {'success': False, 'error': f'Bảng {self.table} chưa được partition'}
+                created = self.ensure_future_partitions(conn)
+                retired = self.retire_old_partitions(conn)
+        except Exception as e:
+            self._failed_runs += 1
+            logger.error(f"Lỗi bảo trì partition {self.table}: {e}")
+            return {'success': False, 'error': str(e)}
+
+        self._runs += 1
+        self._created += len(created)
+        self._retired += len(retired)
+        self._last_run_at = time.time()
+        if created or retired:
+            logger.info(f"Partition {self.table}: tạo {created}, {self.retention_mode} {retired}")
+        return {'success': True, 'created': created, 'retired': retired}
+
+    def start(self):
+        """Khởi động worker bảo trì (chạy một lượt ngay khi khởi động)"""
+        if self.running or not self.supported:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"partition-manager-{self.table}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dừng worker bảo trì"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    def _run(self):
+        self.run_maintenance()
+        while not self._stop_event.wait(self.maintenance_interval_seconds):
+            self.run_maintenance()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của partition manager"""
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'runs': self._runs,
+            'failed_runs': self._failed_runs,
+            'created_partitions': self._created,
+            'retired_partitions': self._retired,
+            'last_run_at': self._last_run_at
+        }
+
+# Instance global cho emotion_results
+emotion_partition_manager = PartitionManager(
+    bind=engine,
+    table="emotion_results",
+    interval=settings.EMOTION_PARTITION_INTERVAL,
+    premake=settings.EMOTION_PARTITION_PREMAKE,
+    retention=settings.EMOTION_PARTITION_RETENTION,
+    retention_mode=settings.EMOTION_PARTITION_RETENTION_MODE,
+    maintenance_interval_seconds=settings.EMOTION_PARTITION_MAINTENANCE_INTERVAL_SECONDS
+)
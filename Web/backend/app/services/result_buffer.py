@@ -0,0 +1,34 @@
+from typing import List, Dict, Any
+from sqlalchemy.exc import IntegrityError, DataError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.batch_writer import BatchWriter
+from app.crud.emotion_crud import bulk_create_emotion_results
+from app.services.stats_cache import stats_cache
+
+def _flush_emotion_results(records: List[Dict[str, Any]]):
+    """Ghi một lô EmotionResult bằng session riêng của flusher"""
+    db = SessionLocal()
+    try:
+        bulk_create_emotion_results(db, records)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    # Dòng chỉ thấy được sau khi flush: bỏ cache thống kê của các user trong lô
+    for user_id in {record['user_id'] for record in records}:
+        stats_cache.invalidate(user_id)
+
+# Buffer ghi nền cho kết quả phân tích (chỉ dùng khi EMOTION_WRITE_BEHIND_ENABLED)
+emotion_result_buffer = BatchWriter(
+    name="emotion_results",
+    flush_func=_flush_emotion_results,
+    max_size=settings.EMOTION_BUFFER_MAX_SIZE,
+    flush_rows=settings.EMOTION_BUFFER_FLUSH_ROWS,
+    flush_interval_ms=settings.EMOTION_BUFFER_FLUSH_INTERVAL_MS,
+    overflow_policy=settings.EMOTION_BUFFER_OVERFLOW_POLICY,
+    block_timeout_ms=settings.EMOTION_BUFFER_BLOCK_TIMEOUT_MS,
+    # Bản ghi vi phạm ràng buộc (vd. user đã bị xóa) bị tách ra và bỏ, không chặn các lô sau
+    permanent_errors=(IntegrityError, DataError)
+)
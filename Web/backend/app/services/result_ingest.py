@@ -0,0 +1,155 @@
+import io
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.core.emotion_codec import EMOTION_LABELS, NO_FACE_LABEL, NO_FACE_CODE
+
+# Định dạng một kết quả do client offline gửi lên (NDJSON: mỗi dòng một object; Arrow IPC: cùng tên cột)
+#   client_result_id  str (bắt buộc, <= 64 ký tự, duy nhất theo user)
+#   timestamp         ISO 8601 / timestamp (bắt buộc)
+#   emotion           nhãn tiếng Anh hoặc "no_face_detected" (bắt buộc)
+#   scores            7 số thực theo thứ tự EMOTION_LABELS
+#   score, faces_detected, engagement, image_quality, processing_time (ms), confidence_level
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+ARROW_CONTENT_TYPES = ("application/vnd.apache.arrow.stream",)
+
+MAX_CLIENT_ID_LENGTH = 64
+
+# Mã cảm xúc = vị trí trong EMOTION_LABELS, nhãn không phát hiện khuôn mặt đặt cuối
+_INGEST_LABELS = EMOTION_LABELS + [NO_FACE_LABEL]
+
+def _ingest_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("client_result_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("emotion", pa.string()),
+        ("score", pa.float64()),
+        ("faces_detected", pa.int64()),
+        ("scores", pa.list_(pa.float64())),
+        ("engagement", pa.string()),
+        ("image_quality", pa.float64()),
+        ("processing_time", pa.float64()),
+        ("confidence_level", pa.float64()),
+    ])
+
+def _conform(table):
+    """Chọn đúng các cột của schema ingest (cột thiếu -> null), ép kiểu"""
+    import pyarrow as pa
+
+    schema = _ingest_schema()
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table.column(field.name).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def parse_results(body: bytes, content_type: str):
+    """Đọc body NDJSON hoặc Arrow IPC stream thành pyarrow.Table theo schema ingest
+
+    Lỗi định dạng (JSON hỏng, kiểu không ép được) làm hỏng cả lô -> ValueError.
+    """
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    try:
+        if media_type in ARROW_CONTENT_TYPES:
+            table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        elif media_type in NDJSON_CONTENT_TYPES:
+            table = pa_json.read_json(
+                io.BytesIO(body),
+                parse_options=pa_json.ParseOptions(explicit_schema=_ingest_schema(), unexpected_field_behavior="ignore")
+            )
+        else:
+            raise ValueError(f"Content-Type không hỗ trợ: {media_type or 'trống'} "
+                             f"(dùng {NDJSON_CONTENT_TYPES[0]} hoặc {ARROW_CONTENT_TYPES[0]})")
+        return _conform(table)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Dữ liệu không hợp lệ: {e}")
+
+def _mask(array, null_invalid: bool) -> np.ndarray:
+    """Mảng bool numpy từ kết quả so sánh Arrow (null -> null_invalid)"""
+    import pyarrow.compute as pc
+    return pc.fill_null(array, null_invalid).to_numpy(zero_copy_only=False)
+
+def _out_of_range(array, low: float, high: Optional[float] = None):
+    import pyarrow.compute as pc
+    condition = pc.less(array, low)
+    if high is not None:
+        condition = pc.or_(condition, pc.greater(array, high))
+    return condition
+
+def validate_results(table, now: Optional[datetime] = None,
+                     max_clock_skew_seconds: int = 300) -> Tuple[Any, np.ndarray, Dict[str, Any]]:
+    """Kiểm tra cả lô bằng phép toán trên cột (không lặp từng dòng)
+
+    Trả về (các dòng hợp lệ, mã cảm xúc tương ứng, báo cáo) với báo cáo gồm
+    số dòng trùng client_result_id trong lô và danh sách lỗi [(index, client_result_id, lỗi)].
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    now = now or datetime.now(timezone.utc)
+    table = table.combine_chunks()
+    rows = table.num_rows
+    client_id = table.column("client_result_id")
+    codes = pc.index_in(table.column("emotion"), value_set=pa.array(_INGEST_LABELS))
+    faces = table.column("faces_detected")
+    is_no_face = pc.equal(codes, len(EMOTION_LABELS))
+
+    scores = table.column("scores").combine_chunks()
+    score_values = pc.list_flatten(scores)
+    bad_values = _mask(pc.or_(pc.is_null(score_values), _out_of_range(score_values, 0.0, 1.0)), True)
+    bad_scores = np.zeros(rows, dtype=bool)
+    bad_scores[pc.list_parent_indices(scores).to_numpy()[bad_values]] = True
+    bad_scores |= _mask(pc.not_equal(pc.list_value_length(scores), len(EMOTION_LABELS)), False)
+
+    # Theo thứ tự: một dòng chỉ báo lỗi đầu tiên gặp phải
+    checks = [
+        (_mask(pc.or_(pc.equal(pc.utf8_length(client_id), 0),
+                      pc.greater(pc.utf8_length(client_id), MAX_CLIENT_ID_LENGTH)), True),
+         f"client_result_id thiếu hoặc dài quá {MAX_CLIENT_ID_LENGTH} ký tự"),
+        (_mask(pc.greater(table.column("timestamp"), pa.scalar(now + timedelta(seconds=max_clock_skew_seconds), pa.timestamp("us", tz="UTC"))), True),
+         "timestamp thiếu hoặc ở tương lai"),
+        (_mask(pc.is_null(codes), True), "emotion không hợp lệ"),
+        (_mask(pc.or_(pc.and_(is_no_face, pc.greater(faces, 0)),
+                      pc.and_(pc.invert(is_no_face), pc.equal(faces, 0))), False)
+         | _mask(pc.less(faces, 0), False),
+         "faces_detected mâu thuẫn với emotion"),
+        (_mask(_out_of_range(table.column("score"), 0.0, 1.0), False), "score ngoài khoảng [0, 1]"),
+        (bad_scores, f"scores phải gồm {len(EMOTION_LABELS)} giá trị trong [0, 1]"),
+        (_mask(_out_of_range(table.column("image_quality"), 0.0, 1.0), False), "image_quality ngoài khoảng [0, 1]"),
+        (_mask(_out_of_range(table.column("confidence_level"), 0.0, 1.0), False), "confidence_level ngoài khoảng [0, 1]"),
+        (_mask(_out_of_range(table.column("processing_time"), 0.0), False), "processing_time âm"),
+    ]
+
+    invalid = np.zeros(rows, dtype=bool)
+    errors: List[Dict[str, Any]] = []
+    client_ids = client_id.to_pylist()
+    for mask, message in checks:
+        for index in np.flatnonzero(mask & ~invalid):
+            errors.append({'index': int(index), 'client_result_id': client_ids[index], 'error': message})
+        invalid |= mask
+    errors.sort(key=lambda error: error['index'])
+
+    # Trùng client_result_id trong cùng lô (gửi lặp): giữ lần xuất hiện đầu tiên
+    duplicate = np.zeros(rows, dtype=bool)
+    valid_indices = np.flatnonzero(~invalid)
+    if len(valid_indices):
+        _, first = np.unique(np.array([client_ids[i] for i in valid_indices], dtype=object), return_index=True)
+        duplicate[valid_indices] = True
+        duplicate[valid_indices[first]] = False
+
+    keep = ~invalid & ~duplicate
+    codes_np = codes.to_numpy(zero_copy_only=False)[keep].astype(np.int16)
+    codes_np[codes_np == len(EMOTION_LABELS)] = NO_FACE_CODE
+    report = {
+        'received': rows,
+        'duplicates': int(duplicate.sum()),
+        'rejected': int(invalid.sum()),
+        'errors': errors
+    }
+    return table.filter(pa.array(keep)), codes_np, report
@@ -0,0 +1,64 @@
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+from app.core.config import settings
+
+class ActiveSessionCache:
+    """Cache user_id -> id phiên phân tích đang mở (có TTL, an toàn đa luồng)"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, user_id: int) -> Optional[int]:
+        """Lấy id phiên đang mở của user, None nếu không có hoặc đã hết hạn"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+            self._misses += 1
+            return None
+
+    def set(self, user_id: int, session_id: int):
+        """Ghi nhận phiên đang mở của user (chỉ gọi sau khi transaction đã commit)"""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (session_id, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, user_id: int, session_id: Optional[int] = None):
+        """Xóa cache của user; nếu có session_id thì chỉ xóa khi khớp"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or (session_id is not None and entry[0] != session_id):
+                return
+            del self._entries[user_id]
+            self._invalidations += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của cache"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'invalidations': self._invalidations
+            }
+
+# Instance global
+active_session_cache = ActiveSessionCache(settings.ACTIVE_SESSION_CACHE_TTL)
@@ -0,0 +1,103 @@
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud.session_crud import reap_stale_sessions, merge_session_sketch
+from app.services.session_cache import active_session_cache
+from app.services.stats_cache import stats_cache
+from app.services.latency_tracker import latency_tracker
+
+logger = logging.getLogger(__name__)
+
+class SessionReaper:
+    """Worker nền tự động kết thúc các phiên phân tích bị bỏ dở"""
+
+    def __init__(self, interval_seconds: int, idle_timeout: int, default_max_duration: int):
+        self.interval_seconds = max(1, interval_seconds)
+        self.idle_timeout = idle_timeout
+        self.default_max_duration = default_max_duration
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = 0
+        self._reaped = 0
+        self._failed_runs = 0
+        self._last_run_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Reaper có đang chạy không"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Khởi động thread reaper"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="session-reaper", daemon=True)
+        self._thread.start()
+        logger.info(f"Session reaper đã khởi động (mỗi {self.interval_seconds}s)")
+
+    def stop(self):
+        """Dừng thread reaper"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.interval_seconds + 5)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self.reap_once()
+
+    def reap_once(self) -> int:
+        """Chạy một lượt dọn phiên, trả về số phiên đã kết thúc"""
+        db = SessionLocal()
+        try:
+            reaped = reap_stale_sessions(db, self.idle_timeout, self.default_max_duration)
+        except Exception as e:
+            db.rollback()
+            db.close()
+            self._failed_runs += 1
+            logger.error(f"Lỗi dọn phiên phân tích: {e}")
+            return 0
+        try:
+            # Sketch thời gian xử lý của phiên trong bộ nhớ process này
+            for session_id, _ in reaped:
+                merge_session_sketch(db, session_id, latency_tracker.pop_session(session_id), commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Lỗi ghi sketch thời gian xử lý của phiên đã dọn: {e}")
+        finally:
+            db.close()
+
+        for session_id, user_id in reaped:
+            active_session_cache.invalidate(user_id, session_id)
+            stats_cache.invalidate(user_id)
+
+        self._runs += 1
+        self._reaped += len(reaped)
+        self._last_run_at = time.time()
+        if reaped:
+            logger.info(f"Đã tự động kết thúc {len(reaped)} phiên phân tích: {[sid for sid, _ in reaped]}")
+        return len(reaped)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của reaper"""
+        return {
+            'running': self.running,
+            'runs': self._runs,
+            'reaped_sessions': self._reaped,
+            'failed_runs': self._failed_runs,
+            'last_run_at': self._last_run_at
+        }
+
+# Instance global
+session_reaper = SessionReaper(
+    interval_seconds=settings.SESSION_REAPER_INTERVAL_SECONDS,
+    idle_timeout=settings.SESSION_IDLE_TIMEOUT_SECONDS,
+    default_max_duration=settings.SESSION_DEFAULT_MAX_DURATION
+)
@@ -1,8 +1,15 @@
 from sqlalchemy.orm import Session
-from app.crud.session_crud import create_session, update_session, get_user_sessions, get_session_by_id, get_active_session_by_user_id, end_session
+from app.crud.session_crud import create_session, update_session, get_user_sessions, get_session_by_id, get_active_session_by_user_id, end_session, merge_session_sketch
 from app.services.system_log_service import SystemLogService
+from app.services.session_cache import active_session_cache
+from app.services.stats_cache import stats_cache
+from app.services.latency_tracker import latency_tracker
+from app.core.sketch import DDSketch
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
 
 class SessionService:
     """Service quản lý phiên phân tích"""
@@ -32,14 +39,16 @@ class SessionService:
                 enabled_emotions = []
             
             # Tạo phiên mới với config mở rộng
-            session = create_session(db, user_id, camera_resolution, analysis_interval)
+            session = create_session(db, user_id, camera_resolution, analysis_interval, max_session_duration)
+            active_session_cache.set(user_id, session.id)
+            stats_cache.invalidate(user_id)
             
             # Cập nhật thêm các config mới vào session (nếu model hỗ trợ)
-            # TODO: Cần cập nhật model để lưu thêm các config này
+            # max_session_duration được lưu qua expires_at và được session reaper áp dụng
+            # TODO: Cần cập nhật model để lưu thêm các config còn lại
             # update_session_config(db, session.id, {
             #     'detection_threshold': detection_threshold,
-            #     'enabled_emotions': enabled_emotions,
-            #     'max_session_duration': max_session_duration
+            #     'enabled_emotions': enabled_emotions
             # })
             
             # Log việc tạo session
@@ -62,6 +71,8 @@ class SessionService:
             }
             
         except Exception as e:
+            # Vd. vi phạm unique index phiên đang mở khi request khác vừa tạo phiên
+            db.rollback()
             return {
                 'success': False,
                 'error': f'Lỗi tạo phiên phân tích: {str(e)}'
@@ -89,6 +100,12 @@ class SessionService:
                 'error': f'Lỗi cập nhật thống kê: {str(e)}'
             }
     
+    @staticmethod
+    def _session_percentiles(session) -> Dict[str, Any]:
+        """p50/p95/p99 thời gian xử lý của phiên: phần đã ghi khi kết thúc + phần còn trong bộ nhớ"""
+        sketch = DDSketch.from_bytes(session.processing_time_sketch)
+        return sketch.merge(latency_tracker.session_sketch(session.id)).percentiles()
+    
     @staticmethod
     def get_user_sessions_list(db: Session, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Lấy danh sách phiên phân tích của user"""
@@ -105,6 +122,7 @@ class SessionService:
                     'detection_rate': session.detection_rate or 0,
                     'average_engagement': session.average_engagement or 0,
                     'avg_processing_time': session.avg_processing_time or 0,
+                    'processing_time_percentiles': SessionService._session_percentiles(session),
                     'avg_fps': session.avg_fps or 0
                 }
                 for session in sessions
@@ -149,11 +167,18 @@ class SessionService:
                 }
             
             success = end_session(db, active_session.id)
+            active_session_cache.invalidate(user_id)
+            stats_cache.invalidate(user_id)
             if not success:
                 return {
                     'success': False,
                     'error': 'Lỗi kết thúc phiên phân tích'
                 }
+            try:
+                merge_session_sketch(db, active_session.id, latency_tracker.pop_session(active_session.id))
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Lỗi ghi sketch thời gian xử lý của phiên {active_session.id}: {e}")
             
             session_duration = (datetime.now(timezone.utc) - active_session.session_start).total_seconds()
             
@@ -189,7 +214,8 @@ class SessionService:
                 'total_analyses': session.total_analyses or 0,
                 'successful_detections': session.successful_detections or 0,
                 'failed_detections': session.failed_detections or 0,
-                'detection_rate': session.detection_rate or 0
+                'detection_rate': session.detection_rate or 0,
+                'processing_time_percentiles': SessionService._session_percentiles(session)
             }
             
         except Exception:
@@ -0,0 +1,184 @@
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple, Union
+from app.core.config import settings
+
+ALL_USERS = "all"
+
+Scope = Union[int, str]
+
+def _user_scope(user_id: Any) -> Scope:
+    """user_id từ JSON filters có thể là chuỗi: chuẩn hóa để khớp với invalidate(int)"""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return str(user_id)
+
+class _Entry:
+    __slots__ = ("value", "version", "expires_at")
+
+    def __init__(self, value: Any, version: Tuple[int, int], expires_at: float):
+        self.value = value
+        self.version = version
+        self.expires_at = expires_at
+
+class _Flight:
+    """Một lần tính đang chạy; các request giống hệt chờ event rồi dùng chung kết quả"""
+    __slots__ = ("event", "version", "value", "failed")
+
+    def __init__(self, version: Tuple[int, int]):
+        self.event = threading.Event()
+        self.version = version
+        self.value = None
+        self.failed = False
+
+class StatsCache:
+    """Cache kết quả thống kê theo (endpoint, user hoặc "all", tham số) có TTL, LRU và gộp request
+
+    Ghi kết quả mới gọi invalidate(user_id): tăng phiên bản của user đó và của "all", mục cache có
+    phiên bản cũ coi như hết hạn (kể cả lần tính đang chạy dở). Invalidation chỉ trong process,
+    khi chạy nhiều worker uvicorn TTL là giới hạn độ cũ giữa các process.
+    """
+
+    def __init__(self, enabled: bool, ttl_seconds: float, max_entries: int, wait_timeout_seconds: float):
+        self.enabled = enabled and ttl_seconds > 0
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.wait_timeout_seconds = wait_timeout_seconds
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._generations: Dict[Scope, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._wait_timeouts = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    def _version(self, scope: Scope) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(scope, 0)
+
+    def get_or_compute(self, endpoint: str, scope: Scope, params: Tuple, compute: Callable[[], Any]) -> Any:
+        """Trả về kết quả trong cache, hoặc tính một lần cho mọi request giống hệt đang chờ
+
+        Kết quả trả ra luôn là bản sao: router được phép sửa dict (applied_filters, lọc cảm xúc).
+        Chỉ cache dict có 'success' khác False.
+        """
+        if not self.enabled:
+            return compute()
+        key = (endpoint, scope, params)
+        now = time.monotonic()
+        with self._lock:
+            version = self._version(scope)
+            entry = self._entries.get(key)
+            hit = entry is not None and entry.version == version and entry.expires_at > now
+            if hit:
+                self._entries.move_to_end(key)
+                self._hits += 1
+            else:
+                flight = self._flights.get(key)
+                leader = flight is None or flight.version != version
+                if leader:
+                    flight = self._flights[key] = _Flight(version)
+                    self._misses += 1
+                else:
+                    self._coalesced += 1
+        if hit:
+            # Giá trị trong cache không bao giờ bị sửa: sao chép ngoài lock
+            return copy.deepcopy(entry.value)
+
+        if not leader:
+            if flight.event.wait(self.wait_timeout_seconds) and not flight.failed:
+                return copy.deepcopy(flight.value)
+            # Lần tính dẫn đầu lỗi hoặc quá lâu: tự tính
+            if not flight.event.is_set():
+                with self._lock:
+                    self._wait_timeouts += 1
+            return compute()
+
+        try:
+            value = compute()
+            flight.value = copy.deepcopy(value)
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                cacheable = not flight.failed and not (isinstance(flight.value, dict) and flight.value.get('success') is False)
+                # Bỏ kết quả nếu đã có ghi mới trong lúc tính
+                if cacheable and self._version(scope) == flight.version:
+                    self._entries[key] = _Entry(flight.value, flight.version, time.monotonic() + self.ttl_seconds)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self._evictions += 1
+            flight.event.set()
+        return value
+
+    def cached(self, endpoint: str):
+        """Decorator cho hàm thống kê: tham số user_id (nếu có) là scope, các tham số còn lại trừ db là khóa"""
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+                arguments.pop('db', None)
+                user_id = arguments.pop('user_id', None)
+                scope = ALL_USERS if user_id is None or user_id == ALL_USERS else _user_scope(user_id)
+                return self.get_or_compute(endpoint, scope, tuple(sorted(arguments.items())),
+                                           lambda: func(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Có dữ liệu mới của user: bỏ cache của user đó và cache tổng hợp tất cả users"""
+        with self._lock:
+            if user_id is not None:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._generations[ALL_USERS] = self._generations.get(ALL_USERS, 0) + 1
+            self._invalidations += 1
+
+    def invalidate_all(self):
+        """Bỏ toàn bộ cache (xóa user, đổi quyền, ...)"""
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._entries.clear()
+            self._invalidations += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của stats cache"""
+        with self._lock:
+            lookups = self._hits + self._misses + self._coalesced
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'wait_timeouts': self._wait_timeouts,
+                'in_flight': len(self._flights),
+                'invalidations': self._invalidations,
+                'evictions': self._evictions
+            }
+
+# Instance global
+stats_cache = StatsCache(
+    enabled=settings.STATS_CACHE_ENABLED,
+    ttl_seconds=settings.STATS_CACHE_TTL_SECONDS,
+    max_entries=settings.STATS_CACHE_MAX_ENTRIES,
+    wait_timeout_seconds=settings.STATS_CACHE_WAIT_TIMEOUT_SECONDS
+)
@@ -0,0 +1,193 @@
+import threading
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud.rollup_crud import (
+    hour_floor, hour_ceil, get_rollup_watermark, init_rollup_watermark, set_rollup_watermark,
+    reset_rollups, compact_rollups, upsert_rollups, upsert_latency_sketches, get_first_result_time
+)
+from app.services.data_archiver import DataArchiver, data_archiver
+
+logger = logging.getLogger(__name__)
+
+class StatsRollup:
+    """Worker nền tổng hợp emotion_results theo giờ vào emotion_hourly_rollups và latency_hourly_sketches
+
+    Mỗi lượt tổng hợp các giờ đã trọn (cũ hơn grace) từ mốc rollup trở đi, từng đoạn chunk_hours giờ,
+    mỗi đoạn một transaction gồm INSERT ... SELECT ... GROUP BY và dời mốc. Kết quả gửi muộn (timestamp
+    trước mốc) được ingest cộng thẳng vào rollup. Thống kê = rollup trước mốc + bảng gốc từ mốc.
+    """
+
+    def __init__(self, archiver: DataArchiver, interval_seconds: int, grace_seconds: int, chunk_hours: int):
+        self.archiver = archiver
+        self.interval_seconds = max(10, interval_seconds)
+        self.grace_seconds = max(0, grace_seconds)
+        self.chunk_hours = max(1, chunk_hours)
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self._runs = 0
+        self._failed_runs = 0
+        self._compacted_hours = 0
+        self._rollup_rows = 0
+        self._last_run_at: Optional[float] = None
+        self._rolled_up_until: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        """Worker rollup có đang chạy không"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def target(self, now: Optional[datetime] = None) -> datetime:
+        """Giờ trọn gần nhất được phép tổng hợp (chừa grace cho transaction ghi còn dở)"""
+        return hour_floor((now or datetime.now(timezone.utc)) - timedelta(seconds=self.grace_seconds))
+
+    def _initialize(self, now: datetime) -> bool:
+        """Tạo mốc rollup lần đầu: cộng dữ liệu đã lưu trữ ra file và các dòng cũ hơn mốc
+
+        Giữ lock của archiver để không có dòng nào vừa bị xóa khỏi database vừa chưa có trong file.
+        Trả về False nếu process khác đã khởi tạo.
+        """
+        db = SessionLocal()
+        try:
+            with self.archiver.run_lock:
+                archived_before = self.archiver.watermark("emotion_results")
+                if archived_before is not None:
+                    # Mọi dòng trong file đều cũ hơn archived_before
+                    watermark = hour_ceil(archived_before)
+                else:
+                    first = get_first_result_time(db)
+                    watermark = hour_floor(first) if first else self.target(now)
+                init_rollup_watermark(db, watermark)
+                if archived_before is not None:
+                    for rollups in self.archiver.hourly_rollups():
+                        self._rollup_rows += upsert_rollups(db, rollups)
+                    for sketches in self.archiver.hourly_latency_sketches():
+                        self._rollup_rows += upsert_latency_sketches(db, sketches)
+                    # Dòng ghi muộn còn trong database nhưng cũ hơn mốc
+                    self._rollup_rows += compact_rollups(db, None, watermark)
+                db.commit()
+            logger.info(f"Đã khởi tạo rollup thống kê từ {watermark:%Y-%m-%d %H:%M} UTC")
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _compact_chunk(self, target: datetime) -> bool:
+        """Tổng hợp một đoạn giờ tiếp theo; False khi đã bắt kịp target"""
+        db = SessionLocal()
+        try:
+            # FOR UPDATE: chờ các lần ingest kết quả muộn đang giữ mốc commit xong
+            watermark = get_rollup_watermark(db, lock='update')
+            if watermark is None or watermark >= target:
+                db.rollback()
+                self._rolled_up_until = watermark
+                return False
+            end = min(watermark + timedelta(hours=self.chunk_hours), target)
+            rows = compact_rollups(db, watermark, end)
+            set_rollup_watermark(db, end)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self._rollup_rows += rows
+        self._compacted_hours += int((end - watermark).total_seconds() // 3600)
+        self._rolled_up_until = end
+        return True
+
+    def compact_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Một lượt: khởi tạo nếu cần rồi tổng hợp tới giờ trọn gần nhất"""
+        now = now or datetime.now(timezone.utc)
+        target = self.target(now)
+        with self._run_lock:
+            try:
+                db = SessionLocal()
+                try:
+                    initialized = get_rollup_watermark(db) is not None
+                finally:
+                    db.close()
+                if not initialized:
+                    self._initialize(now)
+                chunks = 0
+                while not self._stop_event.is_set() and self._compact_chunk(target):
+                    chunks += 1
+            except Exception as e:
+                self._failed_runs += 1
+                logger.error(f"Lỗi tổng hợp rollup thống kê: {e}")
+                return {'success': False, 'error': str(e)}
+
+        self._runs += 1
+        self._last_run_at = time.time()
+        return {
+            'success': True,
+            'chunks': chunks,
+            'rolled_up_until': self._rolled_up_until.isoformat() if self._rolled_up_until else None
+        }
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Xóa rollup và dựng lại từ đầu (bảng gốc + file lưu trữ)"""
+        with self._run_lock:
+            db = SessionLocal()
+            try:
+                deleted = reset_rollups(db)
+            finally:
+                db.close()
+            self._rolled_up_until = None
+        logger.warning(f"Đã xóa {deleted} dòng rollup thống kê để dựng lại")
+        return self.compact_once()
+
+    # ----- Worker -----
+
+    def start(self):
+        """Khởi động worker rollup định kỳ"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="stats-rollup", daemon=True)
+        self._thread.start()
+        logger.info(f"Stats rollup đã khởi động (mỗi {self.interval_seconds}s, grace {self.grace_seconds}s)")
+
+    def stop(self):
+        """Dừng worker (đoạn đang tổng hợp được hoàn tất trước khi dừng)"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=60)
+        self._thread = None
+
+    def _run(self):
+        self.compact_once()
+        while not self._stop_event.wait(self.interval_seconds):
+            self.compact_once()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của stats rollup"""
+        rolled_up_until = self._rolled_up_until
+        return {
+            'running': self.running,
+            'runs': self._runs,
+            'failed_runs': self._failed_runs,
+            'compacted_hours': self._compacted_hours,
+            'rollup_rows_written': self._rollup_rows,
+            'rolled_up_until': rolled_up_until.isoformat() if rolled_up_until else None,
+            'lag_seconds': (datetime.now(timezone.utc) - rolled_up_until).total_seconds() if rolled_up_until else None,
+            'last_run_at': self._last_run_at
+        }
+
+# Instance global
+stats_rollup = StatsRollup(
+    archiver=data_archiver,
+    interval_seconds=settings.STATS_ROLLUP_INTERVAL_SECONDS,
+    grace_seconds=settings.STATS_ROLLUP_GRACE_SECONDS,
+    chunk_hours=settings.STATS_ROLLUP_CHUNK_HOURS
+)
@@ -1,19 +1,129 @@
 from sqlalchemy.orm import Session
 from app.crud.emotion_crud import (
-    get_emotion_stats, get_all_emotion_stats, get_emotion_history, get_real_performance_stats
+    get_period_start, count_emotions, get_emotion_history, get_emotion_timeline, get_performance_totals,
+    get_latency_bins, get_session_performance, summarize_performance
+)
+from app.crud.rollup_crud import (
+    get_rollup_watermark, get_rollup_emotion_counts, get_rollup_performance_totals, get_rollup_latency_bins
 )
 from app.crud.session_crud import get_user_sessions
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from app.core.pagination import Keyset, keyset_key, encode_cursor
+from app.core.emotion_codec import NO_FACE_CODE, decode_emotion
+from app.core.sketch import DDSketch
+from app.services.data_archiver import data_archiver
+from app.services.stats_cache import stats_cache
+from app.services.latency_tracker import latency_tracker
+from app.services.session_cache import active_session_cache
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import math
+
+def _merge_counts(live: Dict[str, int], archived: Dict[str, int]) -> Dict[str, int]:
+    """Cộng số đếm cảm xúc từ database và từ file lưu trữ"""
+    merged = dict(live)
+    for emotion, count in archived.items():
+        merged[emotion] = merged.get(emotion, 0) + count
+    return merged
+
+def _emotion_counts(db: Session, period: str, user_id: Optional[int] = None) -> Dict[str, int]:
+    """Số lần mỗi cảm xúc trong khoảng: rollup theo giờ trước mốc + bảng gốc từ mốc
+
+    Khi rollup chưa khởi tạo: đọc bảng gốc + file lưu trữ như trước.
+    """
+    start = get_period_start(period)
+    watermark = get_rollup_watermark(db)
+    if watermark is None:
+        return _merge_counts(count_emotions(db, start, user_id), data_archiver.emotion_counts(start, user_id))
+    since = watermark if start is None else max(start, watermark)
+    return _merge_counts(count_emotions(db, since, user_id), get_rollup_emotion_counts(db, start, watermark, user_id))
+
+def _performance_stats(db: Session, period: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Thống kê hiệu suất trong khoảng: rollup theo giờ trước mốc + bảng gốc từ mốc (hoặc + file lưu trữ)"""
+    start = get_period_start(period)
+    watermark = get_rollup_watermark(db)
+    if watermark is None:
+        totals = get_performance_totals(db, start, user_id)
+        extra = data_archiver.performance_totals(start, user_id)
+    else:
+        since = watermark if start is None else max(start, watermark)
+        totals = get_performance_totals(db, since, user_id)
+        extra = get_rollup_performance_totals(db, start, watermark, user_id)
+    total_sessions, average_fps = get_session_performance(db, start, user_id)
+    return summarize_performance(totals, total_sessions, average_fps, extra)
+
+def _latency_percentiles(db: Session, period: str, user_id: Optional[int] = None) -> Dict[str, Any]:
+    """p50/p95/p99 thời gian xử lý trong khoảng, gộp sketch: rollup theo giờ trước mốc + bảng gốc từ mốc
+    (hoặc + file lưu trữ); kèm percentile theo giai đoạn trong bộ nhớ process (từ lúc khởi động)"""
+    start = get_period_start(period)
+    watermark = get_rollup_watermark(db)
+    sketch = DDSketch()
+    if watermark is None:
+        sketch.add_bins(get_latency_bins(db, start, user_id))
+        sketch.add_bins(data_archiver.latency_bins(start, user_id) or [])
+    else:
+        since = watermark if start is None else max(start, watermark)
+        sketch.add_bins(get_latency_bins(db, since, user_id))
+        sketch.add_bins(get_rollup_latency_bins(db, start, watermark, user_id))
+    return {
+        'processing_time': sketch.percentiles(),
+        'stages': latency_tracker.snapshot(user_id=user_id)
+    }
+
+def _history_page(history: List[Dict[str, Any]], limit: int, before: Optional[Keyset],
+                  user_id: Optional[int] = None) -> Dict[str, Any]:
+    """Ghép một trang lịch sử từ database (đã lấy limit + 1 dòng) và file lưu trữ, kèm cursor trang tiếp theo
+
+    Dòng trong file lưu trữ đều cũ hơn mốc lưu trữ: chỉ đọc file khi trang chạm tới mốc.
+    """
+    archived_before = data_archiver.watermark("emotion_results")
+    reaches_archive = archived_before is not None
+    if reaches_archive and len(history) > limit:
+        oldest_timestamp, _ = keyset_key(history[limit]['timestamp'], history[limit]['id'])
+        reaches_archive = oldest_timestamp < archived_before
+    if reaches_archive:
+        history = history + data_archiver.emotion_history(limit + 1, before=before, user_id=user_id)
+        history.sort(key=lambda item: keyset_key(item['timestamp'], item['id']), reverse=True)
+    page = history[:limit]
+    next_cursor = encode_cursor(page[-1]['timestamp'], page[-1]['id']) if page and len(history) > limit else None
+    return {
+        'success': True,
+        'history': page,
+        'total_records': len(page),
+        'next_cursor': next_cursor
+    }
+
+# Độ rộng khoảng của timeline (giây): 1, 5, 15, 30 phút, 1, 3, 6, 12 giờ, 1 ngày; dài hơn dùng bội số ngày
+TIMELINE_STEPS = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400)
+TIMELINE_DEFAULT_POINTS = 200
+TIMELINE_MAX_POINTS = 1000
+
+def timeline_range(start: datetime, end: datetime, max_points: int = TIMELINE_DEFAULT_POINTS) -> Tuple[datetime, datetime, int]:
+    """Chọn độ rộng khoảng nhỏ nhất để [start, end) có không quá max_points điểm, căn hai đầu theo khoảng (epoch UTC)
+
+    Trả về (start, end, số giây mỗi khoảng).
+    """
+    start_epoch, end_epoch = start.timestamp(), end.timestamp()
+
+    def aligned(step: int) -> Tuple[int, int]:
+        return math.floor(start_epoch / step) * step, math.ceil(end_epoch / step) * step
+
+    span_days = math.ceil((end_epoch - start_epoch) / 86400)
+    candidates = TIMELINE_STEPS + tuple(86400 * days for days in range(2, span_days + 2))
+    for step in candidates:
+        first, last = aligned(step)
+        if (last - first) // step <= max_points:
+            break
+    return datetime.fromtimestamp(first, timezone.utc), datetime.fromtimestamp(last, timezone.utc), step
 
 class StatsService:
     """Service thống kê và báo cáo"""
     
     @staticmethod
+    @stats_cache.cached('user_emotion_stats')
     def get_user_emotion_stats(db: Session, user_id: int, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê cảm xúc của user"""
         try:
-            emotion_stats = get_emotion_stats(db, user_id, period)
+            emotion_stats = _emotion_counts(db, period, user_id)
             
             return {
                 'success': True,
@@ -28,11 +138,17 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('user_performance_stats')
     def get_user_performance_stats(db: Session, user_id: int, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê hiệu suất của user"""
         try:
-            # Sử dụng hàm mới để lấy dữ liệu thực từ database
-            real_stats = get_real_performance_stats(db, user_id, period)
+            real_stats = _performance_stats(db, period, user_id)
+            latency = _latency_percentiles(db, period, user_id)
+            session_id = active_session_cache.get(user_id)
+            latency['active_session'] = {
+                'session_id': session_id,
+                'stages': latency_tracker.snapshot(session_id=session_id)
+            } if session_id is not None else None
             
             return {
                 'success': True,
@@ -45,6 +161,7 @@ class StatsService:
                 'average_emotion_score': real_stats['average_emotion_score'],
                 'average_fps': real_stats['average_fps'],
                 'average_processing_time': real_stats['average_processing_time'],
+                'latency_percentiles': latency,
                 'total_sessions': real_stats['total_sessions'],
                 # Thêm detection_metrics và engagement_metrics để tương thích với frontend
                 'detection_metrics': {
@@ -67,11 +184,11 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('user_face_detection_stats')
     def get_face_detection_stats(db: Session, user_id: int, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê chi tiết về phát hiện khuôn mặt"""
         try:
-            from app.crud.emotion_crud import get_real_performance_stats
-            real_stats = get_real_performance_stats(db, user_id, period)
+            real_stats = _performance_stats(db, period, user_id)
             
             # Tính thêm các chỉ số
             total_attempts = real_stats['total_analyses']
@@ -103,16 +220,12 @@ class StatsService:
             }
     
     @staticmethod
-    def get_emotion_history_data(db: Session, user_id: int, limit: int = 100) -> Dict[str, Any]:
-        """Lấy dữ liệu lịch sử cảm xúc"""
+    @stats_cache.cached('user_emotion_history')
+    def get_emotion_history_data(db: Session, user_id: int, limit: int = 100,
+                                 before: Optional[Keyset] = None) -> Dict[str, Any]:
+        """Lấy dữ liệu lịch sử cảm xúc (một trang; next_cursor để lấy trang tiếp theo)"""
         try:
-            history = get_emotion_history(db, user_id, limit)
-            
-            return {
-                'success': True,
-                'history': history,
-                'total_records': len(history)
-            }
+            return _history_page(get_emotion_history(db, user_id, limit + 1, before), limit, before, user_id)
             
         except Exception as e:
             return {
@@ -121,11 +234,12 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('admin_dashboard')
     def get_admin_dashboard_stats(db: Session, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê tổng hợp cho admin dashboard"""
         try:
             # Thống kê cảm xúc tổng hợp
-            emotion_stats = get_all_emotion_stats(db, period)
+            emotion_stats = _emotion_counts(db, period)
             
             # Tính tổng số kết quả phân tích
             total_analyses = sum(emotion_stats.values()) if emotion_stats else 0
@@ -149,10 +263,11 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('all_emotion_stats')
     def get_all_users_emotion_stats(db: Session, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê cảm xúc tổng hợp của tất cả users"""
         try:
-            emotion_stats = get_all_emotion_stats(db, period)
+            emotion_stats = _emotion_counts(db, period)
             
             return {
                 'success': True,
@@ -167,11 +282,11 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('all_performance_stats')
     def get_all_users_performance_stats(db: Session, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê hiệu suất tổng hợp của tất cả users"""
         try:
-            from app.crud.emotion_crud import get_all_users_performance_stats as get_all_perf_stats
-            all_stats = get_all_perf_stats(db, period)
+            all_stats = _performance_stats(db, period)
             
             return {
                 'success': True,
@@ -184,6 +299,7 @@ class StatsService:
                 'average_emotion_score': all_stats['average_emotion_score'],
                 'average_fps': all_stats['average_fps'],
                 'average_processing_time': all_stats['average_processing_time'],
+                'latency_percentiles': _latency_percentiles(db, period),
                 'total_sessions': all_stats['total_sessions'],
                 'detection_metrics': {
                     'total_analyses': all_stats['total_analyses'],
@@ -205,11 +321,11 @@ class StatsService:
             }
     
     @staticmethod
+    @stats_cache.cached('all_face_detection_stats')
     def get_all_users_face_detection_stats(db: Session, period: str = 'day') -> Dict[str, Any]:
         """Lấy thống kê phát hiện khuôn mặt tổng hợp của tất cả users"""
         try:
-            from app.crud.emotion_crud import get_all_users_performance_stats as get_all_perf_stats
-            all_stats = get_all_perf_stats(db, period)
+            all_stats = _performance_stats(db, period)
             
             # Tính thêm các chỉ số
             total_attempts = all_stats['total_analyses']
@@ -241,20 +357,64 @@ class StatsService:
             }
     
     @staticmethod
-    def get_all_users_emotion_history_data(db: Session, limit: int = 100) -> Dict[str, Any]:
+    @stats_cache.cached('all_emotion_history')
+    def get_all_users_emotion_history_data(db: Session, limit: int = 100,
+                                           before: Optional[Keyset] = None) -> Dict[str, Any]:
         """Lấy dữ liệu lịch sử cảm xúc tổng hợp của tất cả users"""
         try:
             from app.crud.emotion_crud import get_all_users_emotion_history
-            history = get_all_users_emotion_history(db, limit)
+            return _history_page(get_all_users_emotion_history(db, limit + 1, before), limit, before)
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Lỗi lấy lịch sử cảm xúc tổng hợp: {str(e)}'
+            } 
+    
+    @staticmethod
+    @stats_cache.cached('emotion_timeline')
+    def get_emotion_timeline(db: Session, start: datetime, end: datetime, step_seconds: int,
+                             user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Phân bố cảm xúc và mức tương tác theo thời gian (user_id None: tất cả users)
+        
+        [start, end) đã được căn theo step_seconds (timeline_range); mọi khoảng đều có mặt trong kết quả,
+        kể cả khoảng không có dữ liệu, nên số điểm chỉ phụ thuộc max_points.
+        """
+        try:
+            rows = get_emotion_timeline(db, start, end, step_seconds, user_id)
+            rows += data_archiver.emotion_timeline(start, end, step_seconds, user_id)
+            
+            first = int(start.timestamp())
+            points = [
+                {
+                    'time': datetime.fromtimestamp(bucket, timezone.utc).isoformat(),
+                    'total': 0,
+                    'detected': 0,
+                    'emotions': {},
+                    'engagement': {}
+                }
+                for bucket in range(first, int(end.timestamp()), step_seconds)
+            ]
+            for bucket, code, engagement, total, detected in rows:
+                point = points[(bucket - first) // step_seconds]
+                point['total'] += total
+                engagement = engagement or 'none'
+                point['engagement'][engagement] = point['engagement'].get(engagement, 0) + total
+                if code != NO_FACE_CODE and detected:
+                    emotion = decode_emotion(code)
+                    point['detected'] += detected
+                    point['emotions'][emotion] = point['emotions'].get(emotion, 0) + detected
             
             return {
                 'success': True,
-                'history': history,
-                'total_records': len(history)
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'bucket_seconds': step_seconds,
+                'points': points
             }
             
         except Exception as e:
             return {
                 'success': False,
-                'error': f'Lỗi lấy lịch sử cảm xúc tổng hợp: {str(e)}'
-            } 
\ No newline at end of file
+                'error': f'Lỗi lấy timeline cảm xúc: {str(e)}'
+            }
@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from app.models.models import SystemLog
+from app.services.system_log_sink import system_log_sink
 from typing import Optional
 from datetime import datetime
 
@@ -7,56 +8,75 @@ class SystemLogService:
     """Service quản lý log hệ thống"""
     
     @staticmethod
-    def create_log(db: Session, level: str, message: str, user_id: Optional[int] = None, 
-                   ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> SystemLog:
-        """Tạo log mới"""
+    def create_log(db: Session, level: str, message: str, user_id: Optional[int] = None,
+                   ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+                   event_type: Optional[str] = None, label: Optional[str] = None,
+                   value: Optional[float] = None, commit: bool = True) -> Optional[SystemLog]:
+        """Tạo log mới (qua sink bất đồng bộ nếu đang chạy, ngược lại ghi trực tiếp)
+        
+        commit=False: chỉ thêm vào session, được ghi cùng transaction của caller.
+        """
+        if system_log_sink.running:
+            system_log_sink.submit(level, message, user_id, ip_address, user_agent,
+                                   event_type=event_type, label=label, value=value)
+            return None
+        
         log = SystemLog(
             level=level,
             message=message,
             user_id=user_id,
             ip_address=ip_address,
-            user_agent=user_agent
+            user_agent=user_agent,
+            event_type=event_type
         )
         db.add(log)
-        db.commit()
-        db.refresh(log)
+        if commit:
+            db.commit()
+            db.refresh(log)
         return log
     
     @staticmethod
-    def log_info(db: Session, message: str, user_id: Optional[int] = None, 
-                 ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> SystemLog:
+    def log_info(db: Session, message: str, user_id: Optional[int] = None,
+                 ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+                 event_type: Optional[str] = None, label: Optional[str] = None,
+                 value: Optional[float] = None, commit: bool = True) -> Optional[SystemLog]:
         """Tạo log INFO"""
-        return SystemLogService.create_log(db, "INFO", message, user_id, ip_address, user_agent)
+        return SystemLogService.create_log(db, "INFO", message, user_id, ip_address, user_agent,
+                                           event_type, label, value, commit)
     
     @staticmethod
-    def log_warning(db: Session, message: str, user_id: Optional[int] = None, 
-                    ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> SystemLog:
+    def log_warning(db: Session, message: str, user_id: Optional[int] = None,
+                    ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+                    event_type: Optional[str] = None) -> Optional[SystemLog]:
         """Tạo log WARNING"""
-        return SystemLogService.create_log(db, "WARNING", message, user_id, ip_address, user_agent)
+        return SystemLogService.create_log(db, "WARNING", message, user_id, ip_address, user_agent, event_type)
     
     @staticmethod
-    def log_error(db: Session, message: str, user_id: Optional[int] = None, 
-                  ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> SystemLog:
+    def log_error(db: Session, message: str, user_id: Optional[int] = None,
+                  ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+                  event_type: Optional[str] = None) -> Optional[SystemLog]:
         """Tạo log ERROR"""
-        return SystemLogService.create_log(db, "ERROR", message, user_id, ip_address, user_agent)
+        return SystemLogService.create_log(db, "ERROR", message, user_id, ip_address, user_agent, event_type)
     
     @staticmethod
-    def log_emotion_analysis(db: Session, user_id: int, faces_detected: int, 
-                            emotion: str, processing_time: float, ip_address: Optional[str] = None) -> SystemLog:
-        """Log kết quả phân tích cảm xúc"""
+    def log_emotion_analysis(db: Session, user_id: int, faces_detected: int,
+                            emotion: str, processing_time: float, ip_address: Optional[str] = None,
+                            commit: bool = True) -> Optional[SystemLog]:
+        """Log kết quả phân tích cảm xúc (được gộp theo phút/user khi sink đang chạy)"""
         message = f"User {user_id} - Phân tích cảm xúc: {emotion}, {faces_detected} khuôn mặt, {processing_time}ms"
-        return SystemLogService.log_info(db, message, user_id, ip_address)
+        return SystemLogService.log_info(db, message, user_id, ip_address, event_type="emotion_analysis",
+                                         label=emotion, value=processing_time, commit=commit)
     
     @staticmethod
-    def log_session_start(db: Session, user_id: int, session_id: int, 
-                          camera_resolution: str, ip_address: Optional[str] = None) -> SystemLog:
+    def log_session_start(db: Session, user_id: int, session_id: int,
+                          camera_resolution: str, ip_address: Optional[str] = None) -> Optional[SystemLog]:
         """Log bắt đầu session"""
         message = f"User {user_id} - Bắt đầu session {session_id}, camera: {camera_resolution}"
-        return SystemLogService.log_info(db, message, user_id, ip_address)
+        return SystemLogService.log_info(db, message, user_id, ip_address, event_type="session_start")
     
     @staticmethod
-    def log_session_end(db: Session, user_id: int, session_id: int, 
-                        duration: float, total_analyses: int, ip_address: Optional[str] = None) -> SystemLog:
+    def log_session_end(db: Session, user_id: int, session_id: int,
+                        duration: float, total_analyses: int, ip_address: Optional[str] = None) -> Optional[SystemLog]:
         """Log kết thúc session"""
         message = f"User {user_id} - Kết thúc session {session_id}, thời gian: {duration}s, phân tích: {total_analyses}"
-        return SystemLogService.log_info(db, message, user_id, ip_address) 
\ No newline at end of file
+        return SystemLogService.log_info(db, message, user_id, ip_address, event_type="session_end")
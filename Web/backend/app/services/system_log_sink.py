@@ -0,0 +1,170 @@
+import random
+import threading
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, DataError
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.batch_writer import BatchWriter
+from app.models.models import SystemLog
+
+logger = logging.getLogger(__name__)
+
+# Tiêu đề hiển thị cho các sự kiện được gộp
+EVENT_TITLES = {
+    'emotion_analysis': 'Phân tích cảm xúc'
+}
+
+def _flush_system_logs(records: List[Dict[str, Any]]):
+    """Ghi một lô SystemLog bằng một lệnh INSERT nhiều dòng"""
+    db = SessionLocal()
+    try:
+        db.execute(insert(SystemLog), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+class SystemLogSink:
+    """Sink ghi log bất đồng bộ: hàng đợi có giới hạn, ghi theo lô, lấy mẫu và gộp theo loại sự kiện"""
+
+    def __init__(self):
+        self.aggregate_events = set(settings.SYSTEM_LOG_AGGREGATE_EVENTS)
+        self.aggregate_window = max(1, settings.SYSTEM_LOG_AGGREGATE_WINDOW_SECONDS)
+        self.sample_rates = settings.SYSTEM_LOG_SAMPLE_RATES
+        self.shed_threshold = settings.SYSTEM_LOG_SHED_THRESHOLD
+
+        self._aggregates: Dict[tuple, Dict[str, Any]] = {}
+        self._aggregate_lock = threading.Lock()
+        self._sampled_out = 0
+        self._shed = 0
+        self._aggregated_events = 0
+
+        self.writer = BatchWriter(
+            name="system_logs",
+            flush_func=_flush_system_logs,
+            max_size=settings.SYSTEM_LOG_QUEUE_MAX_SIZE,
+            flush_rows=settings.SYSTEM_LOG_FLUSH_ROWS,
+            flush_interval_ms=settings.SYSTEM_LOG_FLUSH_INTERVAL_MS,
+            overflow_policy=settings.SYSTEM_LOG_OVERFLOW_POLICY,
+            on_tick=self._emit_closed_windows,
+            permanent_errors=(IntegrityError, DataError)
+        )
+
+    @property
+    def running(self) -> bool:
+        """Sink có đang chạy không"""
+        return self.writer.running
+
+    def start(self):
+        """Khởi động sink"""
+        self.writer.start()
+
+    def stop(self):
+        """Dừng sink, ghi các cửa sổ gộp và log còn lại"""
+        self.writer.stop()
+
+    def submit(self, level: str, message: str, user_id: Optional[int] = None,
+               ip_address: Optional[str] = None, user_agent: Optional[str] = None,
+               event_type: Optional[str] = None, label: Optional[str] = None,
+               value: Optional[float] = None) -> bool:
+        """Đưa một log vào sink, trả về False nếu log bị bỏ (lấy mẫu hoặc quá tải)"""
+        # Sự kiện gộp không chiếm chỗ trong hàng đợi cho tới khi cửa sổ đóng
+        if event_type in self.aggregate_events:
+            self._aggregate(level, user_id, ip_address, event_type, label, value)
+            return True
+
+        # Quá tải: chỉ giữ WARNING/ERROR
+        if level == "INFO" and self.writer.depth >= self.shed_threshold * self.writer.max_size:
+            self._shed += 1
+            return False
+
+        event_count = 1
+        rate = self.sample_rates.get(event_type) if event_type else None
+        if rate is not None and rate < 1.0:
+            if rate <= 0 or random.random() >= rate:
+                self._sampled_out += 1
+                return False
+            # Mỗi dòng được giữ lại đại diện cho ~1/rate sự kiện
+            event_count = max(1, round(1 / rate))
+
+        return self.writer.put({
+            'level': level,
+            'message': message,
+            'user_id': user_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'event_type': event_type,
+            'event_count': event_count,
+            'created_at': datetime.now(timezone.utc)
+        })
+
+    def _aggregate(self, level: str, user_id: Optional[int], ip_address: Optional[str],
+                   event_type: str, label: Optional[str], value: Optional[float]):
+        """Cộng dồn sự kiện vào cửa sổ thời gian (mặc định theo phút, theo user)"""
+        now = datetime.now(timezone.utc)
+        window_start = int(now.timestamp()) // self.aggregate_window * self.aggregate_window
+        key = (event_type, level, user_id, ip_address, window_start)
+        with self._aggregate_lock:
+            bucket = self._aggregates.get(key)
+            if bucket is None:
+                bucket = self._aggregates[key] = {'count': 0, 'labels': Counter(), 'value_sum': 0.0, 'value_count': 0}
+            bucket['count'] += 1
+            if label is not None:
+                bucket['labels'][label] += 1
+            if value is not None:
+                bucket['value_sum'] += value
+                bucket['value_count'] += 1
+            self._aggregated_events += 1
+
+    def _emit_closed_windows(self, final: bool):
+        """Chuyển các cửa sổ gộp đã đóng thành dòng log và đưa vào hàng đợi ghi"""
+        now_ts = int(datetime.now(timezone.utc).timestamp())
+        with self._aggregate_lock:
+            closed = [key for key in self._aggregates if final or key[4] + self.aggregate_window <= now_ts]
+            buckets = [(key, self._aggregates.pop(key)) for key in closed]
+
+        for (event_type, level, user_id, ip_address, window_start), bucket in buckets:
+            self.writer.put({
+                'level': level,
+                'message': self._format_aggregate(event_type, user_id, window_start, bucket),
+                'user_id': user_id,
+                'ip_address': ip_address,
+                'user_agent': None,
+                'event_type': event_type,
+                'event_count': bucket['count'],
+                'created_at': datetime.fromtimestamp(window_start, tz=timezone.utc)
+            })
+
+    def _format_aggregate(self, event_type: str, user_id: Optional[int], window_start: int,
+                          bucket: Dict[str, Any]) -> str:
+        """Tạo nội dung log cho một cửa sổ gộp"""
+        title = EVENT_TITLES.get(event_type, event_type)
+        started = datetime.fromtimestamp(window_start, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        message = f"User {user_id} - {title}: {bucket['count']} lần trong {self.aggregate_window}s từ {started} UTC"
+        if bucket['labels']:
+            breakdown = ", ".join(f"{label}: {count}" for label, count in bucket['labels'].most_common())
+            message += f" ({breakdown})"
+        if bucket['value_count']:
+            message += f", trung bình {bucket['value_sum'] / bucket['value_count']:.4f}"
+        return message
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics của sink"""
+        with self._aggregate_lock:
+            open_windows = len(self._aggregates)
+        return {
+            **self.writer.metrics(),
+            'open_aggregate_windows': open_windows,
+            'aggregated_events': self._aggregated_events,
+            'sampled_out': self._sampled_out,
+            'shed': self._shed
+        }
+
+# Instance global
+system_log_sink = SystemLogSink()
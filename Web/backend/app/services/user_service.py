@@ -1,17 +1,33 @@
+import io
+import csv
+import logging
 from sqlalchemy.orm import Session
 from app.crud.user_crud import (
     create_user, get_user_by_username, get_user_by_id, 
-    get_all_users, update_user_password, update_user_admin_status, delete_user
+    get_all_users, update_user_password, update_user_admin_status, delete_user,
+    rehash_user_password, get_existing_usernames, bulk_create_users
 )
-from app.core.auth import get_password_hash, verify_password
+from app.core.config import settings
+from app.core.password_hasher import password_hasher, hash_passwords, PasswordHasherBusy
+from app.services.stats_cache import stats_cache
+from app.core.user_cache import user_cache
 from typing import List, Optional, Dict, Any
 
+logger = logging.getLogger(__name__)
+
+# Độ dài tối đa của username (cột users.username)
+USERNAME_MAX_LENGTH = 50
+
+# Cột bắt buộc của file CSV import user (is_admin không bắt buộc)
+IMPORT_REQUIRED_COLUMNS = ("username", "password")
+
 class UserService:
     """Service quản lý user"""
     
     @staticmethod
-    def create_user(db: Session, username: str, password: str, is_admin: bool = False) -> Dict[str, Any]:
-        """Tạo user mới"""
+    def create_user(db: Session, username: str, password: str, is_admin: bool = False,
+                    password_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Tạo user mới (password_hash: hash đã tính sẵn, None: hash ngay trong luồng gọi)"""
         try:
             # Kiểm tra username đã tồn tại
             existing_user = get_user_by_username(db, username)
@@ -22,7 +38,8 @@ class UserService:
                 }
             
             # Tạo user
-            user = create_user(db, username, password, is_admin)
+            user = create_user(db, username, password, is_admin, password_hash=password_hash)
+            stats_cache.invalidate_all()
             
             return {
                 'success': True,
@@ -41,15 +58,36 @@ class UserService:
             }
     
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[Dict[str, Any]]:
-        """Xác thực user"""
+    async def register_user(db: Session, username: str, password: str, is_admin: bool = False) -> Dict[str, Any]:
+        """Tạo user mới từ route async: hash mật khẩu trong password_hasher (PasswordHasherBusy nếu quá tải)"""
+        if get_user_by_username(db, username):
+            return {
+                'success': False,
+                'error': 'Username đã tồn tại'
+            }
+        password_hash = await password_hasher.hash(password)
+        return UserService.create_user(db, username, password, is_admin, password_hash=password_hash)
+    
+    @staticmethod
+    async def authenticate_user(db: Session, username: str, password: str) -> Optional[Dict[str, Any]]:
+        """Xác thực user (kiểm tra mật khẩu trong password_hasher, PasswordHasherBusy nếu quá tải)
+        
+        Hash có cost khác BCRYPT_ROUNDS được thay bằng hash mới ngay khi mật khẩu đúng.
+        """
         try:
             user = get_user_by_username(db, username)
             if not user:
                 return None
             
-            if not verify_password(password, user.password_hash):
+            valid, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+            if not valid:
                 return None
+            if new_hash is not None:
+                try:
+                    rehash_user_password(db, user.id, user.password_hash, new_hash)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Không cập nhật được hash mật khẩu của user {user.id}: {e}")
             
             return {
                 'id': user.id,
@@ -57,6 +95,8 @@ class UserService:
                 'is_admin': user.is_admin
             }
             
+        except PasswordHasherBusy:
+            raise
         except Exception:
             return None
     
@@ -97,15 +137,17 @@ class UserService:
             return []
     
     @staticmethod
-    def update_user_password(db: Session, user_id: int, new_password: str) -> Dict[str, Any]:
-        """Cập nhật mật khẩu user"""
+    def update_user_password(db: Session, user_id: int, new_password: str,
+                             password_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Cập nhật mật khẩu user (password_hash: hash đã tính sẵn, None: hash ngay trong luồng gọi)"""
         try:
-            user = update_user_password(db, user_id, new_password)
+            user = update_user_password(db, user_id, new_password, password_hash=password_hash)
             if not user:
                 return {
                     'success': False,
                     'error': 'User không tồn tại'
                 }
+            user_cache.invalidate(user_id)
             
             return {
                 'success': True,
@@ -128,6 +170,8 @@ class UserService:
                     'success': False,
                     'error': 'User không tồn tại'
                 }
+            stats_cache.invalidate_all()
+            user_cache.invalidate(user_id)
             
             return {
                 'success': True,
@@ -150,6 +194,8 @@ class UserService:
                     'success': False,
                     'error': 'User không tồn tại'
                 }
+            stats_cache.invalidate_all()
+            user_cache.invalidate(user_id)
             
             return {
                 'success': True,
@@ -160,4 +206,72 @@ class UserService:
             return {
                 'success': False,
                 'error': f'Lỗi xóa user: {str(e)}'
-            } 
\ No newline at end of file
+            }
+    
+    @staticmethod
+    def import_users_csv(db: Session, content: str, processes: Optional[int] = None) -> Dict[str, Any]:
+        """Import user từ CSV (cột username, password, is_admin không bắt buộc)
+        
+        Dòng lỗi, trùng trong file hoặc username đã tồn tại bị bỏ qua (kèm lý do); mật khẩu các dòng
+        hợp lệ được hash trong process pool rồi thêm vào database trong một transaction.
+        Chặn luồng gọi cho tới khi xong: route async chạy hàm này trong threadpool.
+        """
+        try:
+            reader = csv.DictReader(io.StringIO(content.lstrip("\ufeff")))
+            columns = [column.strip().lower() for column in reader.fieldnames or []]
+            missing = [column for column in IMPORT_REQUIRED_COLUMNS if column not in columns]
+            if missing:
+                return {
+                    'success': False,
+                    'error': f'File CSV thiếu cột: {", ".join(missing)}'
+                }
+            reader.fieldnames = columns
+            
+            rows, skipped, seen = [], [], set()
+            for line, record in enumerate(reader, start=2):
+                if len(rows) + len(skipped) >= settings.USER_IMPORT_MAX_ROWS:
+                    return {
+                        'success': False,
+                        'error': f'File CSV vượt quá {settings.USER_IMPORT_MAX_ROWS} dòng'
+                    }
+                username = (record.get("username") or "").strip()
+                password = record.get("password") or ""
+                if not username or not password:
+                    skipped.append({'line': line, 'username': username, 'reason': 'Thiếu username hoặc password'})
+                elif len(username) > USERNAME_MAX_LENGTH:
+                    skipped.append({'line': line, 'username': username, 'reason': f'Username dài hơn {USERNAME_MAX_LENGTH} ký tự'})
+                elif username in seen:
+                    skipped.append({'line': line, 'username': username, 'reason': 'Username trùng trong file'})
+                else:
+                    seen.add(username)
+                    is_admin = (record.get("is_admin") or "").strip().lower() in ("1", "true", "yes", "x")
+                    rows.append((line, username, password, is_admin))
+            
+            existing = get_existing_usernames(db, seen)
+            skipped.extend(
+                {'line': line, 'username': username, 'reason': 'Username đã tồn tại'}
+                for line, username, _, _ in rows if username in existing
+            )
+            rows = [row for row in rows if row[1] not in existing]
+            
+            password_hashes = hash_passwords([password for _, _, password, _ in rows], processes)
+            created = bulk_create_users(db, [
+                {'username': username, 'password_hash': password_hash, 'is_admin': is_admin}
+                for (_, username, _, is_admin), password_hash in zip(rows, password_hashes)
+            ])
+            if created:
+                stats_cache.invalidate_all()
+            logger.info(f"Đã import {created} user từ CSV, bỏ qua {len(skipped)} dòng")
+            
+            return {
+                'success': True,
+                'created': created,
+                'skipped': sorted(skipped, key=lambda item: item['line'])
+            }
+            
+        except Exception as e:
+            db.rollback()
+            return {
+                'success': False,
+                'error': f'Lỗi import user: {str(e)}'
+            }
@@ -2,12 +2,24 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import engine, Base
 from app.routers import auth_router, emotion_router, session_router, stats_router, admin_router
 from app.routers.system_log_router import router as system_log_router
+from app.services.result_buffer import emotion_result_buffer
+from app.services.system_log_sink import system_log_sink
+from app.services.session_cache import active_session_cache
+from app.services.session_reaper import session_reaper
+from app.services.partition_manager import emotion_partition_manager
+from app.services.data_archiver import data_archiver
+from app.services.stats_rollup import stats_rollup
+from app.services.stats_cache import stats_cache
+from app.services.latency_tracker import latency_tracker
+from app.core.user_cache import user_cache
+from app.core.password_hasher import password_hasher
+from app.core.db_metrics import track_round_trips, record_route_round_trips, get_round_trip_metrics
 import logging
 from datetime import datetime
 
@@ -44,6 +56,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def count_db_round_trips(request: Request, call_next):
+    """Đếm số round-trip database của mỗi request (header X-DB-Round-Trips)"""
+    if not settings.ENABLE_METRICS:
+        return await call_next(request)
+    with track_round_trips() as counter:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    record_route_round_trips(f"{request.method} {route.path if route else request.url.path}", counter)
+    response.headers["X-DB-Round-Trips"] = str(counter.total)
+    return response
+
 # Include routers
 app.include_router(auth_router, prefix=settings.API_V1_STR)
 app.include_router(emotion_router, prefix=settings.API_V1_STR)
@@ -52,6 +76,33 @@ app.include_router(stats_router, prefix=settings.API_V1_STR)
 app.include_router(admin_router, prefix=settings.API_V1_STR)
 app.include_router(system_log_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+def start_background_workers():
+    """Khởi động các worker nền"""
+    if settings.EMOTION_WRITE_BEHIND_ENABLED:
+        emotion_result_buffer.start()
+    if settings.SYSTEM_LOG_ASYNC_ENABLED:
+        system_log_sink.start()
+    if settings.SESSION_REAPER_ENABLED:
+        session_reaper.start()
+    if settings.EMOTION_PARTITIONING_ENABLED:
+        emotion_partition_manager.start()
+    if settings.ARCHIVE_ENABLED:
+        data_archiver.start()
+    if settings.STATS_ROLLUP_ENABLED:
+        stats_rollup.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    """Dừng các worker nền và flush dữ liệu còn lại"""
+    session_reaper.stop()
+    emotion_partition_manager.stop()
+    data_archiver.stop()
+    stats_rollup.stop()
+    emotion_result_buffer.stop()
+    system_log_sink.stop()
+    password_hasher.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -72,6 +123,27 @@ async def health_check():
         "version": settings.VERSION
     }
 
+@app.get("/metrics")
+def get_metrics():
+    """Metrics nội bộ (buffer ghi nền, ...)"""
+    if not settings.ENABLE_METRICS:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "emotion_result_buffer": emotion_result_buffer.metrics(),
+        "system_log_sink": system_log_sink.metrics(),
+        "active_session_cache": active_session_cache.metrics(),
+        "user_cache": user_cache.metrics(),
+        "password_hasher": password_hasher.metrics(),
+        "session_reaper": session_reaper.metrics(),
+        "emotion_partitions": emotion_partition_manager.metrics(),
+        "data_archiver": data_archiver.metrics(),
+        "stats_rollup": stats_rollup.metrics(),
+        "stats_cache": stats_cache.metrics(),
+        "latency_tracker": latency_tracker.metrics(),
+        "db_round_trips": get_round_trip_metrics()
+    }
+
 @app.get("/info")
 def get_system_info():
     """Lấy thông tin hệ thống"""
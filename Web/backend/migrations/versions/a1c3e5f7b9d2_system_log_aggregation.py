@@ -0,0 +1,26 @@
+"""System log aggregation columns
+
+Revision ID: a1c3e5f7b9d2
+Revises: 136826214dc3
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b9d2'
+down_revision = '136826214dc3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('system_logs', sa.Column('event_type', sa.String(length=50), nullable=True, comment='Loại sự kiện (emotion_analysis, session_start, ...)'))
+    op.add_column('system_logs', sa.Column('event_count', sa.Integer(), server_default='1', nullable=False, comment='Số sự kiện gộp trong dòng log'))
+
+
+def downgrade() -> None:
+    op.drop_column('system_logs', 'event_count')
+    op.drop_column('system_logs', 'event_type')
@@ -0,0 +1,32 @@
+"""Client-supplied result id on emotion_results for idempotent bulk ingestion
+
+Revision ID: a9c1e3f5b7d8
+Revises: f7b9d1e3a5c6
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c1e3f5b7d8'
+down_revision = 'f7b9d1e3a5c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Cột nullable không có default: chỉ sửa catalog, không ghi lại bảng
+    op.add_column('emotion_results', sa.Column('client_result_id', sa.String(length=64), nullable=True, comment='Id do client offline gửi lên (chống ghi trùng khi gửi lại)'))
+    # Gồm timestamp vì unique index trên bảng partition phải chứa khóa partition
+    op.create_index(
+        'uq_emotion_results_user_client_id', 'emotion_results', ['user_id', 'client_result_id', 'timestamp'], unique=True,
+        postgresql_where=sa.text('client_result_id IS NOT NULL'),
+        sqlite_where=sa.text('client_result_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_emotion_results_user_client_id', table_name='emotion_results')
+    op.drop_column('emotion_results', 'client_result_id')
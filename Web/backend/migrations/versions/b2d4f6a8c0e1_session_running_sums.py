@@ -0,0 +1,32 @@
+"""Session running sums for true averages
+
+Revision ID: b2d4f6a8c0e1
+Revises: a1c3e5f7b9d2
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c0e1'
+down_revision = 'a1c3e5f7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('analysis_sessions', sa.Column('total_processing_time', sa.Float(), server_default='0', nullable=True, comment='Tổng thời gian xử lý (để tính trung bình)'))
+    op.add_column('analysis_sessions', sa.Column('total_fps', sa.Float(), server_default='0', nullable=True, comment='Tổng FPS (để tính trung bình)'))
+    # Khởi tạo tổng chạy từ giá trị hiện có (trước đây avg_* chỉ là giá trị của frame cuối)
+    op.execute(
+        "UPDATE analysis_sessions SET "
+        "total_processing_time = COALESCE(avg_processing_time, 0) * COALESCE(total_analyses, 0), "
+        "total_fps = COALESCE(avg_fps, 0) * COALESCE(total_analyses, 0)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('analysis_sessions', 'total_fps')
+    op.drop_column('analysis_sessions', 'total_processing_time')
@@ -0,0 +1,48 @@
+"""Hourly rollup tables for emotion and performance statistics
+
+Revision ID: b4d6f8a0c2e4
+Revises: a9c1e3f5b7d8
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c2e4'
+down_revision = 'a9c1e3f5b7d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('emotion_hourly_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False, comment='ID người dùng'),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False, comment='Đầu giờ (UTC)'),
+    sa.Column('emotion_code', sa.SmallInteger(), nullable=False, comment='Mã cảm xúc chính (-1: không phát hiện khuôn mặt)'),
+    sa.Column('result_count', sa.Integer(), nullable=False, comment='Số lần phân tích'),
+    sa.Column('detected_count', sa.Integer(), nullable=False, comment='Số lần phát hiện được khuôn mặt'),
+    sa.Column('image_quality_sum', sa.Float(), nullable=False, comment='Tổng chất lượng ảnh (lần phát hiện được)'),
+    sa.Column('image_quality_count', sa.Integer(), nullable=False, comment='Số giá trị chất lượng ảnh'),
+    sa.Column('score_sum', sa.Float(), nullable=False, comment='Tổng điểm cảm xúc > 0 (lần phát hiện được)'),
+    sa.Column('score_count', sa.Integer(), nullable=False, comment='Số giá trị điểm cảm xúc'),
+    sa.Column('processing_time_sum', sa.Float(), nullable=False, comment='Tổng thời gian xử lý'),
+    sa.Column('processing_time_count', sa.Integer(), nullable=False, comment='Số giá trị thời gian xử lý'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'hour', 'emotion_code')
+    )
+    op.create_index('ix_emotion_hourly_rollups_hour', 'emotion_hourly_rollups', ['hour'], unique=False)
+    # Chưa có dòng mốc: thống kê đọc bảng gốc cho tới khi worker / scripts/rollup_stats.py backfill dựng xong rollup
+    op.create_table('stats_rollup_state',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False, comment='Luôn là 1'),
+    sa.Column('rolled_up_until', sa.DateTime(timezone=True), nullable=False, comment='Đã tổng hợp đến trước giờ này (UTC)'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True, comment='Thời gian cập nhật'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_rollup_state')
+    op.drop_index('ix_emotion_hourly_rollups_hour', table_name='emotion_hourly_rollups')
+    op.drop_table('emotion_hourly_rollups')
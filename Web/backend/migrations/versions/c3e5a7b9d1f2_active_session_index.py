@@ -0,0 +1,32 @@
+"""Open-session partial index and session expiry columns
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('analysis_sessions', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True, comment='Hết hạn theo thời lượng tối đa'))
+    op.add_column('analysis_sessions', sa.Column('last_activity_at', sa.DateTime(timezone=True), nullable=True, comment='Lần phân tích gần nhất'))
+    op.create_index(
+        'ix_analysis_sessions_user_open', 'analysis_sessions', ['user_id'], unique=False,
+        postgresql_where=sa.text('session_end IS NULL'),
+        sqlite_where=sa.text('session_end IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_sessions_user_open', table_name='analysis_sessions')
+    op.drop_column('analysis_sessions', 'last_activity_at')
+    op.drop_column('analysis_sessions', 'expires_at')
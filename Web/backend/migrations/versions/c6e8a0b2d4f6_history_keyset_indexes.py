@@ -0,0 +1,57 @@
+"""Add id to history and system log indexes for keyset pagination
+
+Revision ID: c6e8a0b2d4f6
+Revises: b4d6f8a0c2e4
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6e8a0b2d4f6'
+down_revision = 'b4d6f8a0c2e4'
+branch_labels = None
+depends_on = None
+
+DETECTED_FILTER = 'faces_detected > 0 AND emotion_code <> -1'
+
+
+def _recreate_indexes(with_id: bool) -> None:
+    """Tạo lại các index lịch sử / log, có hoặc không có cột id sau cột thời gian"""
+    id_column = ['id'] if with_id else []
+
+    op.drop_index('ix_emotion_results_user_detected', table_name='emotion_results')
+    op.create_index(
+        'ix_emotion_results_user_detected', 'emotion_results', ['user_id', 'timestamp'] + id_column + ['emotion_code'],
+        unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER),
+        sqlite_where=sa.text(DETECTED_FILTER)
+    )
+    op.drop_index('ix_emotion_results_detected', table_name='emotion_results')
+    op.create_index(
+        'ix_emotion_results_detected', 'emotion_results', ['timestamp'] + id_column + ['emotion_code'], unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER),
+        sqlite_where=sa.text(DETECTED_FILTER)
+    )
+
+    op.drop_index('ix_system_logs_created_at', table_name='system_logs')
+    op.create_index('ix_system_logs_created_at', 'system_logs', ['created_at'] + id_column, unique=False)
+    op.drop_index('ix_system_logs_level_created_at', table_name='system_logs')
+    op.create_index('ix_system_logs_level_created_at', 'system_logs', ['level', 'created_at'] + id_column, unique=False)
+    op.drop_index('ix_system_logs_user_created_at', table_name='system_logs')
+    op.create_index(
+        'ix_system_logs_user_created_at', 'system_logs', ['user_id', 'created_at'] + id_column, unique=False,
+        postgresql_where=sa.text('user_id IS NOT NULL'),
+        sqlite_where=sa.text('user_id IS NOT NULL')
+    )
+
+
+def upgrade() -> None:
+    # Lịch sử / log sắp xếp theo (thời gian, id) giảm dần: mỗi trang là một lần quét đoạn index
+    _recreate_indexes(with_id=True)
+
+
+def downgrade() -> None:
+    _recreate_indexes(with_id=False)
@@ -0,0 +1,53 @@
+"""Composite and partial indexes for emotion_results and system_logs
+
+Revision ID: d4f6a8c0e2b3
+Revises: c3e5a7b9d1f2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6a8c0e2b3'
+down_revision = 'c3e5a7b9d1f2'
+branch_labels = None
+depends_on = None
+
+DETECTED_FILTER = "faces_detected > 0 AND emotion <> 'no_face_detected'"
+
+
+def upgrade() -> None:
+    # emotion_results
+    op.create_index('ix_emotion_results_user_timestamp', 'emotion_results', ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_emotion_results_timestamp', 'emotion_results', ['timestamp'], unique=False)
+    op.create_index(
+        'ix_emotion_results_user_detected', 'emotion_results', ['user_id', 'timestamp', 'emotion'], unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER),
+        sqlite_where=sa.text(DETECTED_FILTER)
+    )
+    op.create_index(
+        'ix_emotion_results_detected', 'emotion_results', ['timestamp', 'emotion'], unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER),
+        sqlite_where=sa.text(DETECTED_FILTER)
+    )
+
+    # system_logs
+    op.create_index('ix_system_logs_created_at', 'system_logs', ['created_at'], unique=False)
+    op.create_index('ix_system_logs_level_created_at', 'system_logs', ['level', 'created_at'], unique=False)
+    op.create_index(
+        'ix_system_logs_user_created_at', 'system_logs', ['user_id', 'created_at'], unique=False,
+        postgresql_where=sa.text('user_id IS NOT NULL'),
+        sqlite_where=sa.text('user_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_system_logs_user_created_at', table_name='system_logs')
+    op.drop_index('ix_system_logs_level_created_at', table_name='system_logs')
+    op.drop_index('ix_system_logs_created_at', table_name='system_logs')
+    op.drop_index('ix_emotion_results_detected', table_name='emotion_results')
+    op.drop_index('ix_emotion_results_user_detected', table_name='emotion_results')
+    op.drop_index('ix_emotion_results_timestamp', table_name='emotion_results')
+    op.drop_index('ix_emotion_results_user_timestamp', table_name='emotion_results')
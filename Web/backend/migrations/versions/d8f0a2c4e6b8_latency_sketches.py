@@ -0,0 +1,38 @@
+"""Latency percentile sketches for rollups and sessions
+
+Revision ID: d8f0a2c4e6b8
+Revises: c6e8a0b2d4f6
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f0a2c4e6b8'
+down_revision = 'c6e8a0b2d4f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('latency_hourly_sketches',
+    sa.Column('user_id', sa.Integer(), nullable=False, comment='ID người dùng'),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False, comment='Đầu giờ (UTC)'),
+    sa.Column('bin', sa.SmallInteger(), autoincrement=False, nullable=False, comment='Bin DDSketch của thời gian xử lý'),
+    sa.Column('count', sa.Integer(), nullable=False, comment='Số lần phân tích trong bin'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'hour', 'bin')
+    )
+    op.create_index('ix_latency_hourly_sketches_hour', 'latency_hourly_sketches', ['hour'], unique=False)
+    op.add_column('analysis_sessions', sa.Column('processing_time_sketch', sa.LargeBinary(), nullable=True, comment='Sketch phân vị thời gian xử lý (DDSketch), ghi khi kết thúc phiên'))
+    # Giờ đã tổng hợp trước khi có bảng sketch không có bin: xóa mốc để worker / scripts/rollup_stats.py dựng lại
+    op.execute('DELETE FROM stats_rollup_state')
+    op.execute('DELETE FROM emotion_hourly_rollups')
+
+
+def downgrade() -> None:
+    op.drop_column('analysis_sessions', 'processing_time_sketch')
+    op.drop_index('ix_latency_hourly_sketches_hour', table_name='latency_hourly_sketches')
+    op.drop_table('latency_hourly_sketches')
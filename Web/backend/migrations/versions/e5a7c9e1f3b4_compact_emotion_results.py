@@ -0,0 +1,162 @@
+"""Compact emotion_results rows: emotion code and packed score vector
+
+Revision ID: e5a7c9e1f3b4
+Revises: d4f6a8c0e2b3
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+import json
+import struct
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9e1f3b4'
+down_revision = 'd4f6a8c0e2b3'
+branch_labels = None
+depends_on = None
+
+# Cố định trong migration (không import từ app để migration không đổi theo code)
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+EMOTION_LABELS_VN = ['Giận dữ', 'Ghê tởm', 'Sợ hãi', 'Vui vẻ', 'Buồn bã', 'Ngạc nhiên', 'Bình thường']
+NO_FACE_LABEL = 'no_face_detected'
+NO_FACE_LABEL_VN = 'Không phát hiện khuôn mặt'
+NO_FACE_CODE = -1
+SCORES_STRUCT = struct.Struct('<7f')
+BATCH_SIZE = 5000
+
+emotion_results = sa.table(
+    'emotion_results',
+    sa.column('id', sa.Integer),
+    sa.column('emotion', sa.String),
+    sa.column('dominant_emotion', sa.String),
+    sa.column('dominant_emotion_vn', sa.String),
+    sa.column('emotion_code', sa.SmallInteger),
+    sa.column('emotions_scores', sa.JSON),
+    sa.column('emotions_scores_vn', sa.JSON),
+    sa.column('scores_packed', sa.LargeBinary),
+)
+
+
+def _emotion_code_expr():
+    """CASE emotion -> mã cảm xúc (nhãn lạ coi như không phát hiện khuôn mặt)"""
+    label = sa.func.coalesce(emotion_results.c.emotion, emotion_results.c.dominant_emotion)
+    return sa.case(
+        {emotion: code for code, emotion in enumerate(EMOTION_LABELS)},
+        value=label,
+        else_=NO_FACE_CODE
+    )
+
+
+def _iter_batches(bind, columns, where):
+    """Duyệt bảng theo id (keyset) từng lô BATCH_SIZE dòng"""
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(emotion_results.c.id, *columns)
+            .where(emotion_results.c.id > last_id, where)
+            .order_by(emotion_results.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _pack(scores):
+    if isinstance(scores, str):
+        scores = json.loads(scores)
+    if not scores:
+        return None
+    return SCORES_STRUCT.pack(*(float(scores.get(label, 0.0)) for label in EMOTION_LABELS))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    op.add_column('emotion_results', sa.Column('emotion_code', sa.SmallInteger(), nullable=True, comment='Mã cảm xúc chính (-1: không phát hiện khuôn mặt)'))
+    op.add_column('emotion_results', sa.Column('scores_packed', sa.LargeBinary(), nullable=True, comment='Điểm số 7 cảm xúc (float32 theo thứ tự model)'))
+
+    # Backfill: mã cảm xúc bằng một lệnh UPDATE, vector điểm số theo lô
+    bind.execute(sa.update(emotion_results).values(emotion_code=_emotion_code_expr()))
+    update_scores = sa.update(emotion_results).where(
+        emotion_results.c.id == sa.bindparam('row_id')
+    ).values(scores_packed=sa.bindparam('packed'))
+    for rows in _iter_batches(bind, [emotion_results.c.emotions_scores], emotion_results.c.emotions_scores.isnot(None)):
+        params = [{'row_id': row_id, 'packed': _pack(scores)} for row_id, scores in rows]
+        params = [p for p in params if p['packed'] is not None]
+        if params:
+            bind.execute(update_scores, params)
+
+    # Index cũ tham chiếu cột emotion
+    op.drop_index('ix_emotion_results_detected', table_name='emotion_results')
+    op.drop_index('ix_emotion_results_user_detected', table_name='emotion_results')
+
+    with op.batch_alter_table('emotion_results') as batch_op:
+        batch_op.alter_column('emotion_code', existing_type=sa.SmallInteger(), nullable=False)
+        batch_op.drop_column('emotions_scores_vn')
+        batch_op.drop_column('emotions_scores')
+        batch_op.drop_column('dominant_emotion_vn')
+        batch_op.drop_column('dominant_emotion')
+        batch_op.drop_column('emotion')
+
+    op.create_index(
+        'ix_emotion_results_user_detected', 'emotion_results', ['user_id', 'timestamp', 'emotion_code'], unique=False,
+        postgresql_where=sa.text('faces_detected > 0 AND emotion_code <> -1'),
+        sqlite_where=sa.text('faces_detected > 0 AND emotion_code <> -1')
+    )
+    op.create_index(
+        'ix_emotion_results_detected', 'emotion_results', ['timestamp', 'emotion_code'], unique=False,
+        postgresql_where=sa.text('faces_detected > 0 AND emotion_code <> -1'),
+        sqlite_where=sa.text('faces_detected > 0 AND emotion_code <> -1')
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    op.add_column('emotion_results', sa.Column('emotion', sa.String(length=20), nullable=True, comment='Cảm xúc chính'))
+    op.add_column('emotion_results', sa.Column('dominant_emotion', sa.String(length=20), nullable=True, comment='Cảm xúc chiếm ưu thế'))
+    op.add_column('emotion_results', sa.Column('dominant_emotion_vn', sa.String(length=50), nullable=True, comment='Cảm xúc chiếm ưu thế (tiếng Việt)'))
+    op.add_column('emotion_results', sa.Column('emotions_scores', sa.JSON(), nullable=True, comment='Điểm số tất cả cảm xúc'))
+    op.add_column('emotion_results', sa.Column('emotions_scores_vn', sa.JSON(), nullable=True, comment='Điểm số tất cả cảm xúc (tiếng Việt)'))
+
+    code = emotion_results.c.emotion_code
+    label = sa.case({c: emotion for c, emotion in enumerate(EMOTION_LABELS)}, value=code, else_=NO_FACE_LABEL)
+    label_vn = sa.case({c: emotion for c, emotion in enumerate(EMOTION_LABELS_VN)}, value=code, else_=NO_FACE_LABEL_VN)
+    bind.execute(sa.update(emotion_results).values(emotion=label, dominant_emotion=label, dominant_emotion_vn=label_vn))
+
+    update_scores = sa.update(emotion_results).where(
+        emotion_results.c.id == sa.bindparam('row_id')
+    ).values(emotions_scores=sa.bindparam('scores'), emotions_scores_vn=sa.bindparam('scores_vn'))
+    for rows in _iter_batches(bind, [emotion_results.c.scores_packed], emotion_results.c.scores_packed.isnot(None)):
+        params = []
+        for row_id, packed in rows:
+            values = [round(value, 6) for value in SCORES_STRUCT.unpack(packed)]
+            params.append({
+                'row_id': row_id,
+                'scores': dict(zip(EMOTION_LABELS, values)),
+                'scores_vn': dict(zip(EMOTION_LABELS_VN, values))
+            })
+        bind.execute(update_scores, params)
+
+    op.drop_index('ix_emotion_results_detected', table_name='emotion_results')
+    op.drop_index('ix_emotion_results_user_detected', table_name='emotion_results')
+
+    with op.batch_alter_table('emotion_results') as batch_op:
+        batch_op.alter_column('emotion', existing_type=sa.String(length=20), nullable=False)
+        batch_op.drop_column('scores_packed')
+        batch_op.drop_column('emotion_code')
+
+    op.create_index(
+        'ix_emotion_results_user_detected', 'emotion_results', ['user_id', 'timestamp', 'emotion'], unique=False,
+        postgresql_where=sa.text("faces_detected > 0 AND emotion <> 'no_face_detected'"),
+        sqlite_where=sa.text("faces_detected > 0 AND emotion <> 'no_face_detected'")
+    )
+    op.create_index(
+        'ix_emotion_results_detected', 'emotion_results', ['timestamp', 'emotion'], unique=False,
+        postgresql_where=sa.text("faces_detected > 0 AND emotion <> 'no_face_detected'"),
+        sqlite_where=sa.text("faces_detected > 0 AND emotion <> 'no_face_detected'")
+    )
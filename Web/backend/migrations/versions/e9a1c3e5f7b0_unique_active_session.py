@@ -0,0 +1,43 @@
+"""Unique open-session index on analysis_sessions (status = 'active')
+
+Revision ID: e9a1c3e5f7b0
+Revises: d8f0a2c4e6b8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a1c3e5f7b0'
+down_revision = 'd8f0a2c4e6b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Trạng thái khớp với session_end (phiên đã kết thúc qua update_session vẫn còn 'active')
+    op.execute("UPDATE analysis_sessions SET status = 'ended' WHERE session_end IS NOT NULL AND status = 'active'")
+    op.execute("UPDATE analysis_sessions SET status = 'active' WHERE session_end IS NULL AND status IS NULL")
+    # Mỗi user chỉ giữ phiên đang mở mới nhất, các phiên trùng (do race trước đây) được đóng
+    op.execute(
+        "UPDATE analysis_sessions SET status = 'ended', session_end = CURRENT_TIMESTAMP "
+        "WHERE status = 'active' AND id NOT IN ("
+        "SELECT MAX(id) FROM analysis_sessions WHERE status = 'active' GROUP BY user_id)"
+    )
+    op.drop_index('ix_analysis_sessions_user_open', table_name='analysis_sessions')
+    op.create_index(
+        'ix_analysis_sessions_user_open', 'analysis_sessions', ['user_id'], unique=True,
+        postgresql_where=sa.text("status = 'active'"),
+        sqlite_where=sa.text("status = 'active'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analysis_sessions_user_open', table_name='analysis_sessions')
+    op.create_index(
+        'ix_analysis_sessions_user_open', 'analysis_sessions', ['user_id'], unique=False,
+        postgresql_where=sa.text('session_end IS NULL'),
+        sqlite_where=sa.text('session_end IS NULL')
+    )
@@ -0,0 +1,118 @@
+"""Optional range partitioning of emotion_results on timestamp
+
+Revision ID: f7b9d1e3a5c6
+Revises: e5a7c9e1f3b4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+from app.core.config import settings
+from app.services.partition_manager import interval_start, next_interval, partition_ranges, create_partition_sql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b9d1e3a5c6'
+down_revision = 'e5a7c9e1f3b4'
+branch_labels = None
+depends_on = None
+
+DETECTED_FILTER = 'faces_detected > 0 AND emotion_code <> -1'
+
+
+def _create_indexes() -> None:
+    """Index của emotion_results (trên bảng partition sẽ tự tạo cho từng partition)"""
+    op.create_index('ix_emotion_results_id', 'emotion_results', ['id'], unique=False)
+    op.create_index('ix_emotion_results_user_timestamp', 'emotion_results', ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_emotion_results_timestamp', 'emotion_results', ['timestamp'], unique=False)
+    op.create_index(
+        'ix_emotion_results_user_detected', 'emotion_results', ['user_id', 'timestamp', 'emotion_code'], unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER)
+    )
+    op.create_index(
+        'ix_emotion_results_detected', 'emotion_results', ['timestamp', 'emotion_code'], unique=False,
+        postgresql_where=sa.text(DETECTED_FILTER)
+    )
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = 'emotion_results' AND pg_table_is_visible(c.oid)"
+    )).scalar())
+
+
+def _swap_table(bind, new_table: str, sequence: str) -> None:
+    """Chép dữ liệu sang new_table, xóa bảng cũ và đổi tên new_table thành emotion_results"""
+    op.execute(f"INSERT INTO {new_table} SELECT * FROM emotion_results")
+    op.execute("DROP TABLE emotion_results CASCADE")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO emotion_results")
+    op.execute(f"ALTER TABLE emotion_results RENAME CONSTRAINT {new_table}_pkey TO emotion_results_pkey")
+    op.execute(f"ALTER TABLE emotion_results RENAME CONSTRAINT {new_table}_user_id_fkey TO emotion_results_user_id_fkey")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY emotion_results.id")
+    _create_indexes()
+    op.execute("ANALYZE emotion_results")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # timestamp là khóa partition nên không được NULL
+    op.execute(sa.text("UPDATE emotion_results SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL"))
+    with op.batch_alter_table('emotion_results') as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    if bind.dialect.name != 'postgresql' or not settings.EMOTION_PARTITIONING_ENABLED:
+        return
+
+    interval = settings.EMOTION_PARTITION_INTERVAL
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('emotion_results', 'id')")).scalar()
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    # Khóa chính của bảng partition phải chứa cột partition
+    op.execute(
+        "CREATE TABLE emotion_results_partitioned "
+        "(LIKE emotion_results INCLUDING DEFAULTS INCLUDING COMMENTS INCLUDING STORAGE) "
+        "PARTITION BY RANGE (timestamp)"
+    )
+    op.execute("ALTER TABLE emotion_results_partitioned ADD CONSTRAINT emotion_results_partitioned_pkey PRIMARY KEY (id, timestamp)")
+    op.execute(
+        "ALTER TABLE emotion_results_partitioned ADD CONSTRAINT emotion_results_partitioned_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id)"
+    )
+
+    # Partition cho toàn bộ dữ liệu hiện có và premake khoảng tương lai
+    now = datetime.now(timezone.utc)
+    first, last = bind.execute(sa.text("SELECT min(timestamp), max(timestamp) FROM emotion_results")).one()
+    future = interval_start(now, interval)
+    for _ in range(settings.EMOTION_PARTITION_PREMAKE):
+        future = next_interval(future, interval)
+    for start, end in partition_ranges(min(first or now, now), max(last or now, future), interval):
+        op.execute(create_partition_sql('emotion_results', start, end, interval, parent='emotion_results_partitioned'))
+    # Dòng ngoài mọi khoảng (đồng hồ lệch, dữ liệu nhập tay) rơi vào partition DEFAULT thay vì lỗi
+    op.execute("CREATE TABLE emotion_results_default PARTITION OF emotion_results_partitioned DEFAULT")
+
+    _swap_table(bind, 'emotion_results_partitioned', sequence)
+
+
+def downgrade() -> None:
+    """Gộp lại thành một bảng (chỉ dữ liệu của các partition còn gắn; partition đã detach giữ nguyên)"""
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql' and _is_partitioned(bind):
+        sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('emotion_results', 'id')")).scalar()
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+        op.execute(
+            "CREATE TABLE emotion_results_plain "
+            "(LIKE emotion_results INCLUDING DEFAULTS INCLUDING COMMENTS INCLUDING STORAGE)"
+        )
+        op.execute("ALTER TABLE emotion_results_plain ADD CONSTRAINT emotion_results_plain_pkey PRIMARY KEY (id)")
+        op.execute(
+            "ALTER TABLE emotion_results_plain ADD CONSTRAINT emotion_results_plain_user_id_fkey "
+            "FOREIGN KEY (user_id) REFERENCES users (id)"
+        )
+        _swap_table(bind, 'emotion_results_plain', sequence)
+
+    with op.batch_alter_table('emotion_results') as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(timezone=True), nullable=True)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Script lưu trữ dữ liệu cũ (emotion_results, system_logs) ra file Parquet
+
+    python scripts/archive_data.py run                        # Lưu trữ dòng cũ hơn ARCHIVE_RETENTION_DAYS
+    python scripts/archive_data.py run --retention-days 30    # Ghi đè retention cho lượt này
+    python scripts/archive_data.py status                     # Số file, số dòng, dung lượng theo tháng
+    python scripts/archive_data.py recover                    # Xử lý file tạm còn sót sau khi bị dừng giữa chừng
+
+File nằm ở ARCHIVE_DIR/<bảng>/month=YYYY-MM/user=<id>/part-<id đầu>-<id cuối>.parquet
+"""
+
+import sys
+import os
+import glob
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.services.data_archiver import data_archiver, ARCHIVED_TABLES
+
+def show_status():
+    """In thống kê file lưu trữ theo bảng và tháng"""
+    import pyarrow.parquet as pq
+
+    print(f"Thư mục lưu trữ: {os.path.abspath(data_archiver.root)}")
+    for table_name in ARCHIVED_TABLES:
+        watermark = data_archiver.watermark(table_name)
+        print(f"\n{table_name}: đã lưu trữ dữ liệu trước {watermark:%Y-%m-%d %H:%M} UTC" if watermark
+              else f"\n{table_name}: chưa lưu trữ")
+        months = sorted(glob.glob(os.path.join(data_archiver.root, table_name, "month=*")))
+        for month_dir in months:
+            files = glob.glob(os.path.join(month_dir, "user=*", "*.parquet"))
+            rows = sum(pq.ParquetFile(path).metadata.num_rows for path in files)
+            size = sum(os.path.getsize(path) for path in files)
+            users = len(glob.glob(os.path.join(month_dir, "user=*")))
+            print(f"  {os.path.basename(month_dir):16s} {users:>5} user {len(files):>6} file {rows:>12,} dòng {size / (1024 * 1024):>9.2f} MB")
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Lưu trữ dữ liệu cũ ra file Parquet")
+    parser.add_argument("command", choices=["run", "status", "recover"])
+    parser.add_argument("--retention-days", type=int, default=None, help="Mặc định: ARCHIVE_RETENTION_DAYS")
+    parser.add_argument("--batch-size", type=int, default=None, help="Mặc định: ARCHIVE_BATCH_SIZE")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        show_status()
+        return
+    if args.command == "recover":
+        result = data_archiver.recover_pending()
+        print(f"Đã công bố {result['published']} file, bỏ {result['discarded']} file tạm")
+        return
+
+    if args.retention_days is not None:
+        data_archiver.retention_days = max(1, args.retention_days)
+    if args.batch_size is not None:
+        data_archiver.batch_size = max(1, args.batch_size)
+
+    result = data_archiver.run_once()
+    if not result['success']:
+        print(f"Lỗi: {result['error']}")
+        sys.exit(1)
+    print(f"Mốc lưu trữ: {result['cutoff']}")
+    for table_name, count in result['archived'].items():
+        print(f"  {table_name}: {count:,} dòng (mốc {result['cutoffs'][table_name]})")
+
+if __name__ == "__main__":
+    main()
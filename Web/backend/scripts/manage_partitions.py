@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Script quản lý partition của emotion_results (PostgreSQL)
+
+    python scripts/manage_partitions.py status      # Liệt kê partition và số dòng
+    python scripts/manage_partitions.py maintain    # Tạo partition tương lai, tách partition cũ theo retention
+
+Chuyển bảng sang partition: đặt EMOTION_PARTITIONING_ENABLED=true rồi chạy "alembic upgrade head".
+"""
+
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import text
+from app.services.partition_manager import emotion_partition_manager
+
+def show_status():
+    """In danh sách partition"""
+    manager = emotion_partition_manager
+    if not manager.supported:
+        print("Database không phải PostgreSQL: emotion_results là một bảng duy nhất")
+        return
+    with manager.bind.connect() as conn:
+        if not manager.is_partitioned(conn):
+            print("emotion_results chưa được partition (EMOTION_PARTITIONING_ENABLED=false khi migrate?)")
+            return
+        partitions = manager.list_partitions(conn)
+        print(f"emotion_results: {len(partitions)} partition (khoảng: {manager.interval})")
+        for partition in partitions:
+            rows = conn.execute(text(f"SELECT count(*) FROM {partition['name']}")).scalar()
+            bounds = "DEFAULT" if partition['default'] else f"{partition['start']:%Y-%m-%d} -> {partition['end']:%Y-%m-%d}"
+            print(f"  {partition['name']:32s} {bounds:28s} {rows:>12,} dòng")
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Quản lý partition emotion_results")
+    parser.add_argument("command", choices=["status", "maintain"])
+    args = parser.parse_args()
+
+    if args.command == "status":
+        show_status()
+        return
+
+    result = emotion_partition_manager.run_maintenance()
+    if not result['success']:
+        print(f"Lỗi: {result['error']}")
+        sys.exit(1)
+    print(f"Đã tạo: {result['created'] or 'không có'}")
+    print(f"Đã tách ({emotion_partition_manager.retention_mode}): {result['retired'] or 'không có'}")
+
+if __name__ == "__main__":
+    main()
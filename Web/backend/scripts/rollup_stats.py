@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Script quản lý rollup thống kê theo giờ (emotion_hourly_rollups)
+
+    python scripts/rollup_stats.py backfill              # Khởi tạo (nếu chưa có) và tổng hợp tới giờ trọn gần nhất
+    python scripts/rollup_stats.py backfill --rebuild    # Xóa rollup rồi dựng lại từ bảng gốc + file lưu trữ
+    python scripts/rollup_stats.py status                # Mốc rollup, số dòng, độ trễ
+    python scripts/rollup_stats.py verify                # So sánh thống kê từ rollup với quét bảng gốc + file lưu trữ
+
+Worker trong app (STATS_ROLLUP_ENABLED=true) tự khởi tạo khi chạy lần đầu; script dùng để backfill
+trước khi bật hoặc kiểm tra sau khi sửa dữ liệu bằng tay.
+"""
+
+import sys
+import os
+import math
+import time
+import argparse
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func
+from app.core.database import SessionLocal
+from app.models.models import EmotionHourlyRollup
+from app.crud.emotion_crud import (
+    get_period_start, count_emotions, get_performance_totals, get_session_performance, summarize_performance
+)
+from app.crud.rollup_crud import get_rollup_watermark
+from app.services.data_archiver import data_archiver
+from app.services.stats_rollup import stats_rollup
+from app.services.stats_service import StatsService, _merge_counts
+
+PERIODS = ['day', 'week', 'month', 'year', 'all']
+
+def show_status():
+    """In mốc rollup và kích thước bảng"""
+    db = SessionLocal()
+    try:
+        watermark = get_rollup_watermark(db)
+        rows, users, first_hour = db.query(
+            func.count(), func.count(func.distinct(EmotionHourlyRollup.user_id)), func.min(EmotionHourlyRollup.hour)
+        ).one()
+    finally:
+        db.close()
+    if watermark is None:
+        print("Rollup chưa khởi tạo: thống kê đang quét bảng gốc (chạy 'backfill')")
+        return
+    lag = datetime.now(timezone.utc) - watermark
+    print(f"Đã tổng hợp tới trước: {watermark:%Y-%m-%d %H:%M} UTC (trễ {lag.total_seconds() / 60:.0f} phút)")
+    print(f"Giờ đầu tiên:          {first_hour:%Y-%m-%d %H:%M} UTC" if first_hour else "Giờ đầu tiên:          -")
+    print(f"Số dòng rollup:        {rows:,} ({users} user)")
+
+def _reference_stats(db, period, user_id=None):
+    """Thống kê tính thẳng từ bảng gốc + file lưu trữ (không dùng rollup)"""
+    start = get_period_start(period)
+    counts = _merge_counts(count_emotions(db, start, user_id), data_archiver.emotion_counts(start, user_id))
+    performance = summarize_performance(
+        get_performance_totals(db, start, user_id), *get_session_performance(db, start, user_id),
+        data_archiver.performance_totals(start, user_id)
+    )
+    return counts, performance
+
+def verify(user_id=None) -> int:
+    """So sánh thống kê qua rollup với cách tính trực tiếp, trả về số khoảng bị lệch"""
+    db = SessionLocal()
+    failures = 0
+    try:
+        if get_rollup_watermark(db) is None:
+            print("Rollup chưa khởi tạo")
+            return 1
+        scope = f"user {user_id}" if user_id is not None else "tất cả user"
+        print(f"{scope:14s} {'rollup (ms)':>12s} {'quét (ms)':>12s}  khớp")
+        for period in PERIODS:
+            started = time.perf_counter()
+            if user_id is None:
+                counts = StatsService.get_all_users_emotion_stats(db, period)['emotion_stats']
+                performance = StatsService.get_all_users_performance_stats(db, period)
+            else:
+                counts = StatsService.get_user_emotion_stats(db, user_id, period)['emotion_stats']
+                performance = StatsService.get_user_performance_stats(db, user_id, period)
+            rollup_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            expected_counts, expected_performance = _reference_stats(db, period, user_id)
+            scan_ms = (time.perf_counter() - started) * 1000
+
+            ok = counts == expected_counts and all(
+                math.isclose(performance[key], value, rel_tol=1e-9, abs_tol=1e-9)
+                for key, value in expected_performance.items()
+            )
+            failures += not ok
+            print(f"{period:14s} {rollup_ms:12.1f} {scan_ms:12.1f}  {'OK' if ok else 'LỆCH'}")
+            if not ok:
+                print(f"    cảm xúc: rollup={counts} quét={expected_counts}")
+                for key, value in expected_performance.items():
+                    print(f"    {key}: rollup={performance[key]!r} quét={value!r}")
+    finally:
+        db.close()
+    return failures
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Quản lý rollup thống kê theo giờ")
+    parser.add_argument("command", choices=["backfill", "status", "verify"])
+    parser.add_argument("--rebuild", action="store_true", help="Xóa rollup hiện có rồi dựng lại")
+    parser.add_argument("--chunk-hours", type=int, default=None, help="Mặc định: STATS_ROLLUP_CHUNK_HOURS")
+    parser.add_argument("--user-id", type=int, default=None, help="verify cho một user (mặc định: tất cả)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        show_status()
+        return
+    if args.command == "verify":
+        if verify(args.user_id):
+            sys.exit(1)
+        return
+
+    if args.chunk_hours is not None:
+        stats_rollup.chunk_hours = max(1, args.chunk_hours)
+    started = time.perf_counter()
+    result = stats_rollup.rebuild() if args.rebuild else stats_rollup.compact_once()
+    if not result['success']:
+        print(f"Lỗi: {result['error']}")
+        sys.exit(1)
+    metrics = stats_rollup.metrics()
+    print(f"Đã tổng hợp {metrics['compacted_hours']:,} giờ ({metrics['rollup_rows_written']:,} dòng rollup) "
+          f"trong {time.perf_counter() - started:.1f}s")
+    print(f"Mốc rollup: {result['rolled_up_until']}")
+
+if __name__ == "__main__":
+    main()
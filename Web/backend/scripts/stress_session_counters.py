@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Script kiểm tra tải đồng thời cho bộ đếm phiên phân tích
+
+Chạy nhiều thread cùng cập nhật một AnalysisSession và kiểm tra các bộ đếm
+(total_analyses, successful_detections, ...) và trung bình là chính xác.
+
+    python scripts/stress_session_counters.py                      # SQLite tạm
+    python scripts/stress_session_counters.py --database-url postgresql://...
+    python scripts/stress_session_counters.py --legacy             # Cách cũ (đọc-tính-ghi) để so sánh
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.models.models import User, AnalysisSession
+from app.crud.session_crud import increment_session_stats, update_session
+
+def legacy_update(db, session_id: int, successful: int, processing_time: float, fps: float):
+    """Cách cập nhật cũ: đọc session, tính trong Python rồi ghi lại"""
+    session = db.query(AnalysisSession).filter(AnalysisSession.id == session_id).first()
+    new_total = (session.total_analyses or 0) + 1
+    new_successful = (session.successful_detections or 0) + successful
+    update_session(
+        db, session_id,
+        total_analyses=new_total,
+        successful_detections=new_successful,
+        failed_detections=(session.failed_detections or 0) + (1 - successful),
+        detection_rate=new_successful / new_total * 100,
+        avg_processing_time=processing_time,
+        avg_fps=fps
+    )
+
+def run_stress(database_url: str, threads: int, iterations: int, legacy: bool) -> bool:
+    """Chạy stress test, trả về True nếu bộ đếm chính xác"""
+    connect_args = {"timeout": 30, "check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args, pool_size=threads, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = SessionFactory()
+    user = User(username=f"stress_{os.getpid()}_{threading.get_ident()}", password_hash="x")
+    db.add(user)
+    db.commit()
+    session = AnalysisSession(user_id=user.id)
+    db.add(session)
+    db.commit()
+    session_id = session.id
+    db.close()
+
+    errors = []
+
+    def worker(worker_id: int):
+        worker_db = SessionFactory()
+        try:
+            for i in range(iterations):
+                # Frame chẵn phát hiện được khuôn mặt, processing_time = 1..10
+                successful = 1 if i % 2 == 0 else 0
+                processing_time = float(i % 10 + 1)
+                fps = 1000 / processing_time
+                if legacy:
+                    legacy_update(worker_db, session_id, successful, processing_time, fps)
+                else:
+                    increment_session_stats(worker_db, session_id, successful=successful,
+                                            processing_time_sum=processing_time, fps_sum=fps)
+        except Exception as e:
+            errors.append(f"worker {worker_id}: {e}")
+        finally:
+            worker_db.close()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    # Giá trị kỳ vọng
+    expected_total = threads * iterations
+    expected_successful = threads * ((iterations + 1) // 2)
+    processing_times = [float(i % 10 + 1) for i in range(iterations)]
+    expected_avg_processing = sum(processing_times) * threads / expected_total
+    expected_avg_fps = sum(1000 / t for t in processing_times) * threads / expected_total
+
+    db = SessionFactory()
+    session = db.query(AnalysisSession).filter(AnalysisSession.id == session_id).first()
+    checks = {
+        'total_analyses': (session.total_analyses, expected_total),
+        'successful_detections': (session.successful_detections, expected_successful),
+        'failed_detections': (session.failed_detections, expected_total - expected_successful),
+        'avg_processing_time': (round(session.avg_processing_time, 6), round(expected_avg_processing, 6)),
+        'avg_fps': (round(session.avg_fps, 6), round(expected_avg_fps, 6))
+    }
+    db.close()
+
+    print(f"Chế độ: {'legacy (đọc-tính-ghi)' if legacy else 'UPDATE nguyên tử'}")
+    print(f"Threads: {threads}, iterations/thread: {iterations}")
+    ok = not errors
+    for name, (actual, expected) in checks.items():
+        status = "OK" if actual == expected else "SAI"
+        ok = ok and actual == expected
+        print(f"  {name:24s} thực tế={actual!s:>14}  kỳ vọng={expected!s:>14}  {status}")
+    for error in errors:
+        print(f"  Lỗi {error}")
+    return ok
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Stress test bộ đếm AnalysisSession")
+    parser.add_argument("--database-url", default=None, help="Mặc định: SQLite tạm")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--legacy", action="store_true", help="Dùng cách cập nhật cũ để so sánh")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    ok = run_stress(database_url, args.threads, args.iterations, args.legacy)
+    print("Kết quả: chính xác" if ok else "Kết quả: bộ đếm bị lệch")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
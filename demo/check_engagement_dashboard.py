@@ -0,0 +1,115 @@
+"""
+Kiểm tra biểu đồ mức độ tham gia cho buổi học dài (không cần camera / model thật)
+
+Giả lập buổi học bằng đồng hồ giả: mỗi frame có vài học sinh với mức độ tham gia cố định theo học
+sinh. Kiểm tra ring buffer giữ đúng số học sinh trung bình mỗi giây, bộ nhớ không tăng theo thời gian
+và thời gian cập nhật biểu đồ không tăng; in thêm thời gian của cách cũ (clear + vẽ lại toàn bộ từ
+dict engagement_over_time không giới hạn). Thoát với mã 1 nếu có lỗi.
+
+    python check_engagement_dashboard.py
+    python check_engagement_dashboard.py --minutes 30 --window 120
+"""
+
+import sys
+import time
+import argparse
+from collections import defaultdict
+import numpy as np
+from engagement_dashboard import EngagementDashboard, ENGAGEMENT_LEVELS, ENGAGEMENT_COLORS
+
+class FakeClock:
+    """Đồng hồ giả để giả lập nhiều phút trong vài giây"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def legacy_update_ms(engagement_over_time, counts):
+    """Thời gian (ms) một lần update_charts() kiểu cũ với dữ liệu hiện có"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(12, 6))
+    canvas = FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(1, 2)
+    started = time.perf_counter()
+    ax1.clear()
+    times = sorted(engagement_over_time.keys())
+    layers = [[engagement_over_time[t][level] for t in times] for level in range(3)]
+    ax1.stackplot(times, *layers, labels=ENGAGEMENT_LEVELS, colors=ENGAGEMENT_COLORS)
+    ax1.legend(loc='upper left')
+    ax2.clear()
+    ax2.pie(counts, labels=ENGAGEMENT_LEVELS, autopct='%1.2f%%', colors=ENGAGEMENT_COLORS)
+    canvas.draw()
+    return (time.perf_counter() - started) * 1000
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Kiểm tra biểu đồ mức độ tham gia cho buổi học dài")
+    parser.add_argument("--minutes", type=float, default=20, help="Độ dài buổi học giả lập")
+    parser.add_argument("--fps", type=int, default=15, help="Số frame hiển thị mỗi giây")
+    parser.add_argument("--students", type=int, default=6, help="Số học sinh trong khung hình")
+    parser.add_argument("--window", type=int, default=120, help="Số giây hiển thị trên biểu đồ")
+    args = parser.parse_args()
+
+    levels = [ENGAGEMENT_LEVELS[student % 3] for student in range(args.students)]
+    expected = np.array([levels.count(level) for level in ENGAGEMENT_LEVELS], dtype=np.float32)
+    clock = FakeClock()
+    dashboard = EngagementDashboard(window_seconds=args.window, clock=clock)
+    buffer_bytes = dashboard.buffer._sums.nbytes + dashboard.buffer._frames.nbytes
+
+    # Cách cũ: một ô dict mỗi frame hiển thị, không bao giờ bị xóa
+    engagement_over_time = defaultdict(lambda: [0, 0, 0])
+    counts = [0, 0, 0]
+
+    failures = []
+    render_ms, record_us = [], []
+    total_frames = int(args.minutes * 60 * args.fps)
+    checkpoints = {int(total_frames * fraction) for fraction in (0.1, 0.5, 1.0)}
+    print(f"{'Phút':>6} {'Cũ: ô dict':>11} {'Cũ: ms/lần':>11} {'Mới: ms/lần':>12} {'Mới: bộ nhớ':>12}")
+    for frame_number in range(1, total_frames + 1):
+        clock.now = frame_number / args.fps
+        started = time.perf_counter()
+        dashboard.record_frame(levels)
+        record_us.append((time.perf_counter() - started) * 1e6)
+        for level in levels:
+            index = ENGAGEMENT_LEVELS.index(level)
+            engagement_over_time[frame_number][2 - index] += 1
+            counts[index] += 1
+
+        if frame_number % (args.fps * 60) == 0 or frame_number in checkpoints:
+            started = time.perf_counter()
+            dashboard._render()
+            render_ms.append((time.perf_counter() - started) * 1000)
+        if frame_number in checkpoints:
+            legacy_ms = legacy_update_ms(engagement_over_time, counts)
+            memory = dashboard.buffer._sums.nbytes + dashboard.buffer._frames.nbytes
+            print(f"{frame_number / args.fps / 60:>6.1f} {len(engagement_over_time):>11} {legacy_ms:>11.1f} "
+                  f"{render_ms[-1]:>12.1f} {memory:>10} B")
+            if memory != buffer_bytes:
+                failures.append(f"Bộ nhớ ring buffer đổi từ {buffer_bytes} thành {memory} byte")
+
+    _, per_second, totals = dashboard.buffer.snapshot()
+    # Giây hiện tại mới có 1 frame; các giây trước đó phải đúng bằng số học sinh mỗi mức
+    if not np.allclose(per_second[:-1], expected):
+        failures.append(f"Số học sinh trung bình mỗi giây sai: {per_second[-2]} (mong đợi {expected})")
+    if totals.tolist() != counts:
+        failures.append(f"Tổng theo mức độ sai: {totals.tolist()} (mong đợi {counts})")
+    # Lần đầu vẽ nền; các lần sau phải là blit (không vẽ lại trừ khi đổi thang trục y)
+    if dashboard.redraws > 2:
+        failures.append(f"Vẽ lại toàn bộ {dashboard.redraws} lần")
+    if len(render_ms) > 3 and render_ms[-1] > 3 * np.median(render_ms[1:]):
+        failures.append(f"Cập nhật biểu đồ chậm dần: {render_ms[-1]:.1f} ms")
+
+    print(f"\nrecord_frame(): trung bình {np.mean(record_us):.1f} µs, p99 {np.percentile(record_us, 99):.1f} µs; "
+          f"{dashboard.blits} lần blit, {dashboard.redraws} lần vẽ lại nền")
+    for failure in failures:
+        print(f"LỖI {failure}")
+    if failures:
+        sys.exit(1)
+    print("Tất cả kiểm tra đạt")
+
+if __name__ == "__main__":
+    main()
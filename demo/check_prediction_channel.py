@@ -0,0 +1,132 @@
+"""
+Kiểm tra ghép kết quả dự đoán với đúng khuôn mặt khi model chậm (không cần camera / model thật)
+
+Giả lập một lớp học: mỗi học sinh có ảnh khuôn mặt mang mã riêng, thứ tự phát hiện khuôn mặt đổi
+ngẫu nhiên mỗi frame (như Haar cascade), học sinh thỉnh thoảng bị che rồi xuất hiện lại, model giả
+có độ trễ ngẫu nhiên. Mọi nhãn được vẽ phải thuộc đúng học sinh và không cũ hơn max_age_frames.
+In thêm tỉ lệ gán sai của cách cũ (ghép theo thứ tự trong list). Thoát với mã 1 nếu có lỗi.
+
+    python check_prediction_channel.py
+    python check_prediction_channel.py --students 12 --frames 600 --latency-ms 40
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import deque
+import numpy as np
+from face_tracker import FaceTracker
+from prediction_channel import PredictionChannel
+
+def make_predict_batch(latency_ms, calls):
+    """Model giả: trả về mã học sinh đọc từ ảnh, chậm latency_ms (± 50%) mỗi lần gọi"""
+    def predict_batch(face_imgs):
+        calls.append(len(face_imgs))
+        time.sleep(latency_ms / 1000 * random.uniform(0.5, 1.5))
+        return [({'student': int(face_img[0, 0])}, 'neutral') for face_img in face_imgs]
+    return predict_batch
+
+def student_boxes(students, frame_number, occlusion):
+    """Hộp khuôn mặt của các học sinh đang thấy ở frame này (xáo thứ tự, rung nhẹ)"""
+    visible = []
+    for student in range(students):
+        if random.random() < occlusion:
+            continue
+        x = 20 + (student % 6) * 100 + random.randint(-3, 3)
+        y = 40 + (student // 6) * 120 + random.randint(-3, 3)
+        visible.append((student, (x, y, 80, 80)))
+    random.shuffle(visible)
+    return visible
+
+def run_channel(args):
+    """Cách mới: track id + PredictionChannel; trả về (số nhãn đã vẽ, số nhãn sai, tuổi nhãn lớn nhất)"""
+    calls = []
+    tracker = FaceTracker()
+    channel = PredictionChannel(make_predict_batch(args.latency_ms, calls), max_age_frames=args.max_age).start()
+    shown = wrong = oldest = 0
+    try:
+        for frame_number in range(1, args.frames + 1):
+            visible = student_boxes(args.students, frame_number, args.occlusion)
+            owners = {box: student for student, box in visible}
+            tracked, evicted = tracker.update([box for _, box in visible])
+            channel.forget(evicted)
+            for track_id, box in tracked:
+                face_img = np.full((box[3], box[2]), owners[box], dtype=np.uint8)
+                channel.submit(track_id, tracker.frame_number, face_img)
+                result = channel.latest(track_id, tracker.frame_number)
+                if result is not None:
+                    shown += 1
+                    wrong += result.emotions['student'] != owners[box]
+                    oldest = max(oldest, tracker.frame_number - result.frame_number)
+            time.sleep(1 / args.fps)
+    finally:
+        channel.stop()
+    return shown, wrong, oldest, channel.metrics(), calls
+
+def run_legacy(args):
+    """Cách cũ: deque + thread busy-poll, ghép kết quả theo thứ tự trong list khuôn mặt"""
+    prediction_queue, result_queue = deque(maxlen=5), deque(maxlen=5)
+    predict = make_predict_batch(args.latency_ms, [])
+    stop = threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            if prediction_queue:
+                result_queue.append(predict([prediction_queue.popleft()])[0])
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    shown = wrong = 0
+    for frame_number in range(1, args.frames + 1):
+        visible = student_boxes(args.students, frame_number, args.occlusion)
+        current_results = []
+        while result_queue:
+            current_results.append(result_queue.popleft())
+        for i, (student, box) in enumerate(visible):
+            if len(prediction_queue) < 3:
+                prediction_queue.append(np.full((box[3], box[2]), student, dtype=np.uint8))
+            if current_results and i < len(current_results):
+                shown += 1
+                wrong += current_results[i][0]['student'] != student
+        time.sleep(1 / args.fps)
+    stop.set()
+    thread.join(timeout=1)
+    return shown, wrong
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Kiểm tra ghép kết quả dự đoán theo track id")
+    parser.add_argument("--students", type=int, default=8, help="Số học sinh trong khung hình")
+    parser.add_argument("--frames", type=int, default=300, help="Số frame giả lập")
+    parser.add_argument("--fps", type=float, default=60, help="Tốc độ vòng lặp video")
+    parser.add_argument("--latency-ms", type=float, default=30, help="Độ trễ trung bình mỗi lần gọi model")
+    parser.add_argument("--occlusion", type=float, default=0.05, help="Xác suất một học sinh bị che ở mỗi frame")
+    parser.add_argument("--max-age", type=int, default=15, help="Nhãn cũ hơn số frame này không được vẽ")
+    args = parser.parse_args()
+    random.seed(7)
+
+    shown, wrong, oldest, metrics, calls = run_channel(args)
+    print(f"Track id + PredictionChannel: {shown} nhãn đã vẽ, {wrong} nhãn sai học sinh, nhãn cũ nhất {oldest} frame")
+    print(f"     {len(calls)} lần gọi model, trung bình {np.mean(calls):.1f} khuôn mặt mỗi lần; {metrics}")
+    legacy_shown, legacy_wrong = run_legacy(args)
+    print(f"Cách cũ (ghép theo thứ tự):   {legacy_shown} nhãn đã vẽ, {legacy_wrong} nhãn sai học sinh "
+          f"({legacy_wrong / max(legacy_shown, 1):.0%})")
+
+    failures = []
+    if shown == 0:
+        failures.append("Không có nhãn nào được vẽ")
+    if wrong:
+        failures.append(f"{wrong} nhãn gán sai học sinh")
+    if oldest > args.max_age:
+        failures.append(f"Nhãn cũ {oldest} frame vượt max_age {args.max_age}")
+    for failure in failures:
+        print(f"LỖI {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nTất cả kiểm tra đạt")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Kiểm tra chuỗi frame theo track cho model CK+ (không cần camera / model thật)
+
+Giả lập nhiều học sinh, mỗi ảnh khuôn mặt mang mã (học sinh, frame). Kiểm tra:
+- chuỗi của mỗi track chỉ gồm frame của đúng học sinh đó, theo thứ tự cũ -> mới, và với một học sinh
+  giống hệt cách cũ (một buffer dùng chung, lặp frame đầu khi chưa đủ 10 frame);
+- mỗi frame chỉ gọi model một lần với batch (T, 10, 48, 48, 1);
+- track biến mất bị bỏ và mảng được dùng lại (số mảng cấp phát không tăng theo thời gian).
+In thêm tỉ lệ chuỗi bị trộn khuôn mặt của cách cũ. Nếu có TensorFlow, đo thêm thời gian model CNN-LSTM
+(trọng số ngẫu nhiên) khi gộp batch so với gọi riêng từng khuôn mặt. Thoát với mã 1 nếu có lỗi.
+
+    python check_sequence_buffers.py
+    python check_sequence_buffers.py --students 8 --frames 300 --model-timing
+"""
+
+import sys
+import time
+import random
+import argparse
+import numpy as np
+from face_tracker import FaceTracker
+from sequence_buffers import SequenceBuffers
+
+NUM_FRAMES = 10
+
+def encode(student, frame_number):
+    """Ảnh đã tiền xử lý giả (48, 48, 1) mang mã học sinh ở pixel [0, 0] và số frame ở pixel [0, 1]"""
+    frame = np.zeros((48, 48, 1), dtype=np.float32)
+    frame[0, 0, 0] = student
+    frame[0, 1, 0] = frame_number
+    return frame
+
+def legacy_sequence(frame_buffer, face_img):
+    """Cách cũ: một buffer dùng chung cho mọi khuôn mặt, lặp frame đầu khi chưa đủ"""
+    frame_buffer.append(face_img)
+    if len(frame_buffer) > NUM_FRAMES:
+        del frame_buffer[:-NUM_FRAMES]
+    while len(frame_buffer) < NUM_FRAMES:
+        frame_buffer.insert(0, frame_buffer[0])
+    return np.expand_dims(np.array(frame_buffer), axis=0)
+
+def student_boxes(students, occlusion):
+    """Hộp khuôn mặt của các học sinh đang thấy (xáo thứ tự, có lúc bị che)"""
+    visible = []
+    for student in range(students):
+        if random.random() < occlusion:
+            continue
+        x = 20 + (student % 6) * 100 + random.randint(-3, 3)
+        y = 40 + (student // 6) * 120 + random.randint(-3, 3)
+        visible.append((student, (x, y, 80, 80)))
+    random.shuffle(visible)
+    return visible
+
+def check_single_face(failures):
+    """Một học sinh: chuỗi phải giống hệt cách cũ"""
+    buffers = SequenceBuffers(NUM_FRAMES)
+    legacy_buffer = []
+    for frame_number in range(25):
+        face_img = encode(0, frame_number)
+        buffers.push(1, face_img)
+        expected = legacy_sequence(legacy_buffer, face_img)
+        if not np.array_equal(buffers.batch([1]), expected):
+            failures.append(f"Frame {frame_number}: chuỗi một học sinh khác cách cũ")
+            return
+
+def check_classroom(args, failures):
+    """Nhiều học sinh: mỗi chuỗi chỉ của một học sinh, cũ -> mới, một lần gọi model mỗi frame"""
+    tracker = FaceTracker()
+    buffers = SequenceBuffers(NUM_FRAMES)
+    owners = {}
+    model_calls = []
+    peak_tracks = 0
+    mixed = 0
+    for frame_number in range(1, args.frames + 1):
+        visible = student_boxes(args.students, args.occlusion)
+        # Thỉnh thoảng cả lớp bị che lâu hơn max_missed (đổi góc máy): mọi track bị bỏ rồi tạo lại
+        if frame_number % 100 >= 80:
+            visible = []
+        student_of_box = {box: student for student, box in visible}
+        tracked, evicted = tracker.update([box for _, box in visible])
+        buffers.evict(evicted)
+        if len(buffers) > tracker.active_tracks():
+            failures.append(f"Frame {frame_number}: {len(buffers)} chuỗi cho {tracker.active_tracks()} track")
+        if not tracked:
+            continue
+
+        track_ids = [track_id for track_id, _ in tracked]
+        for track_id, box in tracked:
+            student = student_of_box[box]
+            owners.setdefault(track_id, student)
+            buffers.push(track_id, encode(student, frame_number))
+        batch = buffers.batch(track_ids)
+        model_calls.append(batch.shape)
+        peak_tracks = max(peak_tracks, len(buffers))
+
+        for track_id, sequence in zip(track_ids, batch):
+            students = set(sequence[:, 0, 0, 0].astype(int).tolist())
+            frames = sequence[:, 0, 1, 0]
+            if students != {owners[track_id]}:
+                mixed += 1
+            if np.any(np.diff(frames) < 0) or frames[-1] != frame_number:
+                failures.append(f"Frame {frame_number}: chuỗi track {track_id} sai thứ tự")
+                return
+
+    if mixed:
+        failures.append(f"{mixed} chuỗi trộn khuôn mặt của học sinh khác")
+    if any(shape[1:] != (NUM_FRAMES, 48, 48, 1) for shape in model_calls):
+        failures.append("Batch sai kích thước")
+    if buffers.allocated > peak_tracks:
+        failures.append(f"Cấp phát {buffers.allocated} mảng cho tối đa {peak_tracks} track cùng lúc")
+    return len(model_calls), float(np.mean([shape[0] for shape in model_calls])), buffers.allocated, peak_tracks
+
+def legacy_mixed_ratio(args):
+    """Tỉ lệ chuỗi bị trộn khuôn mặt khi dùng một buffer chung (cách cũ)"""
+    frame_buffer = []
+    sequences = mixed = 0
+    for frame_number in range(1, args.frames + 1):
+        for student, _ in student_boxes(args.students, args.occlusion):
+            sequence = legacy_sequence(frame_buffer, encode(student, frame_number))
+            sequences += 1
+            mixed += len(set(sequence[0, :, 0, 0, 0].astype(int).tolist())) > 1
+    return mixed / max(sequences, 1)
+
+def model_timing(max_students, repeats):
+    """Thời gian (ms) model CNN-LSTM: gộp batch T khuôn mặt vs gọi T lần (cần TensorFlow)"""
+    try:
+        from emotion_models import create_cnn_lstm_model
+        model = create_cnn_lstm_model()
+    except ImportError as e:
+        print(f"Bỏ qua đo model CNN-LSTM (thiếu TensorFlow: {e})")
+        return
+    sequences = np.random.rand(max_students, NUM_FRAMES, 48, 48, 1).astype(np.float32)
+    model.predict(sequences[:1], verbose=0)
+    print(f"\n{'Số học sinh':>12} {'Gộp batch (ms)':>15} {'Từng khuôn mặt (ms)':>20}")
+    for students in sorted({1, 2, 4, max_students}):
+        batch = sequences[:students]
+        model.predict(batch, verbose=0)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            model.predict(batch, verbose=0)
+        batched_ms = (time.perf_counter() - started) * 1000 / repeats
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(students):
+                model.predict(batch[i:i + 1], verbose=0)
+        single_ms = (time.perf_counter() - started) * 1000 / repeats
+        print(f"{students:>12} {batched_ms:>15.1f} {single_ms:>20.1f}")
+
+def main():
+    """Hàm chính"""
+    parser = argparse.ArgumentParser(description="Kiểm tra chuỗi frame theo track cho model CK+")
+    parser.add_argument("--students", type=int, default=6, help="Số học sinh trong khung hình")
+    parser.add_argument("--frames", type=int, default=400, help="Số frame giả lập")
+    parser.add_argument("--occlusion", type=float, default=0.05, help="Xác suất một học sinh bị che ở mỗi frame")
+    parser.add_argument("--model-timing", action="store_true", help="Đo thêm model CNN-LSTM thật (cần TensorFlow)")
+    parser.add_argument("--repeats", type=int, default=10, help="Số lần lặp khi đo model")
+    args = parser.parse_args()
+    random.seed(7)
+
+    failures = []
+    check_single_face(failures)
+    result = check_classroom(args, failures)
+    if result is not None:
+        calls, mean_batch, allocated, peak_tracks = result
+        print(f"Chuỗi theo track: {calls} lần gọi model (1 lần mỗi frame có khuôn mặt), "
+              f"trung bình {mean_batch:.1f} khuôn mặt mỗi batch; {allocated} mảng cấp phát, "
+              f"tối đa {peak_tracks} track cùng lúc")
+    print(f"Cách cũ (buffer dùng chung): {legacy_mixed_ratio(args):.0%} chuỗi trộn khuôn mặt của học sinh khác")
+    if args.model_timing:
+        model_timing(args.students, args.repeats)
+
+    for failure in failures:
+        print(f"LỖI {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nTất cả kiểm tra đạt")
+
+if __name__ == "__main__":
+    main()
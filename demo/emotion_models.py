@@ -0,0 +1,217 @@
+import os
+import cv2
+import numpy as np
+from sequence_buffers import SequenceBuffers
+
+# Thư mục model mặc định (tính từ thư mục demo, không phụ thuộc thư mục đang chạy lệnh)
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+# Định nghĩa các cảm xúc
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Tham số phát hiện khuôn mặt: default (chính xác) và fast (bản tối ưu cũ)
+DETECTOR_PRESETS = {
+    'default': {'scaleFactor': 1.1, 'minNeighbors': 5, 'minSize': (30, 30)},
+    'fast': {'scaleFactor': 1.05, 'minNeighbors': 3, 'minSize': (40, 40), 'maxSize': (300, 300)},
+}
+
+def load_face_cascade(models_dir=MODELS_DIR):
+    """Tải Haar cascade phát hiện khuôn mặt: ưu tiên file trong models_dir, sau đó file đi kèm OpenCV"""
+    candidates = [os.path.join(models_dir, 'haarcascade_frontalface_default.xml')]
+    if hasattr(cv2, 'data'):
+        candidates.append(os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'))
+    for cascade_path in candidates:
+        if os.path.exists(cascade_path):
+            face_cascade = cv2.CascadeClassifier(cascade_path)
+            if not face_cascade.empty():
+                return face_cascade
+    raise RuntimeError(f"Không tìm thấy haarcascade_frontalface_default.xml trong {models_dir}")
+
+def preprocess_face(face_img):
+    """Tiền xử lý ảnh khuôn mặt cho model -> (48, 48, 1) float32"""
+    # Resize về 48x48 (kích thước input của model)
+    face_img = cv2.resize(face_img, (48, 48), interpolation=cv2.INTER_AREA)
+
+    # Chuyển sang grayscale
+    if len(face_img.shape) == 3:
+        face_img = cv2.cvtColor(face_img, cv2.COLOR_RGB2GRAY)
+
+    # Normalize pixel values và thêm kênh (48, 48, 1)
+    face_img = face_img.astype('float32') / 255.0
+    return np.expand_dims(face_img, axis=-1)
+
+def scores_to_result(emotion_scores):
+    """Điểm softmax -> (dict phần trăm theo cảm xúc giống DeepFace, cảm xúc chủ đạo)"""
+    dominant_emotion = EMOTIONS[int(np.argmax(emotion_scores))]
+    emotions_dict = {emotion: float(score) * 100 for emotion, score in zip(EMOTIONS, emotion_scores)}
+    return emotions_dict, dominant_emotion
+
+class StaticEmotionModel:
+    """Model CNN ảnh tĩnh (FER2013): cấu trúc JSON + weights H5"""
+
+    name = 'static'
+
+    def __init__(self, models_dir=MODELS_DIR):
+        self.models_dir = models_dir
+        self.model = None
+
+    def load(self):
+        """Load model từ file JSON và weights H5; lỗi thì raise RuntimeError"""
+        from keras.models import model_from_json
+
+        structure_path = os.path.join(self.models_dir, 'facial_expression_model_structure.json')
+        weights_path = os.path.join(self.models_dir, 'facial_expression_model_weights.h5')
+        try:
+            with open(structure_path, 'r') as f:
+                self.model = model_from_json(f.read())
+            self.model.load_weights(weights_path)
+        except Exception as e:
+            raise RuntimeError(f"Error loading model from {self.models_dir}: {e}") from e
+        print(f"Model loaded successfully from {self.models_dir}")
+        return self
+
+    def predict_batch(self, face_imgs):
+        """Dự đoán cảm xúc cho nhiều khuôn mặt trong một lần gọi model; list (emotions, dominant_emotion)"""
+        if not face_imgs:
+            return []
+        batch = np.stack([preprocess_face(face_img) for face_img in face_imgs])
+        predictions = self.model.predict(batch, verbose=0)
+        return [scores_to_result(emotion_scores) for emotion_scores in predictions]
+
+    def predict_faces(self, track_ids, face_imgs):
+        """Dự đoán cho các khuôn mặt của một frame (ảnh tĩnh không cần track id)"""
+        return self.predict_batch(face_imgs)
+
+    def forget(self, track_ids):
+        """Model ảnh tĩnh không giữ trạng thái theo track"""
+
+def create_cnn_lstm_model():
+    """Tạo model CNN-LSTM với cấu trúc chính xác từ model gốc"""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import InputLayer, TimeDistributed, Conv2D, MaxPooling2D, BatchNormalization, Dropout, Flatten, LSTM, Dense
+    from tensorflow.keras.initializers import GlorotUniform, Zeros, Ones, Orthogonal
+
+    model = Sequential()
+
+    # Input layer - 10 frames, 48x48x1
+    model.add(InputLayer(input_shape=(10, 48, 48, 1), name='input_layer'))
+
+    # TimeDistributed CNN layers - chính xác như model gốc
+    model.add(TimeDistributed(Conv2D(32, (3, 3), activation='relu',
+                                    kernel_initializer=GlorotUniform(),
+                                    bias_initializer=Zeros()), name='time_distributed'))
+    model.add(TimeDistributed(MaxPooling2D((2, 2)), name='time_distributed_1'))
+    model.add(TimeDistributed(BatchNormalization(axis=-1, momentum=0.99, epsilon=0.001,
+                                                center=True, scale=True,
+                                                beta_initializer=Zeros(),
+                                                gamma_initializer=Ones()), name='time_distributed_2'))
+    model.add(TimeDistributed(Dropout(0.3), name='time_distributed_3'))
+
+    model.add(TimeDistributed(Conv2D(64, (3, 3), activation='relu',
+                                    kernel_initializer=GlorotUniform(),
+                                    bias_initializer=Zeros()), name='time_distributed_4'))
+    model.add(TimeDistributed(MaxPooling2D((2, 2)), name='time_distributed_5'))
+    model.add(TimeDistributed(BatchNormalization(axis=-1, momentum=0.99, epsilon=0.001,
+                                                center=True, scale=True,
+                                                beta_initializer=Zeros(),
+                                                gamma_initializer=Ones()), name='time_distributed_6'))
+    model.add(TimeDistributed(Flatten(), name='time_distributed_7'))
+
+    # LSTM layer - chính xác như model gốc
+    model.add(LSTM(128, activation='tanh', recurrent_activation='sigmoid',
+                   kernel_initializer=GlorotUniform(),
+                   recurrent_initializer=Orthogonal(),
+                   bias_initializer=Zeros(),
+                   unit_forget_bias=True,
+                   dropout=0.0, recurrent_dropout=0.0,
+                   name='lstm'))
+
+    # Dropout layer
+    model.add(Dropout(0.5, name='dropout_1'))
+
+    # Output layer
+    model.add(Dense(7, activation='softmax',
+                   kernel_initializer=GlorotUniform(),
+                   bias_initializer=Zeros(),
+                   name='dense'))
+
+    return model
+
+class SequenceEmotionModel:
+    """Model CNN-LSTM chuỗi 10 frame (CK+): chuỗi riêng cho từng track, một lần gọi model mỗi frame"""
+
+    name = 'sequence'
+    NUM_FRAMES = 10
+
+    def __init__(self, models_dir=MODELS_DIR):
+        self.models_dir = models_dir
+        self.model = None
+        # Chuỗi 10 frame liên tiếp của từng khuôn mặt (theo track id)
+        self.buffers = SequenceBuffers(self.NUM_FRAMES)
+
+    def load(self):
+        """Load model CK+ từ file H5 (thử nhiều cách vì khác phiên bản Keras); lỗi thì raise RuntimeError"""
+        from keras.models import load_model
+        import tensorflow as tf
+
+        model_path = os.path.join(self.models_dir, 'model_final_cnn_lstm_CK+.h5')
+        if os.path.exists(model_path):
+            # Thử nhiều cách load khác nhau để xử lý vấn đề compatibility
+            loading_strategies = [
+                lambda: load_model(model_path, compile=False),
+                lambda: load_model(model_path, compile=False, custom_objects={}),
+                lambda: load_model(model_path, compile=False, options=tf.saved_model.LoadOptions(experimental_io_device='/job:localhost')),
+                lambda: tf.keras.models.load_model(model_path, compile=False),
+            ]
+            for i, strategy in enumerate(loading_strategies):
+                try:
+                    self.model = strategy()
+                    print(f"Model loaded successfully from {model_path} using strategy {i+1}")
+                    return self
+                except Exception as e:
+                    print(f"Strategy {i+1} failed: {e}")
+
+            # Thử tạo model mới với cấu trúc tương tự và load weights
+            try:
+                print("Trying to create model manually and load weights...")
+                self.model = create_cnn_lstm_model()
+                self.model.load_weights(model_path, by_name=True, skip_mismatch=True)
+                print("Model created manually and weights loaded successfully")
+                return self
+            except Exception as e:
+                raise RuntimeError(f"Manual model creation failed: {e}") from e
+        print(f"Model file not found at {model_path}")
+
+        # Fallback: thử load model khác
+        alternative_path = os.path.join(self.models_dir, 'model_final_cnn_lstm_CK+_120.h5')
+        if not os.path.exists(alternative_path):
+            raise RuntimeError(f"No CK+ model files found in {self.models_dir}")
+        try:
+            self.model = load_model(alternative_path, compile=False)
+        except Exception as e:
+            raise RuntimeError(f"Error loading alternative model: {e}") from e
+        print(f"Alternative model loaded successfully from {alternative_path}")
+        return self
+
+    def predict_faces(self, track_ids, face_imgs):
+        """Dự đoán cho các khuôn mặt của một frame; list (emotions, dominant_emotion)
+
+        Mỗi khuôn mặt thêm frame vào chuỗi của track mình, sau đó chuỗi của mọi khuôn mặt trong frame
+        được gộp thành một batch (T, 10, 48, 48, 1) cho một lần gọi model.
+        """
+        if not face_imgs:
+            return []
+        for track_id, face_img in zip(track_ids, face_imgs):
+            self.buffers.push(track_id, preprocess_face(face_img))
+        predictions = self.model.predict(self.buffers.batch(track_ids), verbose=0)
+        return [scores_to_result(emotion_scores) for emotion_scores in predictions]
+
+    def forget(self, track_ids):
+        """Bỏ chuỗi của các khuôn mặt đã rời khung hình"""
+        self.buffers.evict(track_ids)
+
+# Model theo tên dùng trong dòng lệnh
+EMOTION_MODELS = {
+    StaticEmotionModel.name: StaticEmotionModel,
+    SequenceEmotionModel.name: SequenceEmotionModel,
+}
@@ -0,0 +1,216 @@
+import time
+import threading
+import cv2
+import numpy as np
+
+# Mức độ tham gia theo thứ tự vẽ (dưới lên trên) và màu tương ứng
+ENGAGEMENT_LEVELS = ['Không tích cực', 'Tích cực', 'Rất tích cực']
+ENGAGEMENT_COLORS = ['blue', 'orange', 'green']
+
+class EngagementRingBuffer:
+    """Số học sinh theo mức độ tham gia của từng giây trong window_seconds giây gần nhất
+
+    Bộ nhớ cố định (mảng window_seconds x 3) dù buổi học kéo dài bao lâu; totals giữ tổng số lần
+    nhận diện theo mức độ từ đầu buổi cho biểu đồ tròn. clock là hàm trả về thời gian tính bằng giây
+    (thay bằng đồng hồ giả khi giả lập).
+    """
+
+    def __init__(self, window_seconds=120, clock=time.monotonic):
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._sums = np.zeros((window_seconds, len(ENGAGEMENT_LEVELS)), dtype=np.int64)
+        self._frames = np.zeros(window_seconds, dtype=np.int64)
+        self._started = clock()
+        self._second = 0
+        self.totals = np.zeros(len(ENGAGEMENT_LEVELS), dtype=np.int64)
+
+    def _advance(self, second):
+        """Xóa các ô của những giây đã quay vòng khi thời gian tiến tới second"""
+        if second <= self._second:
+            return
+        for skipped in range(self._second + 1, min(second, self._second + self.window_seconds) + 1):
+            slot = skipped % self.window_seconds
+            self._sums[slot] = 0
+            self._frames[slot] = 0
+        self._second = second
+
+    def record_frame(self, engagements):
+        """Ghi mức độ tham gia của các khuôn mặt trong một frame"""
+        second = int(self._clock() - self._started)
+        self._advance(second)
+        slot = second % self.window_seconds
+        self._frames[slot] += 1
+        for engagement in engagements:
+            level = ENGAGEMENT_LEVELS.index(engagement)
+            self._sums[slot, level] += 1
+            self.totals[level] += 1
+
+    def snapshot(self):
+        """(giây hiện tại, số học sinh trung bình mỗi frame theo mức độ (window x 3, cũ -> mới), totals)"""
+        second = int(self._clock() - self._started)
+        self._advance(second)
+        order = (np.arange(second + 1, second + 1 + self.window_seconds)) % self.window_seconds
+        frames = np.maximum(self._frames[order], 1)[:, np.newaxis]
+        return second, (self._sums[order] / frames).astype(np.float32), self.totals.copy()
+
+
+def _stack_vertices(x, lower, upper):
+    """Đỉnh đa giác của một lớp trong biểu đồ miền chồng"""
+    return np.concatenate([np.column_stack([x, upper]), np.column_stack([x[::-1], lower[::-1]])])
+
+class EngagementDashboard:
+    """Biểu đồ mức độ tham gia vẽ trong thread riêng, không chiếm thời gian của vòng lặp video
+
+    - Vòng lặp video chỉ gọi record_frame() (cộng vào ring buffer kích thước cố định, vài micro giây).
+    - Thread biểu đồ mỗi refresh_seconds lấy snapshot, cập nhật đỉnh của các lớp stackplot và góc của
+      các miếng pie có sẵn rồi blit lên nền tĩnh đã vẽ một lần (backend Agg, không cần GUI event loop
+      của matplotlib); trục, nhãn, chú thích chỉ vẽ lại khi phải đổi thang trục y.
+    - latest_image() trả về ảnh BGR mới nhất để main thread hiển thị bằng cv2.imshow như frame video.
+    """
+
+    def __init__(self, window_seconds=120, refresh_seconds=1.0, title_suffix='', clock=time.monotonic):
+        self.buffer = EngagementRingBuffer(window_seconds, clock)
+        self.refresh_seconds = refresh_seconds
+        self.title_suffix = title_suffix
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._image = None
+        self._image_version = 0
+        self._shown_version = 0
+        self.redraws = 0
+        self.blits = 0
+        self._build_figure()
+
+    def _build_figure(self):
+        """Tạo figure và các artist một lần; các lần cập nhật sau chỉ đổi dữ liệu của chúng"""
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        window_seconds = self.buffer.window_seconds
+        self._fig = Figure(figsize=(12, 6))
+        self._canvas = FigureCanvasAgg(self._fig)
+        self._ax1, self._ax2 = self._fig.subplots(1, 2)
+        self._x = np.arange(-window_seconds + 1, 1, dtype=np.float32)
+        self._zeros = np.zeros(window_seconds, dtype=np.float32)
+        self._y_max = 5
+
+        self._ax1.set_title(f'Biểu đồ mức độ tham gia{self.title_suffix}')
+        self._ax1.set_xlabel(f'Thời gian (giây, {window_seconds} giây gần nhất)')
+        self._ax1.set_ylabel('Số học sinh tham gia')
+        self._ax1.set_xlim(self._x[0], self._x[-1])
+        self._ax1.set_ylim(0, self._y_max)
+        self._layers = self._ax1.stackplot(self._x, self._zeros, self._zeros, self._zeros,
+                                           labels=ENGAGEMENT_LEVELS, colors=ENGAGEMENT_COLORS)
+        self._ax1.legend(loc='upper left')
+
+        self._ax2.set_title(f'Biểu đồ phân bố học sinh{self.title_suffix}')
+        self._wedges, self._labels, self._percents = self._ax2.pie(
+            [1, 1, 1], labels=ENGAGEMENT_LEVELS, autopct='%1.2f%%', colors=ENGAGEMENT_COLORS
+        )
+        self._empty_text = self._ax2.text(0.5, 0.5, 'Chưa có dữ liệu', ha='center', va='center',
+                                          transform=self._ax2.transAxes)
+        self._animated = (list(self._layers) + list(self._wedges) + list(self._labels)
+                          + list(self._percents) + [self._empty_text])
+        self._fig.tight_layout()
+        self._background = None
+
+    def _full_redraw(self):
+        """Vẽ nền tĩnh (trục, nhãn, chú thích) không kèm các artist động và lưu lại để blit"""
+        for artist in self._animated:
+            artist.set_animated(True)
+        self._canvas.draw()
+        self._background = self._canvas.copy_from_bbox(self._fig.bbox)
+        self.redraws += 1
+
+    def _update_artists(self, counts, totals):
+        """Cập nhật dữ liệu của các artist có sẵn; True nếu phải vẽ lại nền (đổi thang trục y)"""
+        cumulative = np.cumsum(counts, axis=1)
+        lower = self._zeros
+        for level, layer in enumerate(self._layers):
+            layer.set_verts([_stack_vertices(self._x, lower, cumulative[:, level])])
+            lower = cumulative[:, level]
+
+        rescale = False
+        peak = float(cumulative[:, -1].max())
+        if peak > self._y_max or (self._y_max > 5 and peak < self._y_max / 4):
+            self._y_max = max(5, int(peak * 1.5) + 1)
+            self._ax1.set_ylim(0, self._y_max)
+            rescale = True
+
+        total = int(totals.sum())
+        self._empty_text.set_visible(total == 0)
+        theta = 0.0
+        for level, (wedge, label, percent) in enumerate(zip(self._wedges, self._labels, self._percents)):
+            fraction = totals[level] / total if total else 0.0
+            middle = np.deg2rad(theta + 180 * fraction)
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + 360 * fraction)
+            label.set_position((1.1 * np.cos(middle), 1.1 * np.sin(middle)))
+            label.set_horizontalalignment('left' if np.cos(middle) >= 0 else 'right')
+            percent.set_position((0.6 * np.cos(middle), 0.6 * np.sin(middle)))
+            percent.set_text(f'{fraction * 100:.2f}%')
+            for artist in (wedge, label, percent):
+                artist.set_visible(fraction > 0)
+            theta += 360 * fraction
+        return rescale
+
+    def _render(self):
+        """Lấy snapshot, cập nhật artist và blit; trả về ảnh BGR của toàn bộ biểu đồ"""
+        with self._lock:
+            _, counts, totals = self.buffer.snapshot()
+        if self._update_artists(counts, totals) or self._background is None:
+            self._full_redraw()
+        self._canvas.restore_region(self._background)
+        for artist in self._animated:
+            artist.axes.draw_artist(artist)
+        self.blits += 1
+        return cv2.cvtColor(np.asarray(self._canvas.buffer_rgba()), cv2.COLOR_RGBA2BGR)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                image = self._render()
+            except Exception as e:
+                print(f"Error updating engagement charts: {e}")
+            else:
+                with self._lock:
+                    self._image = image
+                    self._image_version += 1
+            self._stop.wait(max(0.0, self.refresh_seconds - (time.monotonic() - started)))
+
+    def start(self):
+        """Khởi động thread vẽ biểu đồ"""
+        self._thread = threading.Thread(target=self._worker, name="engagement-dashboard", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Dừng thread vẽ biểu đồ"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def record_frame(self, engagements):
+        """Ghi mức độ tham gia của các khuôn mặt trong frame (gọi từ vòng lặp video)"""
+        with self._lock:
+            self.buffer.record_frame(engagements)
+
+    def latest_image(self):
+        """Ảnh biểu đồ mới nhất nếu có ảnh mới từ lần gọi trước, ngược lại None (không cần imshow lại)"""
+        with self._lock:
+            if self._image is None or self._image_version == self._shown_version:
+                return None
+            self._shown_version = self._image_version
+            return self._image
+
+    def save(self, path):
+        """Lưu biểu đồ với dữ liệu mới nhất ra file ảnh (gọi sau stop())"""
+        with self._lock:
+            _, counts, totals = self.buffer.snapshot()
+        self._update_artists(counts, totals)
+        for artist in self._animated:
+            artist.set_animated(False)
+        self._fig.savefig(path)
@@ -0,0 +1,64 @@
+import itertools
+
+def box_iou(box_a, box_b):
+    """IoU của hai hộp (x, y, w, h)"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+class FaceTracker:
+    """Gán track id ổn định cho khuôn mặt giữa các frame bằng ghép IoU tham lam
+
+    Học sinh ngồi gần như cố định nên hộp khuôn mặt giữa hai frame liên tiếp chồng lên nhau nhiều;
+    hộp mới không khớp track nào (IoU < min_iou) tạo track mới. Track không thấy quá max_missed frame
+    bị bỏ và được trả về trong evicted để nơi khác dọn dữ liệu theo track (kết quả, buffer chuỗi).
+    """
+
+    def __init__(self, min_iou=0.3, max_missed=15):
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.frame_number = 0
+        self._tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """Cập nhật với các hộp khuôn mặt của frame mới; trả về ([(track_id, box)], [track id bị bỏ])"""
+        self.frame_number += 1
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        pairs = sorted(
+            ((box_iou(track['box'], box), track_id, index)
+             for track_id, track in self._tracks.items() for index, box in enumerate(boxes)),
+            reverse=True
+        )
+        assigned = {}
+        used_tracks = set()
+        for iou, track_id, index in pairs:
+            if iou < self.min_iou:
+                break
+            if track_id in used_tracks or index in assigned:
+                continue
+            assigned[index] = track_id
+            used_tracks.add(track_id)
+
+        tracked = []
+        for index, box in enumerate(boxes):
+            track_id = assigned.get(index)
+            if track_id is None:
+                track_id = next(self._ids)
+            self._tracks[track_id] = {'box': box, 'last_seen': self.frame_number}
+            tracked.append((track_id, box))
+
+        evicted = [track_id for track_id, track in self._tracks.items()
+                   if self.frame_number - track['last_seen'] > self.max_missed]
+        for track_id in evicted:
+            del self._tracks[track_id]
+        return tracked, evicted
+
+    def active_tracks(self):
+        """Số track đang theo dõi"""
+        return len(self._tracks)
@@ -0,0 +1,242 @@
+import time
+import queue
+import threading
+from collections import deque, defaultdict
+import numpy as np
+
+# Đánh dấu hết nguồn video (truyền qua các hàng đợi để các giai đoạn sau dừng theo)
+END_OF_STREAM = None
+
+class FpsCounter:
+    """Đếm FPS thực tế trong cửa sổ trượt vài giây, kèm thời gian xử lý trung bình mỗi lần"""
+
+    def __init__(self, window_seconds=2.0):
+        self.window_seconds = window_seconds
+        self._ticks = deque()
+        self._durations = deque()
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def tick(self, duration=None):
+        """Ghi nhận một frame xong ở giai đoạn này (duration: thời gian xử lý, giây)"""
+        now = time.perf_counter()
+        with self._lock:
+            self._ticks.append(now)
+            if duration is not None:
+                self._durations.append((now, duration))
+            self.total += 1
+            while self._ticks and now - self._ticks[0] > self.window_seconds:
+                self._ticks.popleft()
+            while self._durations and now - self._durations[0][0] > self.window_seconds:
+                self._durations.popleft()
+
+    def fps(self):
+        """FPS trong cửa sổ gần nhất (0 nếu chưa đủ 2 frame)"""
+        with self._lock:
+            if len(self._ticks) < 2:
+                return 0.0
+            elapsed = self._ticks[-1] - self._ticks[0]
+            return (len(self._ticks) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def mean_ms(self):
+        """Thời gian xử lý trung bình (ms) trong cửa sổ gần nhất"""
+        with self._lock:
+            if not self._durations:
+                return 0.0
+            return sum(duration for _, duration in self._durations) * 1000 / len(self._durations)
+
+class LatencyStats:
+    """Thời gian xử lý của từng giai đoạn trong cả lần chạy (cho chế độ benchmark)
+
+    Giữ mọi mẫu để tính phân vị nên chỉ dùng khi chạy nguồn hữu hạn (file video, thư mục ảnh).
+    """
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """Ghi một mẫu thời gian (giây) của giai đoạn stage"""
+        with self._lock:
+            self._samples[stage].append(seconds)
+
+    def summary(self):
+        """{giai đoạn: số mẫu, trung bình / p50 / p95 / lớn nhất tính bằng ms}"""
+        with self._lock:
+            samples = {stage: np.array(values) * 1000 for stage, values in self._samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(np.percentile(values, 50)),
+                'p95_ms': float(np.percentile(values, 95)),
+                'max_ms': float(values.max()),
+            }
+            for stage, values in samples.items()
+        }
+
+def put_latest(target_queue, item):
+    """Đưa item vào hàng đợi có giới hạn, bỏ item cũ nhất nếu đầy; trả về số item bị bỏ"""
+    dropped = 0
+    while True:
+        try:
+            target_queue.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                target_queue.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+class Pipeline:
+    """Chạy demo theo 3 giai đoạn song song: capture -> inference -> render
+
+    - Capture (thread riêng): đọc frame liên tục; với webcam (drop_frames=True) chỉ giữ frame mới nhất,
+      inference chậm không làm camera bị nghẽn hay trễ dần.
+    - Inference (thread riêng): nhận frame qua hàng đợi có giới hạn, gọi infer(frame) -> kết quả.
+    - Render (thread gọi run, thường là main thread vì cv2.imshow / matplotlib cần): gọi
+      render(frame_number, frame, result); trả về False để dừng.
+
+    Mỗi giai đoạn có FpsCounter riêng; fps_text() cho dòng FPS đo thực tế để vẽ lên frame.
+    Với file video / thư mục ảnh dùng drop_frames=False để xử lý đủ mọi frame. Truyền latency
+    (LatencyStats) để ghi thời gian từng giai đoạn và độ trễ từ lúc đọc frame tới lúc hiển thị xong.
+    """
+
+    def __init__(self, source, infer, render, queue_size=2, drop_frames=True, latency=None):
+        self.source = source
+        self.infer = infer
+        self.render = render
+        self.drop_frames = drop_frames
+        self._frames = queue.Queue(maxsize=1 if drop_frames else queue_size)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+        self.capture_fps = FpsCounter()
+        self.inference_fps = FpsCounter()
+        self.render_fps = FpsCounter()
+        self.latency = latency
+        self.dropped_frames = 0
+        self.error = None
+        self._started_at = None
+        self._finished_at = None
+
+    def _put(self, target_queue, item):
+        """Đưa item vào hàng đợi: bỏ item cũ nếu drop_frames, ngược lại chờ (vẫn thoát được khi stop)"""
+        if self.drop_frames and item is not END_OF_STREAM:
+            self.dropped_frames += put_latest(target_queue, item)
+            return
+        while not self._stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if item is END_OF_STREAM and self.drop_frames:
+                    # Hết nguồn: bỏ frame đang chờ để chắc chắn gửi được tín hiệu dừng
+                    put_latest(target_queue, item)
+                    return
+
+    def _capture_loop(self):
+        frame_number = 0
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+                frame_number += 1
+                captured_at = time.perf_counter()
+                self.capture_fps.tick(captured_at - started)
+                self._record('capture', captured_at - started)
+                self._put(self._frames, (frame_number, frame, captured_at))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._frames, END_OF_STREAM)
+
+    def _inference_loop(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self._frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is END_OF_STREAM:
+                    break
+                frame_number, frame, captured_at = item
+                started = time.perf_counter()
+                result = self.infer(frame)
+                duration = time.perf_counter() - started
+                self.inference_fps.tick(duration)
+                self._record('inference', duration)
+                self._put(self._results, (frame_number, frame, result, captured_at))
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._results, END_OF_STREAM)
+
+    def _record(self, stage, seconds):
+        if self.latency is not None:
+            self.latency.record(stage, seconds)
+
+    def run(self):
+        """Chạy tới khi hết nguồn, render trả về False hoặc stop(); trả về thống kê FPS"""
+        self._started_at = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        try:
+            while not self._stop.is_set():
+                try:
+                    item = self._results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is END_OF_STREAM:
+                    break
+                frame_number, frame, result, captured_at = item
+                started = time.perf_counter()
+                keep_running = self.render(frame_number, frame, result)
+                finished = time.perf_counter()
+                self.render_fps.tick(finished - started)
+                self._record('render', finished - started)
+                self._record('end_to_end', finished - captured_at)
+                if keep_running is False:
+                    break
+        finally:
+            self._finished_at = time.perf_counter()
+            self.stop()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    def stop(self):
+        """Dừng các giai đoạn và chờ thread kết thúc"""
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+
+    def fps_text(self):
+        """Dòng FPS đo thực tế của từng giai đoạn (chỉ ký tự ASCII vì được vẽ bằng cv2.putText)"""
+        return (f'Camera {self.capture_fps.fps():.1f} | Inference {self.inference_fps.fps():.1f} '
+                f'| Render {self.render_fps.fps():.1f} FPS')
+
+    def stats(self):
+        """Thống kê của từng giai đoạn; end_to_end_fps là số frame hiển thị chia tổng thời gian chạy"""
+        elapsed = 0.0
+        if self._started_at is not None:
+            elapsed = (self._finished_at or time.perf_counter()) - self._started_at
+        return {
+            'capture': {'frames': self.capture_fps.total, 'fps': self.capture_fps.fps(),
+                        'mean_ms': self.capture_fps.mean_ms()},
+            'inference': {'frames': self.inference_fps.total, 'fps': self.inference_fps.fps(),
+                          'mean_ms': self.inference_fps.mean_ms()},
+            'render': {'frames': self.render_fps.total, 'fps': self.render_fps.fps(),
+                       'mean_ms': self.render_fps.mean_ms()},
+            'dropped_frames': self.dropped_frames,
+            'elapsed_seconds': elapsed,
+            'end_to_end_fps': self.render_fps.total / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,129 @@
+import threading
+from collections import namedtuple
+
+# Yêu cầu dự đoán: ảnh khuôn mặt của một track tại một frame
+PredictionRequest = namedtuple('PredictionRequest', ['track_id', 'frame_number', 'face_img'])
+
+# Kết quả trả về kèm track id và frame của ảnh đã dự đoán (không phải frame lúc kết quả xong)
+PredictionResult = namedtuple('PredictionResult', ['track_id', 'frame_number', 'emotions', 'dominant_emotion'])
+
+class PredictionChannel:
+    """Kênh yêu cầu / kết quả giữa vòng lặp video và thread dự đoán cảm xúc
+
+    - submit(): mỗi ảnh gửi đi mang track id và số frame; mỗi track chỉ giữ yêu cầu mới nhất đang chờ
+      (yêu cầu cũ chưa kịp xử lý bị thay), nên hàng đợi không dài hơn số khuôn mặt đang theo dõi.
+    - Thread dự đoán chờ bằng Condition (không busy-poll), lấy mọi yêu cầu đang chờ và gọi
+      predict_batch(list ảnh) một lần -> list (emotions, dominant_emotion).
+    - latest(): trả kết quả gần nhất của đúng track đó nếu không cũ hơn max_age_frames frame;
+      kết quả quá cũ bị coi là hết hạn (không vẽ nhãn sai thời điểm), track bị bỏ thì forget().
+    """
+
+    def __init__(self, predict_batch, max_age_frames=15, max_pending=32):
+        self.predict_batch = predict_batch
+        self.max_age_frames = max_age_frames
+        self.max_pending = max_pending
+        self._pending = {}
+        self._results = {}
+        self._in_flight = set()
+        self._forgotten_in_flight = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+        self.submitted = 0
+        self.superseded = 0
+        self.rejected = 0
+        self.predicted = 0
+        self.batches = 0
+        self.stale = 0
+
+    def start(self):
+        """Khởi động thread dự đoán"""
+        self._thread = threading.Thread(target=self._worker, name="emotion-prediction", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Dừng thread dự đoán (yêu cầu đang chờ bị bỏ)"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def submit(self, track_id, frame_number, face_img):
+        """Gửi ảnh khuôn mặt của track để dự đoán (không chặn); False nếu hàng đợi đầy"""
+        with self._condition:
+            if track_id in self._pending:
+                self.superseded += 1
+            elif len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            self._pending[track_id] = PredictionRequest(track_id, frame_number, face_img)
+            self.submitted += 1
+            self._condition.notify()
+            return True
+
+    def latest(self, track_id, frame_number):
+        """Kết quả mới nhất của track nếu còn hạn so với frame_number hiện tại, ngược lại None"""
+        with self._condition:
+            result = self._results.get(track_id)
+            if result is None:
+                return None
+            if frame_number - result.frame_number > self.max_age_frames:
+                self.stale += 1
+                return None
+            return result
+
+    def forget(self, track_ids):
+        """Bỏ yêu cầu đang chờ và kết quả của các track đã biến mất"""
+        with self._condition:
+            for track_id in track_ids:
+                self._pending.pop(track_id, None)
+                self._results.pop(track_id, None)
+                if track_id in self._in_flight:
+                    self._forgotten_in_flight.add(track_id)
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                requests = list(self._pending.values())
+                self._pending.clear()
+                self._in_flight = {request.track_id for request in requests}
+
+            try:
+                predictions = self.predict_batch([request.face_img for request in requests])
+            except Exception as e:
+                print(f"Error predicting emotion: {e}")
+                predictions = [(None, None)] * len(requests)
+
+            with self._condition:
+                self.batches += 1
+                for request, (emotions, dominant_emotion) in zip(requests, predictions):
+                    self.predicted += 1
+                    if emotions is None or request.track_id in self._forgotten_in_flight:
+                        continue
+                    current = self._results.get(request.track_id)
+                    # Không ghi đè bằng kết quả của frame cũ hơn
+                    if current is None or current.frame_number < request.frame_number:
+                        self._results[request.track_id] = PredictionResult(
+                            request.track_id, request.frame_number, emotions, dominant_emotion
+                        )
+                self._in_flight = set()
+                self._forgotten_in_flight.clear()
+
+    def metrics(self):
+        """Số yêu cầu gửi / bị thay / bị từ chối, số ảnh đã dự đoán và số lô"""
+        with self._condition:
+            return {
+                'submitted': self.submitted,
+                'superseded': self.superseded,
+                'rejected': self.rejected,
+                'predicted': self.predicted,
+                'batches': self.batches,
+                'stale_lookups': self.stale,
+                'pending': len(self._pending),
+            }
@@ -0,0 +1,331 @@
+"""
+Chạy demo nhận diện cảm xúc từ dòng lệnh: chọn model, nguồn video, hiển thị hoặc headless, file kết quả
+
+    python run_demo.py                                       # webcam 0, model ảnh tĩnh, có cửa sổ
+    python run_demo.py --model sequence --source lop_hoc.mp4 --headless --csv ket_qua.csv
+    python run_demo.py --source thu_muc_anh/ --headless --output-video ket_qua.mp4 --chart bieu_do.png
+    python run_demo.py --source lop_hoc.mp4 --benchmark --benchmark-json benchmark.json
+
+--benchmark chạy headless (trừ khi có --display), xử lý đủ mọi frame của file / thư mục ảnh và in thời
+gian từng giai đoạn (đọc frame, phát hiện khuôn mặt, dự đoán, hiển thị, đầu-cuối) cùng FPS đầu-cuối.
+Model và cascade chỉ được tải khi chạy, theo --models-dir (mặc định demo/models).
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import csv
+import json
+import time
+import argparse
+import cv2
+from utils.emotion_translations import translate_emotion, get_engagement_vietnamese
+from text_overlay import text_overlay
+from pipeline import Pipeline, LatencyStats
+from engagement_dashboard import EngagementDashboard
+from face_tracker import FaceTracker
+from prediction_channel import PredictionChannel
+from emotion_models import EMOTION_MODELS, DETECTOR_PRESETS, MODELS_DIR, load_face_cascade
+from video_sources import open_source
+
+# Kiểu vẽ nhãn: full (nhãn lớn + phần trăm mọi cảm xúc bên cạnh), compact (bản tối ưu cũ)
+OVERLAY_STYLES = {
+    'full': {'font_size': 24, 'engagement_offset': 40, 'score_format': ' ({:.2f}%)', 'side_scores': True},
+    'compact': {'font_size': 20, 'engagement_offset': 35, 'score_format': ' ({:.1f}%)', 'side_scores': False},
+}
+
+# Cỡ chữ của danh sách phần trăm cảm xúc bên cạnh
+SIDE_SCORE_FONT_SIZE = 16
+
+class FrameAnalyzer:
+    """Giai đoạn nhận diện: phát hiện khuôn mặt, gán track id và dự đoán cảm xúc
+
+    async_predict=True: dự đoán trong thread riêng qua PredictionChannel (chỉ model ảnh tĩnh), vòng lặp
+    video không chờ model; ngược lại mọi khuôn mặt của frame được dự đoán trong một lần gọi model.
+    """
+
+    def __init__(self, model, face_cascade, detector_params, resize=None, async_predict=False, latency=None):
+        self.model = model
+        self.face_cascade = face_cascade
+        self.detector_params = detector_params
+        self.resize = resize
+        self.latency = latency
+        self.tracker = FaceTracker()
+        self.channel = PredictionChannel(self._predict_batch).start() if async_predict else None
+
+    def _record(self, stage, started):
+        if self.latency is not None:
+            self.latency.record(stage, time.perf_counter() - started)
+
+    def _predict_batch(self, face_imgs):
+        started = time.perf_counter()
+        predictions = self.model.predict_batch(face_imgs)
+        self._record('predict', started)
+        return predictions
+
+    def __call__(self, frame):
+        """frame -> (frame đã resize, list ((x, y, w, h), emotions, dominant_emotion))"""
+        if self.resize:
+            frame = cv2.resize(frame, self.resize, interpolation=cv2.INTER_AREA)
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        started = time.perf_counter()
+        faces = self.face_cascade.detectMultiScale(gray_frame, **self.detector_params)
+        self._record('detect', started)
+
+        # Gán track id cho từng khuôn mặt, bỏ dữ liệu của khuôn mặt đã rời khung hình
+        tracked, evicted = self.tracker.update(faces)
+        self.model.forget(evicted)
+        frame_number = self.tracker.frame_number
+
+        if self.channel is not None:
+            self.channel.forget(evicted)
+            results = []
+            for track_id, (x, y, w, h) in tracked:
+                self.channel.submit(track_id, frame_number, gray_frame[y:y + h, x:x + w])
+                result = self.channel.latest(track_id, frame_number)
+                if result is not None:
+                    results.append(((x, y, w, h), result.emotions, result.dominant_emotion))
+            return frame, results
+
+        if not tracked:
+            return frame, []
+        started = time.perf_counter()
+        try:
+            predictions = self.model.predict_faces(
+                [track_id for track_id, _ in tracked],
+                [gray_frame[y:y + h, x:x + w] for _, (x, y, w, h) in tracked]
+            )
+        except Exception as e:
+            print(f"Error predicting emotion: {e}")
+            return frame, []
+        self._record('predict', started)
+        return frame, [
+            (box, emotions, dominant_emotion)
+            for (_, box), (emotions, dominant_emotion) in zip(tracked, predictions)
+            if emotions and dominant_emotion
+        ]
+
+    def stop(self):
+        """Dừng thread dự đoán (nếu có)"""
+        if self.channel is not None:
+            self.channel.stop()
+
+class DemoRenderer:
+    """Giai đoạn hiển thị: vẽ nhãn, ghi kết quả (CSV, video, biểu đồ), hiển thị nếu có màn hình"""
+
+    def __init__(self, overlay_style, display=True, window_title='Real-time emotion detection',
+                 csv_path=None, video_path=None, video_fps=15.0, dashboard=None, max_frames=None):
+        self.style = OVERLAY_STYLES[overlay_style]
+        self.display = display
+        self.window_title = window_title
+        self.video_path = video_path
+        self.video_fps = video_fps
+        self.dashboard = dashboard
+        self.max_frames = max_frames
+        self.fps_text = lambda: ''
+        self.time_step = 0
+        self._video_writer = None
+        self._csv_file = None
+        self._csv_writer = None
+        if csv_path:
+            # Ghi dữ liệu CSV ngay khi có (không giữ toàn bộ buổi học trong bộ nhớ)
+            self._csv_file = open(csv_path, 'w', newline='', encoding='utf-8')
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(['Bước thời gian', 'Cảm xúc chủ đạo', 'Phần trăm cảm xúc', 'Mức độ tham gia'])
+
+    def warmup(self):
+        """Render sẵn nhãn cảm xúc / mức độ tham gia cho các cỡ chữ và màu dùng trong video"""
+        font_sizes = [self.style['font_size']]
+        colors = [(0, 0, 255), (255, 0, 0)]
+        if self.style['side_scores']:
+            font_sizes.append(SIDE_SCORE_FONT_SIZE)
+            colors.append((0, 255, 0))
+        text_overlay.warmup(font_sizes, colors)
+
+    def _draw_face(self, frame, box, emotions, dominant_emotion, emotion_vn, engagement):
+        x, y, w, h = box
+        font_size = self.style['font_size']
+
+        # Vẽ hình chữ nhật xung quanh khuôn mặt
+        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
+
+        # Hiển thị cảm xúc và mức độ tham gia bằng tiếng Việt
+        frame = text_overlay.draw_score(frame, emotion_vn, emotions[dominant_emotion], (x, y - 10), font_size,
+                                        (0, 0, 255), score_format=self.style['score_format'])
+        frame, _ = text_overlay.draw_text(frame, engagement, (x, y - self.style['engagement_offset']), font_size,
+                                          (255, 0, 0))
+
+        # Hiển thị phần trăm cảm xúc ở bên cạnh bằng tiếng Việt
+        if self.style['side_scores']:
+            y0, dy = 30, 30
+            for i, (emo, perc) in enumerate(emotions.items()):
+                frame = text_overlay.draw_score(frame, translate_emotion(emo), perc, (10, y0 + i * dy),
+                                                SIDE_SCORE_FONT_SIZE, (0, 255, 0), score_format=': {:.2f}%')
+        return frame
+
+    def _write_video(self, frame):
+        if self._video_writer is None:
+            height, width = frame.shape[:2]
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self._video_writer = cv2.VideoWriter(self.video_path, fourcc, self.video_fps, (width, height))
+        self._video_writer.write(frame)
+
+    def render(self, frame_number, frame, analysis):
+        """Vẽ kết quả của một frame; trả về False để dừng (phím 'q' hoặc đủ max_frames)"""
+        frame, results = analysis
+        engagements = []
+        for box, emotions, dominant_emotion in results:
+            # Dịch cảm xúc và phân loại mức độ tham gia bằng tiếng Việt
+            emotion_vn = translate_emotion(dominant_emotion)
+            engagement = get_engagement_vietnamese(dominant_emotion, emotions[dominant_emotion])
+            engagements.append(engagement)
+
+            if self._csv_writer is not None:
+                self._csv_writer.writerow([self.time_step, emotion_vn, emotions[dominant_emotion], engagement])
+            frame = self._draw_face(frame, box, emotions, dominant_emotion, emotion_vn, engagement)
+
+        # FPS đo thực tế của từng giai đoạn
+        cv2.putText(frame, f'{self.fps_text()} | Frame: {frame_number}', (10, frame.shape[0] - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+        if self.video_path:
+            self._write_video(frame)
+        if self.dashboard is not None:
+            self.dashboard.record_frame(engagements)
+        self.time_step += 1
+
+        if self.display:
+            cv2.imshow(self.window_title, frame)
+            chart = self.dashboard.latest_image() if self.dashboard is not None else None
+            if chart is not None:
+                cv2.imshow('Engagement dashboard', chart)
+            # Dừng nếu nhấn 'q'
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                return False
+        if self.max_frames and self.time_step >= self.max_frames:
+            return False
+
+    def close(self, chart_path=None):
+        """Đóng file CSV / video, lưu ảnh biểu đồ"""
+        if self._csv_file is not None:
+            self._csv_file.close()
+        if self._video_writer is not None:
+            self._video_writer.release()
+        if self.dashboard is not None:
+            self.dashboard.stop()
+            if chart_path:
+                self.dashboard.save(chart_path)
+
+def parse_size(value):
+    """'640x480' -> (640, 480)"""
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Kích thước phải có dạng RỘNGxCAO, ví dụ 640x480: {value}")
+    return width, height
+
+def build_parser():
+    """Tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Demo nhận diện cảm xúc và mức độ tham gia của học sinh")
+    parser.add_argument("--model", choices=sorted(EMOTION_MODELS), default="static",
+                        help="static: CNN ảnh tĩnh (FER2013), sequence: CNN-LSTM chuỗi 10 frame (CK+)")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="Thư mục chứa file model và Haar cascade")
+    parser.add_argument("--source", default="0", help="Số webcam, đường dẫn file video hoặc thư mục ảnh")
+    parser.add_argument("--resize", type=parse_size, help="Đưa frame về kích thước RỘNGxCAO trước khi nhận diện")
+    parser.add_argument("--detector", choices=sorted(DETECTOR_PRESETS), default="default",
+                        help="Tham số phát hiện khuôn mặt")
+    parser.add_argument("--async-predict", action="store_true",
+                        help="Dự đoán trong thread riêng, không chờ model (chỉ model static)")
+    parser.add_argument("--overlay", choices=sorted(OVERLAY_STYLES), default="full", help="Kiểu vẽ nhãn lên video")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--display", action="store_true", help="Hiện cửa sổ video và biểu đồ (mặc định trừ khi --benchmark)")
+    mode.add_argument("--headless", action="store_true", help="Không mở cửa sổ nào (máy chủ không có màn hình)")
+    parser.add_argument("--window-title", default="Real-time emotion detection", help="Tiêu đề cửa sổ video")
+    parser.add_argument("--csv", help="Ghi kết quả từng khuôn mặt ra file CSV")
+    parser.add_argument("--chart", help="Lưu ảnh biểu đồ mức độ tham gia khi kết thúc")
+    parser.add_argument("--chart-window", type=int, default=120, help="Số giây gần nhất hiển thị trên biểu đồ")
+    parser.add_argument("--chart-refresh", type=float, default=1.0, help="Số giây giữa hai lần cập nhật biểu đồ")
+    parser.add_argument("--chart-title-suffix", default="", help="Thêm vào tiêu đề biểu đồ, ví dụ ' (CK+)'")
+    parser.add_argument("--output-video", help="Ghi video đã vẽ nhãn ra file (mp4)")
+    parser.add_argument("--max-frames", type=int, help="Dừng sau số frame này")
+    parser.add_argument("--benchmark", action="store_true", help="Đo thời gian từng giai đoạn và FPS đầu-cuối")
+    parser.add_argument("--benchmark-json", help="Ghi kết quả benchmark ra file JSON")
+    return parser
+
+def print_benchmark(report):
+    """In bảng thời gian từng giai đoạn"""
+    print(f"\nBenchmark: model {report['model']}, nguồn {report['source']}, "
+          f"{report['frames']} frame trong {report['elapsed_seconds']:.2f} s")
+    print(f"{'Giai đoạn':<12} {'Số mẫu':>8} {'TB (ms)':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'Max (ms)':>9}")
+    for stage in ('capture', 'inference', 'detect', 'predict', 'render', 'end_to_end'):
+        stats = report['stages'].get(stage)
+        if stats is None:
+            continue
+        print(f"{stage:<12} {stats['count']:>8} {stats['mean_ms']:>9.2f} {stats['p50_ms']:>9.2f} "
+              f"{stats['p95_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    print(f"FPS đầu-cuối: {report['end_to_end_fps']:.2f} (bỏ {report['dropped_frames']} frame)")
+
+def main(argv=None):
+    """Hàm chính; trả về mã thoát"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.async_predict and args.model != 'static':
+        parser.error("--async-predict chỉ dùng được với --model static (model chuỗi cần đủ mọi frame theo thứ tự)")
+    display = args.display or (not args.headless and not args.benchmark)
+
+    try:
+        model = EMOTION_MODELS[args.model](args.models_dir).load()
+        face_cascade = load_face_cascade(args.models_dir)
+        source, is_live = open_source(args.source, *(args.resize or (None, None)))
+    except (RuntimeError, ValueError) as e:
+        print(f"Lỗi: {e}")
+        return 1
+
+    # Biểu đồ chạy trong thread riêng khi có màn hình; headless chỉ ghi ring buffer để lưu ảnh lúc kết thúc
+    dashboard = None
+    if display or args.chart:
+        dashboard = EngagementDashboard(window_seconds=args.chart_window, refresh_seconds=args.chart_refresh,
+                                        title_suffix=args.chart_title_suffix)
+        if display:
+            dashboard.start()
+
+    latency = LatencyStats() if args.benchmark else None
+    analyzer = FrameAnalyzer(model, face_cascade, DETECTOR_PRESETS[args.detector], resize=args.resize,
+                             async_predict=args.async_predict, latency=latency)
+    renderer = DemoRenderer(args.overlay, display=display, window_title=args.window_title, csv_path=args.csv,
+                            video_path=args.output_video, video_fps=source.get(cv2.CAP_PROP_FPS) or 15.0,
+                            dashboard=dashboard, max_frames=args.max_frames)
+    renderer.warmup()
+
+    # Chạy pipeline: nguồn video (thread) -> nhận diện (thread) -> hiển thị / ghi kết quả (main thread)
+    pipeline = Pipeline(source, analyzer, renderer.render, drop_frames=is_live, latency=latency)
+    renderer.fps_text = pipeline.fps_text
+    try:
+        stats = pipeline.run()
+    finally:
+        analyzer.stop()
+        source.release()
+        if display:
+            cv2.destroyAllWindows()
+        renderer.close(args.chart)
+    print(f"Thống kê FPS: {stats}")
+
+    if args.benchmark:
+        report = {
+            'model': args.model,
+            'source': args.source,
+            'frames': stats['render']['frames'],
+            'elapsed_seconds': stats['elapsed_seconds'],
+            'end_to_end_fps': stats['end_to_end_fps'],
+            'dropped_frames': stats['dropped_frames'],
+            'stages': latency.summary(),
+        }
+        print_benchmark(report)
+        if args.benchmark_json:
+            with open(args.benchmark_json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import numpy as np
+
+class SequenceBuffers:
+    """Ring buffer chuỗi frame riêng cho từng track, gộp thành một batch cho model CNN-LSTM
+
+    - Mỗi track có một mảng cấp sẵn (num_frames, 48, 48, 1); frame mới ghi đè frame cũ nhất, không
+      tạo list hay mảng mới mỗi frame. Frame đầu tiên được chép vào mọi ô nên track mới có ngay chuỗi
+      đủ dài (lặp frame đầu như cách cũ) và được dự đoán từ frame đầu.
+    - batch(track_ids) xếp chuỗi của các track (cũ -> mới) vào một mảng (T, num_frames, 48, 48, 1)
+      dùng lại giữa các frame, để cả frame chỉ gọi model một lần.
+    - evict() trả mảng của track đã biến mất về danh sách rảnh để track mới dùng lại.
+    """
+
+    def __init__(self, num_frames=10, frame_shape=(48, 48, 1), dtype=np.float32):
+        self.num_frames = num_frames
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = dtype
+        self._buffers = {}
+        self._heads = {}
+        self._free = []
+        self._batch = np.empty((0, num_frames) + self.frame_shape, dtype=dtype)
+        self._offsets = np.arange(num_frames)
+        self.allocated = 0
+
+    def push(self, track_id, frame):
+        """Thêm frame đã tiền xử lý (frame_shape) vào chuỗi của track"""
+        buffer = self._buffers.get(track_id)
+        if buffer is None:
+            if self._free:
+                buffer = self._free.pop()
+            else:
+                buffer = np.empty((self.num_frames,) + self.frame_shape, dtype=self.dtype)
+                self.allocated += 1
+            # Track mới: chuỗi là frame đầu tiên lặp lại
+            buffer[:] = frame
+            self._buffers[track_id] = buffer
+            self._heads[track_id] = 0
+            return
+        head = self._heads[track_id]
+        buffer[head] = frame
+        self._heads[track_id] = (head + 1) % self.num_frames
+
+    def batch(self, track_ids):
+        """Chuỗi của các track theo thứ tự track_ids -> mảng (T, num_frames, *frame_shape), cũ -> mới"""
+        count = len(track_ids)
+        if count > len(self._batch):
+            self._batch = np.empty((count, self.num_frames) + self.frame_shape, dtype=self.dtype)
+        batch = self._batch[:count]
+        for i, track_id in enumerate(track_ids):
+            # head là ô cũ nhất (sẽ bị ghi tiếp theo)
+            order = (self._heads[track_id] + self._offsets) % self.num_frames
+            np.take(self._buffers[track_id], order, axis=0, out=batch[i])
+        return batch
+
+    def evict(self, track_ids):
+        """Bỏ chuỗi của các track đã biến mất"""
+        for track_id in track_ids:
+            buffer = self._buffers.pop(track_id, None)
+            self._heads.pop(track_id, None)
+            if buffer is not None:
+                self._free.append(buffer)
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __contains__(self, track_id):
+        return track_id in self._buffers
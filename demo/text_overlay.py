@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from utils.emotion_translations import EMOTION_TRANSLATIONS, ENGAGEMENT_TRANSLATIONS
+
+# Font có dấu tiếng Việt, thử lần lượt (Windows, Linux, macOS)
+FONT_CANDIDATES = [
+    "arial.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+]
+
+# Nhãn cố định được vẽ sẵn khi khởi động (cảm xúc, mức độ tham gia)
+DEFAULT_VOCABULARY = sorted(set(EMOTION_TRANSLATIONS.values()) | set(ENGAGEMENT_TRANSLATIONS.values()))
+
+class TextOverlay:
+    """Vẽ text tiếng Việt lên frame bằng sprite đã render sẵn
+
+    Font chỉ được nạp một lần cho mỗi cỡ chữ; mỗi chuỗi (text, cỡ chữ, màu) được render bằng PIL
+    một lần thành sprite (mask alpha + màu) và giữ trong cache LRU. Khi vẽ, sprite chỉ được trộn alpha
+    vào đúng vùng chữ của frame bằng NumPy, không chuyển đổi cả frame BGR <-> RGB <-> PIL.
+    Màu truyền vào theo thứ tự RGB như PIL (giống put_vietnamese_text cũ).
+    """
+
+    def __init__(self, max_sprites=2048):
+        self.max_sprites = max_sprites
+        self._fonts = {}
+        self._sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, font_size):
+        """Font theo cỡ chữ (nạp từ đĩa một lần)"""
+        font = self._fonts.get(font_size)
+        if font is None:
+            for path in FONT_CANDIDATES:
+                try:
+                    font = ImageFont.truetype(path, font_size)
+                    break
+                except OSError:
+                    continue
+            else:
+                font = ImageFont.load_default()
+            self._fonts[font_size] = font
+        return font
+
+    def sprite(self, text, font_size, color):
+        """Sprite của chuỗi: (mask alpha uint16 (h, w, 1), màu BGR uint16); None nếu chuỗi rỗng"""
+        key = (text, font_size, color)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+
+        # Vẽ từ gốc (0, 0) như draw.text(position) của PIL để vị trí chữ không đổi
+        font = self.font(font_size)
+        left, top, right, bottom = font.getbbox(text)
+        if right <= 0 or bottom <= 0:
+            return None
+        mask = Image.new("L", (right, bottom), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+        alpha = np.asarray(mask, dtype=np.uint16)[:, :, np.newaxis]
+        bgr = np.array(color[:3][::-1], dtype=np.uint16)
+        sprite = (alpha, bgr * alpha)
+
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def warmup(self, font_sizes, colors, vocabulary=DEFAULT_VOCABULARY):
+        """Render sẵn các nhãn cố định cho các cỡ chữ và màu sẽ dùng"""
+        for font_size in font_sizes:
+            for color in colors:
+                for text in vocabulary:
+                    self.sprite(text, font_size, color)
+
+    def draw_text(self, frame, text, position, font_size=32, color=(255, 255, 255)):
+        """Vẽ text lên frame BGR (sửa trực tiếp); trả về (frame, chiều rộng đã vẽ)"""
+        sprite = self.sprite(text, font_size, color)
+        if sprite is None:
+            return frame, 0
+        alpha, premultiplied = sprite
+        height, width = alpha.shape[:2]
+        x, y = int(position[0]), int(position[1])
+
+        # Cắt phần sprite nằm ngoài frame (nhãn của khuôn mặt sát mép ảnh)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame.shape[1]), min(y + height, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return frame, width
+        sx, sy = x0 - x, y0 - y
+        a = alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        roi = frame[y0:y1, x0:x1]
+        blended = roi * (255 - a) + premultiplied[sy:sy + y1 - y0, sx:sx + x1 - x0] + 127
+        roi[:] = blended // 255
+        return frame, width
+
+    def draw_score(self, frame, label, percent, position, font_size=32, color=(255, 255, 255), score_format=' ({:.1f}%)'):
+        """Vẽ "nhãn (xx.x%)": nhãn và phần trăm là hai sprite riêng để cache không tăng theo tổ hợp"""
+        frame, width = self.draw_text(frame, label, position, font_size, color)
+        frame, _ = self.draw_text(frame, score_format.format(percent), (position[0] + width, position[1]), font_size, color)
+        return frame
+
+    def metrics(self):
+        """Số sprite trong cache, số lần dùng lại / render mới"""
+        return {'sprites': len(self._sprites), 'hits': self.hits, 'misses': self.misses}
+
+# Instance dùng chung cho các script demo
+text_overlay = TextOverlay()
+
+def _legacy_put_text(img, text, position, font_size, color):
+    """Cách cũ: nạp font và chuyển cả frame qua PIL mỗi lần vẽ (chỉ dùng để so sánh)"""
+    pil_img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    try:
+        font = ImageFont.truetype(FONT_CANDIDATES[3], font_size)
+    except OSError:
+        font = ImageFont.load_default()
+    ImageDraw.Draw(pil_img).text(position, text, font=font, fill=color)
+    return cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+
+if __name__ == "__main__":
+    # So sánh thời gian vẽ nhãn của 4 khuôn mặt trên frame 640x480 (2 nhãn mỗi khuôn mặt)
+    frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    faces = [(40, 80), (200, 120), (360, 90), (500, 200)]
+    scores = np.random.uniform(0, 100, 200)
+    text_overlay.warmup([20], [(0, 0, 255), (255, 0, 0)])
+
+    started = time.perf_counter()
+    for score in scores:
+        for x, y in faces:
+            frame = _legacy_put_text(frame, f'Vui vẻ ({score:.1f}%)', (x, y - 10), 20, (0, 0, 255))
+            frame = _legacy_put_text(frame, 'Rất tích cực', (x, y - 35), 20, (255, 0, 0))
+    legacy_ms = (time.perf_counter() - started) * 1000 / len(scores)
+
+    started = time.perf_counter()
+    for score in scores:
+        for x, y in faces:
+            text_overlay.draw_score(frame, 'Vui vẻ', score, (x, y - 10), 20, (0, 0, 255))
+            text_overlay.draw_text(frame, 'Rất tích cực', (x, y - 35), 20, (255, 0, 0))
+    sprite_ms = (time.perf_counter() - started) * 1000 / len(scores)
+
+    print(f"Cách cũ (PIL cả frame): {legacy_ms:.2f} ms/frame")
+    print(f"Sprite cache:           {sprite_ms:.2f} ms/frame ({legacy_ms / sprite_ms:.0f}x)")
+    print(f"Cache: {text_overlay.metrics()}")
@@ -0,0 +1,64 @@
+import os
+import cv2
+
+# Phần mở rộng ảnh đọc được từ thư mục ảnh
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+class ImageDirectorySource:
+    """Đọc lần lượt các ảnh trong thư mục (sắp xếp theo tên) với cùng giao diện read() như cv2.VideoCapture"""
+
+    def __init__(self, directory, fps=15.0):
+        self.directory = directory
+        self.fps = fps
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self._index = 0
+
+    def read(self):
+        """(True, frame) cho ảnh tiếp theo đọc được, (False, None) khi hết ảnh"""
+        while self._index < len(self.paths):
+            frame = cv2.imread(self.paths[self._index])
+            self._index += 1
+            if frame is not None:
+                return True, frame
+            print(f"Không đọc được ảnh {self.paths[self._index - 1]}")
+        return False, None
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        return 0.0
+
+    def release(self):
+        self._index = len(self.paths)
+
+def open_source(source, width=None, height=None):
+    """Mở nguồn video từ dòng lệnh: số (webcam), thư mục ảnh hoặc file video
+
+    Trả về (nguồn, is_live): webcam là nguồn trực tiếp (bỏ frame cũ khi xử lý chậm), file video và
+    thư mục ảnh thì xử lý đủ mọi frame. Raise ValueError nếu không mở được.
+    """
+    if str(source).isdigit():
+        capture = cv2.VideoCapture(int(source))
+        if width and height:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        is_live = True
+    elif os.path.isdir(source):
+        capture = ImageDirectorySource(source)
+        is_live = False
+    elif os.path.isfile(source):
+        capture = cv2.VideoCapture(source)
+        is_live = False
+    else:
+        raise ValueError(f"Không tìm thấy nguồn video: {source}")
+    if not capture.isOpened():
+        raise ValueError(f"Không mở được nguồn video: {source}")
+    return capture, is_live